@@ -3,14 +3,23 @@ load_dotenv()
 
 import streamlit as st
 import json
-from nlp_engine import obtenir_recommandations  # CONNEXION AU MOTEUR NLP
-from scoring import compute_final_score, ScoreBreakdown  # Phase 4: Scoring avancé
-from genai_module import generate_explanation, gemini_available  # Phase 5: Gemini
-from visualisations import (  # Phase 6: Visualisations
-    creer_graphique_scores_recommandations,
-    creer_radar_preferences,
-    creer_camembert_categories
+import plotly.io as pio
+from nlp_engine import obtenir_moteur  # CONNEXION AU MOTEUR NLP
+from filtres import PERIODES, LANGUES, Exclusions
+from genai_module import (  # Phase 5: Gemini
+    gemini_available,
+    gemini_metrics,
+    generate_explanation,
+    generate_explanation_stream
 )
+from pitchs_films import obtenir_pitch
+from pipeline import executer_pipeline, ouvrir_curseur, page_suivante, reclasser, TOP_N_RECHERCHE  # Phases 3 à 6 : recherche, scoring, explications, graphiques
+from cache import CacheReponses, CacheSemantique
+from profil_session import ProfilSession
+from scoring import DEFAULT_MMR_LAMBDA
+from voisins_films import lire_graphe, films_similaires
+from journal_requetes import journal_depuis_environnement
+from visualisations import statistiques_figures
 
 # ========== CONFIGURATION DE LA PAGE ==========
 st.set_page_config(
@@ -19,6 +28,54 @@ st.set_page_config(
     layout="wide"
 )
 
+# ========== MOTEUR NLP PARTAGÉ ==========
+@st.cache_resource
+def demarrer_moteur():
+    """
+    Moteur partagé entre les sessions : le référentiel est surveillé et rechargé
+    à chaud (seuls les films ajoutés/modifiés sont ré-encodés). Le modèle est
+    confié à un worker unique : les requêtes des sessions concurrentes sont
+    encodées ensemble, par batchs.
+    """
+    moteur = obtenir_moteur(file_inference=True)
+    moteur.demarrer_surveillance()
+    return moteur
+
+@st.cache_resource
+def obtenir_cache():
+    """Cache des résultats complets, partagé entre les sessions."""
+    return CacheReponses(taille_max=256, ttl=3600)
+
+@st.cache_resource
+def obtenir_graphe_voisins():
+    """Graphe précalculé des films similaires (python voisins_films.py), ou None."""
+    return lire_graphe()
+
+@st.cache_resource(max_entries=64)
+def lire_figure(figure_json):
+    """Figure Plotly relue depuis son JSON une seule fois, partagée entre les reruns."""
+    return pio.from_json(figure_json)
+
+@st.cache_resource
+def obtenir_journal():
+    """Journal des requêtes (si JOURNAL_REQUETES est défini), partagé entre les sessions."""
+    return journal_depuis_environnement()
+
+@st.cache_resource
+def obtenir_cache_semantique():
+    """Candidats des requêtes récentes, réutilisés pour les paraphrases."""
+    return CacheSemantique(capacite=512, seuil=0.92)
+
+if demarrer_moteur().etat is None:
+    with st.sidebar:
+        st.error("Référentiel de films introuvable : vérifiez le chemin du catalogue puis relancez l'application.")
+    st.stop()
+
+# Exclusions propres à la session : films déjà vus / rejetés, genres bloqués
+if 'exclusions' not in st.session_state:
+    st.session_state['exclusions'] = Exclusions()
+exclusions = st.session_state['exclusions']
+
 # ========== TITRE ET INTRODUCTION ==========
 st.title("Système de Recommandation Cinématographique")
 st.markdown("""
@@ -146,31 +203,147 @@ col3, col4 = st.columns(2)
 with col3:
     periode = st.selectbox(
         "Période préférée",
-        options=[
-            "Peu importe",
-            "Classiques (avant 1980)",
-            "Années 80-90",
-            "Années 2000-2010",
-            "Récents (2010+)"
-        ],
+        options=PERIODES,
         help="Préférez-vous des films d'une époque particulière ?"
     )
 
 with col4:
     langue = st.selectbox(
         "Langue originale préférée",
-        options=[
-            "Peu importe",
-            "Anglais",
-            "Français",
-            "Japonais (Animation)",
-            "Autres"
-        ],
+        options=LANGUES,
         help="Avez-vous une préférence pour la langue originale ?"
     )
 
+col5, col6 = st.columns(2)
+
+with col5:
+    filtres_stricts = st.checkbox(
+        "Filtres stricts",
+        value=False,
+        help="Exclure les films hors période/langue choisies (et les genres sous la note minimale) au lieu de simplement les pénaliser"
+    )
+
+with col6:
+    genre_min = st.slider(
+        "Note minimale d'un genre (filtres stricts)",
+        min_value=1,
+        max_value=5,
+        value=1,
+        disabled=not filtres_stricts,
+        help="Les genres notés en dessous sont exclus de la recherche"
+    )
+
+col7, col8 = st.columns(2)
+
+with col7:
+    genres_exclus = st.multiselect(
+        "Genres à exclure",
+        options=demarrer_moteur().etat.masques.categories,
+        default=sorted(exclusions.genres),
+        help="Aucun film de ces genres ne sera proposé"
+    )
+
+with col8:
+    diversifier = st.checkbox(
+        "Diversifier les résultats",
+        value=False,
+        help="Évite un top 5 composé de films trop proches (même genre, même thème)"
+    )
+    if exclusions.films:
+        st.caption(f"{len(exclusions.films)} film(s) marqué(s) comme déjà vu(s), exclu(s) des recommandations")
+        if st.button("Réinitialiser les films déjà vus"):
+            exclusions.vider_films()
+            st.rerun()
+
 st.divider()
 
+# ========== RETOURS "PLUS / MOINS COMME ÇA" ==========
+def appliquer_profil(profil):
+    """
+    Reclasse avec le vecteur du profil de session (sans ré-encoder la requête)
+    et remplace les résultats affichés ; les explications déjà vues sont reprises.
+    """
+    pages = st.session_state.get('pages_suivantes', [])
+    affiches = st.session_state['resultat'].recommandations + [rec for page in pages for rec in page]
+    nouveau = reclasser(
+        st.session_state['reponses'],
+        profil,
+        moteur=demarrer_moteur(),
+        exclusions=exclusions,
+        explications_connues={rec['film']['FilmID']: rec['explanation'] for rec in affiches if rec.get('explanation')},
+        differer_explications=True,
+        diversite=st.session_state.get('diversite'),
+        top_n_recherche=TOP_N_RECHERCHE * 3 if st.session_state.get('diversite') else TOP_N_RECHERCHE
+    )
+    if nouveau.recommandations:
+        st.session_state['resultat'] = nouveau
+        st.session_state['curseur'] = ouvrir_curseur(
+            st.session_state['reponses'], nouveau, moteur=demarrer_moteur(), exclusions=exclusions
+        )
+        st.session_state['pages_suivantes'] = []
+
+def enregistrer_retour(film, positif):
+    profil = st.session_state.get('profil')
+    if profil is None:
+        profil = st.session_state['profil'] = ProfilSession(st.session_state['resultat'].requete)
+    if positif:
+        profil.plus_comme(film['FilmID'])
+    else:
+        profil.moins_comme(film['FilmID'])
+    appliquer_profil(profil)
+
+def reinitialiser_profil():
+    profil = st.session_state.get('profil')
+    if profil is not None:
+        profil.reinitialiser()
+        appliquer_profil(profil)
+
+def boutons_retour(film, zone):
+    st.button("👍 Plus comme ça", key=f"plus_{zone}_{film['FilmID']}",
+              on_click=enregistrer_retour, args=(film, True))
+    st.button("👎 Moins comme ça", key=f"moins_{zone}_{film['FilmID']}",
+              on_click=enregistrer_retour, args=(film, False))
+
+# ========== FILMS SIMILAIRES ==========
+def afficher_similaires(film):
+    """Voisins précalculés du film (sans encodage ni recherche)."""
+    similaires = films_similaires(film, demarrer_moteur().etat, obtenir_graphe_voisins(), n=5)
+    if similaires:
+        with st.expander("Films similaires"):
+            for voisin, score in similaires:
+                st.write(f"- {voisin['Film']} ({voisin['Categorie']}) · {score:.0%}")
+
+# ========== DÉTAIL D'UN FILM ==========
+def afficher_film_detaille(rang, rec):
+    """Fiche détaillée d'une recommandation (description, explication, scores)."""
+    film = rec['film']
+    breakdown = rec['breakdown']
+    
+    st.markdown(f"### {rang}. {film['Film']} ({film['Categorie']})")
+    
+    col_detail1, col_detail2 = st.columns([2, 1])
+    
+    with col_detail1:
+        st.write(f"**Description:** {film['Description']}")
+        st.write(f"**Mots-clés:** {film.get('Keywords', 'N/A')}")
+        st.info(f"**Pourquoi ce film ?** {rec.get('explanation', '')}")
+        afficher_similaires(film)
+    
+    with col_detail2:
+        st.metric("Score Final", f"{rec['score_final']:.0%}")
+        st.write(f"Sémantique: {breakdown.semantic:.0%}")
+        if breakdown.lexical is not None:
+            st.write(f"Lexical: {breakdown.lexical:.0%}")
+        st.write(f"Genre: {breakdown.genre:.0%}")
+        st.write(f"Période: {breakdown.period:.0%}")
+        st.write(f"Langue: {breakdown.language:.0%}")
+        if st.button("👁️ Déjà vu", key=f"deja_vu_{film['FilmID']}", help="Ne plus proposer ce film"):
+            exclusions.exclure_film(film['FilmID'])
+            st.toast(f"{film['Film']} ne sera plus proposé")
+        boutons_retour(film, "detail")
+    
+    st.divider()
+
 # ========== BOUTON D'ANALYSE ==========
 if st.button("Analyser et Recommander", type="primary", use_container_width=True):
     
@@ -178,6 +351,11 @@ if st.button("Analyser et Recommander", type="primary", use_container_width=True
     if not q1_description.strip() or not q2_ambiance.strip():
         st.error("Veuillez remplir les deux descriptions textuelles (type de film et ambiance recherchée).")
     else:
+        exclusions.definir_genres(genres_exclus)
+        # Diversification MMR sur un plus large choix de candidats
+        diversite = DEFAULT_MMR_LAMBDA if diversifier else None
+        st.session_state['diversite'] = diversite
+        
         # Stocker les réponses dans un dictionnaire
         reponses_utilisateur = {
             "description": q1_description.strip(),
@@ -186,6 +364,8 @@ if st.button("Analyser et Recommander", type="primary", use_container_width=True
             "acteurs": acteurs.strip(),
             "periode": periode,
             "langue": langue,
+            "filtres_stricts": filtres_stricts,
+            "genre_min": genre_min if filtres_stricts else None,
             "preferences": {
                 "Thriller": pref_thriller,
                 "Romance": pref_romance,
@@ -218,140 +398,156 @@ if st.button("Analyser et Recommander", type="primary", use_container_width=True
             for genre, score in reponses_utilisateur["preferences"].items():
                 st.write(f"  - {genre}: {'⭐' * score}")
         
-        # ========== PHASE 3 : APPEL DU MOTEUR NLP ==========
-        with st.spinner("Analyse sémantique en cours..."):
-            recommandations_brutes = obtenir_recommandations(reponses_utilisateur, top_n=10)
+        # ========== PHASES 3 À 6 : RECHERCHE, SCORING, EXPLICATIONS, GRAPHIQUES ==========
+        # Les explications sont streamées dans les cartes ci-dessous (temps perçu = premier token)
+        with st.spinner("Analyse sémantique et calcul des scores..."):
+            resultat = executer_pipeline(
+                reponses_utilisateur,
+                moteur=demarrer_moteur(),
+                cache=obtenir_cache(),
+                cache_semantique=obtenir_cache_semantique(),
+                differer_explications=True,
+                exclusions=exclusions,
+                diversite=diversite,
+                top_n_recherche=TOP_N_RECHERCHE * 3 if diversite else TOP_N_RECHERCHE,
+                journal=obtenir_journal()
+            )
         
-        # ========== PHASE 4 : SCORING AVANCÉ ==========
-        with st.spinner("Calcul des scores pondérés..."):
-            recommandations_enrichies = []
-            
-            for rec in recommandations_brutes:
-                film = rec['film']
-                score_semantique = rec['score_semantique']
-                
-                # Calcul du score final avec pondération
-                breakdown = compute_final_score(
-                    cosine_similarity_raw=score_semantique,
-                    film=film,
-                    user_answers=reponses_utilisateur
-                )
-                
-                recommandations_enrichies.append({
-                    'film': film,
-                    'score_semantique': score_semantique,
-                    'breakdown': breakdown,
-                    'score_final': breakdown.final
-                })
-            
-            # Trier par score final
-            recommandations_enrichies.sort(key=lambda x: x['score_final'], reverse=True)
-            
-            # Garder le top 5
-            top_recommandations = recommandations_enrichies[:5]
+        if not resultat.recommandations:
+            for cle in ('resultat', 'curseur', 'pages_suivantes'):
+                st.session_state.pop(cle, None)
+            st.warning("Aucun film ne correspond à vos filtres. Assouplissez la période, la langue, la note minimale ou les exclusions.")
+            st.stop()
         
-        # ========== PHASE 5 : GÉNÉRATION DES EXPLICATIONS (Gemini) ==========
-        with st.spinner("Génération des explications personnalisées..."):
-            for rec in top_recommandations:
-                explanation = generate_explanation(
-                    user_answers=reponses_utilisateur,
-                    film=rec['film'],
-                    score_final=rec['score_final']
-                )
-                rec['explanation'] = explanation
-        
-        # ========== AFFICHAGE DES RÉSULTATS ==========
-        st.header("Vos Recommandations Personnalisées")
-        
-        # Indicateur Gemini
-        if gemini_available():
-            st.success("Explications générées par Gemini AI")
-        else:
-            st.info("Ajoutez GOOGLE_API_KEY pour des explications personnalisées par IA")
-        
-        # TOP 3 en colonnes
-        st.subheader("Top 3 Films pour vous")
-        cols = st.columns(3)
-        
-        medailles = ["🥇", "🥈", "🥉"]
+        # Résultat et curseur gardés en session : ils restent affichés quand
+        # l'utilisateur demande les films suivants
+        st.session_state['resultat'] = resultat
+        st.session_state['curseur'] = ouvrir_curseur(
+            reponses_utilisateur, resultat, moteur=demarrer_moteur(), exclusions=exclusions
+        )
+        st.session_state['pages_suivantes'] = []
+        st.session_state.pop('profil', None)
+
+# ========== AFFICHAGE DES RÉSULTATS ==========
+if 'resultat' in st.session_state:
+    resultat = st.session_state['resultat']
+    reponses_utilisateur = st.session_state['reponses']
+    top_recommandations = resultat.recommandations
+    
+    st.header("Vos Recommandations Personnalisées")
+    
+    # Indicateur Gemini
+    if gemini_available():
+        st.success("Explications générées par Gemini AI")
+    else:
+        st.info("Ajoutez GOOGLE_API_KEY pour des explications personnalisées par IA")
+    
+    profil = st.session_state.get('profil')
+    if profil is not None and len(profil):
+        retours = profil.statistiques()
+        st.caption(f"Classement ajusté par vos retours : {retours['aimes']} 👍 · {retours['rejetes']} 👎")
+        st.button("Réinitialiser mes retours", on_click=reinitialiser_profil)
+    
+    # TOP 3 en colonnes
+    st.subheader("Top 3 Films pour vous")
+    cols = st.columns(3)
+    
+    medailles = ["🥇", "🥈", "🥉"]
+    
+    for i, rec in enumerate(top_recommandations[:3]):
+        film = rec['film']
+        score_final = rec['score_final']
+        breakdown = rec['breakdown']
+        explanation = rec.get('explanation', '')
         
-        for i, rec in enumerate(top_recommandations[:3]):
-            film = rec['film']
-            score_final = rec['score_final']
-            breakdown = rec['breakdown']
-            explanation = rec.get('explanation', '')
+        with cols[i]:
+            st.markdown(f"### {medailles[i]} {film['Film']}")
+            st.write(f"**Genre:** {film['Categorie']}")
+            st.write(f"**Score:** {score_final:.0%}")
+            st.progress(score_final)
             
-            with cols[i]:
-                st.markdown(f"### {medailles[i]} {film['Film']}")
-                st.write(f"**Genre:** {film['Categorie']}")
-                st.write(f"**Score:** {score_final:.0%}")
-                st.progress(score_final)
-                
-                # Détail des scores
-                with st.expander("Détail du score"):
-                    st.write(f"- Sémantique: {breakdown.semantic:.0%}")
-                    st.write(f"- Genre: {breakdown.genre:.0%}")
-                    st.write(f"- Période: {breakdown.period:.0%}")
-                    st.write(f"- Langue: {breakdown.language:.0%}")
-                    if breakdown.people_bonus > 0:
-                        st.write(f"- Bonus: +{breakdown.people_bonus:.0%}")
-                
-                # Explication Gemini
+            # Détail des scores
+            with st.expander("Détail du score"):
+                st.write(f"- Sémantique: {breakdown.semantic:.0%}")
+                if breakdown.lexical is not None:
+                    st.write(f"- Lexical: {breakdown.lexical:.0%}")
+                st.write(f"- Genre: {breakdown.genre:.0%}")
+                st.write(f"- Période: {breakdown.period:.0%}")
+                st.write(f"- Langue: {breakdown.language:.0%}")
+                if breakdown.people_bonus > 0:
+                    st.write(f"- Bonus: +{breakdown.people_bonus:.0%}")
+            
+            # Explication Gemini (streamée si pas encore générée)
+            if explanation:
                 st.info(f"{explanation}")
-        
-        st.divider()
-        
-        # ========== PHASE 6 : VISUALISATIONS ==========
-        st.subheader("Visualisations")
-        
-        # Préparer les données pour les visualisations (format tuple)
-        recommandations_viz = [
-            (rec['film'], rec['score_final']) 
-            for rec in top_recommandations
-        ]
-        
-        # Ligne 1 : Radar + Camembert
-        col_viz1, col_viz2 = st.columns(2)
-        
-        with col_viz1:
-            fig_radar = creer_radar_preferences(reponses_utilisateur["preferences"])
-            st.plotly_chart(fig_radar, use_container_width=True)
-        
-        with col_viz2:
-            fig_camembert = creer_camembert_categories(recommandations_viz)
-            st.plotly_chart(fig_camembert, use_container_width=True)
-        
-        # Ligne 2 : Barres horizontales des scores
-        fig_scores = creer_graphique_scores_recommandations(recommandations_viz)
-        st.plotly_chart(fig_scores, use_container_width=True)
-        
-        st.divider()
-        
-        # Détails des 5 recommandations
-        with st.expander("Voir les 5 recommandations détaillées"):
-            for i, rec in enumerate(top_recommandations, 1):
-                film = rec['film']
-                score_final = rec['score_final']
-                breakdown = rec['breakdown']
-                explanation = rec.get('explanation', '')
-                
-                st.markdown(f"### {i}. {film['Film']} ({film['Categorie']})")
-                
-                col_detail1, col_detail2 = st.columns([2, 1])
-                
-                with col_detail1:
-                    st.write(f"**Description:** {film['Description']}")
-                    st.write(f"**Mots-clés:** {film.get('Keywords', 'N/A')}")
-                    st.info(f"**Pourquoi ce film ?** {explanation}")
-                
-                with col_detail2:
-                    st.metric("Score Final", f"{score_final:.0%}")
-                    st.write(f"Sémantique: {breakdown.semantic:.0%}")
-                    st.write(f"Genre: {breakdown.genre:.0%}")
-                    st.write(f"Période: {breakdown.period:.0%}")
-                    st.write(f"Langue: {breakdown.language:.0%}")
-                
-                st.divider()
+            else:
+                rec['explanation'] = st.write_stream(generate_explanation_stream(
+                    user_answers=reponses_utilisateur,
+                    film=film,
+                    score_final=score_final,
+                    pitch=obtenir_pitch(film)
+                ))
+            
+            boutons_retour(film, "top")
+            afficher_similaires(film)
+    
+    # Films 4 et 5 (affichés dans le détail) puis mise en cache du résultat complet
+    for rec in top_recommandations[3:]:
+        if not rec.get('explanation'):
+            rec['explanation'] = generate_explanation(
+                user_answers=reponses_utilisateur,
+                film=rec['film'],
+                score_final=rec['score_final'],
+                pitch=obtenir_pitch(rec['film'])
+            )
+    if resultat.memoriser is not None:
+        resultat.memoriser()
+    
+    st.divider()
+    
+    # ========== PHASE 6 : VISUALISATIONS ==========
+    st.subheader("Visualisations")
+    
+    # Ligne 1 : Radar + Camembert
+    col_viz1, col_viz2 = st.columns(2)
+    
+    with col_viz1:
+        fig_radar = lire_figure(resultat.figures['radar'])
+        st.plotly_chart(fig_radar, use_container_width=True)
+    
+    with col_viz2:
+        fig_camembert = lire_figure(resultat.figures['camembert'])
+        st.plotly_chart(fig_camembert, use_container_width=True)
+    
+    # Ligne 2 : Barres horizontales des scores
+    fig_scores = lire_figure(resultat.figures['scores'])
+    st.plotly_chart(fig_scores, use_container_width=True)
+    
+    st.divider()
+    
+    # Détails des 5 recommandations
+    with st.expander("Voir les 5 recommandations détaillées"):
+        for i, rec in enumerate(top_recommandations, 1):
+            afficher_film_detaille(i, rec)
+    
+    # ========== PAGES SUIVANTES ==========
+    # Lues dans le classement complet gardé par le curseur : seuls les films
+    # de la nouvelle page sont scorés et expliqués
+    rang = len(top_recommandations)
+    for page in st.session_state.get('pages_suivantes', []):
+        for rec in page:
+            rang += 1
+            afficher_film_detaille(rang, rec)
+    
+    curseur = st.session_state.get('curseur')
+    if curseur is not None and not curseur.epuise:
+        if st.button("Voir 5 films de plus", use_container_width=True):
+            with st.spinner("Recherche des films suivants..."):
+                page = page_suivante(curseur, avec_explications=True)
+            if page:
+                st.session_state['pages_suivantes'].append(page)
+                st.rerun()
+            st.info("Tous les films correspondant à votre recherche ont été affichés.")
 
 # ========== SIDEBAR : INFORMATIONS ==========
 with st.sidebar:
@@ -368,9 +564,36 @@ with st.sidebar:
         st.header("Status")
         if gemini_available():
             st.success("✅ Gemini connecté")
+            metriques = gemini_metrics()
+            st.caption(
+                f"Disjoncteur : {metriques['breaker_state']} · "
+                f"{metriques['successes']}/{metriques['calls']} appels réussis · "
+                f"{metriques['short_circuited']} court-circuités · {metriques['retries']} retries"
+            )
+            if metriques['prompts']['calls']:
+                st.caption(
+                    f"Prompt moyen : {metriques['prompts']['prompt_tokens_mean']:.0f} tokens · "
+                    f"{metriques['prompts']['prompts_trimmed']} prompts raccourcis"
+                )
         else:
             st.warning("⚠️ Gemini non configuré")
             st.caption("Ajoutez GOOGLE_API_KEY")
+        stats_cache = obtenir_cache().statistiques()
+        st.metric("Cache résultats (taux de succès)", f"{stats_cache['taux_succes']:.0%}")
+        st.caption(f"{stats_cache['entrees']} entrées · {stats_cache['succes']} succès · {stats_cache['echecs']} échecs")
+        stats_sem = obtenir_cache_semantique().statistiques()
+        st.metric("Cache sémantique (taux de succès)", f"{stats_sem['taux_succes']:.0%}")
+        st.caption(f"{stats_sem['entrees']} entrées · {stats_sem['faux_succes']}/{stats_sem['verifications']} faux succès vérifiés")
+        stats_figures = statistiques_figures()
+        st.caption(f"Graphiques en cache : {stats_figures['entrees']} résultats · {stats_figures['succes']} succès")
+        inference = demarrer_moteur().metriques_inference()
+        if inference:
+            st.metric("File d'inférence SBERT", f"{inference['profondeur']} en attente")
+            st.caption(
+                f"{inference['batchs']} batchs · {inference['taille_moyenne']:.1f} textes/batch "
+                f"(max {inference['taille_max']}) · attente {inference['attente_moyenne_ms']:.1f} ms · "
+                f"encodage {inference['encodage_moyen_ms']:.1f} ms/batch"
+            )
     st.divider()
     
     st.header("Statistiques")
@@ -0,0 +1,271 @@
+"""
+Artefact catalogue - Format binaire en colonnes (Arrow IPC) du référentiel encodé
+
+Le convertisseur écrit dans un seul fichier les colonnes du référentiel et les
+embeddings des films (et, avec --champs, leurs vecteurs par champ pour le
+scoring multi-vecteurs). Au démarrage, le moteur ouvre ce fichier en mémoire
+mappée (pas de parsing JSON, pas de ré-encodage SBERT).
+
+Un artefact est rejeté (ArtefactPerime) si sa version de format, l'empreinte
+du modèle ou le pooling des textes longs ne correspondent plus.
+
+Usage :
+    python artefact_catalogue.py referentiel_films.json catalogue.arrow --champs
+"""
+
+from __future__ import annotations
+from collections.abc import Sequence
+from typing import Dict, Any, List, Optional
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from catalogue import charger_catalogue, ANNEE_INCONNUE
+
+VERSION_FORMAT = 1
+PHRASE_SONDE = "Un film captivant avec du suspense et des rebondissements."
+
+
+class ArtefactPerime(ValueError):
+    """L'artefact ne correspond plus au format ou au modèle courant."""
+
+
+def empreinte_modele(model, nom_modele: str) -> str:
+    """
+    Empreinte du modèle : nom, dimension et embedding d'une phrase sonde.
+    Deux modèles qui encodent différemment ont des empreintes différentes.
+    """
+    sonde = model.encode([PHRASE_SONDE], convert_to_numpy=True, normalize_embeddings=True)
+    sonde = np.round(np.asarray(sonde, dtype=np.float32), 4)
+    h = hashlib.sha1()
+    h.update(nom_modele.encode("utf-8"))
+    h.update(str(sonde.shape[-1]).encode("utf-8"))
+    h.update(sonde.tobytes())
+    return h.hexdigest()
+
+
+def hash_fichier(chemin: str) -> str:
+    h = hashlib.sha1()
+    with open(chemin, "rb") as f:
+        for morceau in iter(lambda: f.read(1 << 20), b""):
+            h.update(morceau)
+    return h.hexdigest()
+
+
+# ========== ÉCRITURE ==========
+def _colonne_vecteurs(matrice: np.ndarray) -> pa.FixedSizeListArray:
+    valeurs = pa.array(np.ascontiguousarray(matrice, dtype=np.float32).ravel())
+    return pa.FixedSizeListArray.from_arrays(valeurs, matrice.shape[1])
+
+
+def construire_table(catalogue, embeddings: np.ndarray, hashes: List[str],
+                     embeddings_champs: Optional[np.ndarray] = None) -> pa.Table:
+    """
+    Table Arrow : une colonne par champ + 'embedding' (liste de taille fixe float32)
+    + 'embedding_champs' si les vecteurs par champ sont fournis.
+    """
+    extras = [json.dumps(e, ensure_ascii=False) if e else None for e in catalogue.extras]
+    colonnes = {
+        "FilmID": pa.array([str(x) for x in catalogue.film_id], pa.string()),
+        "FilmIDEntier": pa.array([isinstance(x, int) for x in catalogue.film_id], pa.bool_()),
+        "BlockID": pa.array(catalogue.block_id, pa.string()),
+        "Categorie": pa.array(catalogue.categorie, pa.string()),
+        "Film": pa.array(catalogue.titre, pa.string()),
+        "Description": pa.array(catalogue.description, pa.string()),
+        "Keywords": pa.array(catalogue.keywords, pa.string()),
+        "Annee": pa.array(np.asarray(catalogue.annee, dtype=np.int32)),
+        "Langue": pa.array(catalogue.langue, pa.string()),
+        "Extras": pa.array(extras, pa.string()),
+        "Hash": pa.array(hashes, pa.string()),
+        "embedding": _colonne_vecteurs(embeddings),
+    }
+    if embeddings_champs is not None:
+        colonnes["embedding_champs"] = _colonne_vecteurs(embeddings_champs)
+    return pa.table(colonnes)
+
+
+def convertir(
+    chemin_referentiel: str,
+    chemin_artefact: str,
+    model=None,
+    nom_modele: Optional[str] = None,
+    embeddings: Optional[np.ndarray] = None,
+    champs: bool = False,
+    pooling: Optional[str] = None
+):
+    """
+    Convertit le référentiel JSON (+ embeddings des films) en artefact Arrow.
+
+    Args:
+        embeddings: Matrice déjà calculée, dans l'ordre du référentiel
+            (voir encodage_massif.py) ; sinon les films sont encodés ici
+        champs: Encode et stocke aussi les vecteurs par champ (moteur avec `fusion`)
+        pooling: Pooling des textes longs utilisé pour les embeddings (défaut : POOLING_DEFAUT)
+
+    Returns:
+        dict: Métadonnées écrites dans l'artefact
+    """
+    from nlp_engine import (MODEL_NAME, POOLING_DEFAUT, charger_modele, encoder_champs_films,
+                            encoder_textes, texte_film, hash_film)
+
+    nom_modele = nom_modele or MODEL_NAME
+    pooling = pooling or POOLING_DEFAUT
+    model = model or charger_modele()
+
+    catalogue = charger_catalogue(chemin_referentiel)
+    films = [catalogue.film(i) for i in range(len(catalogue))]
+    if embeddings is None:
+        embeddings = encoder_textes(model, [texte_film(f) for f in films], pooling=pooling)
+    elif len(embeddings) != len(films):
+        raise ValueError(f"{len(embeddings)} embeddings pour {len(films)} films")
+    embeddings_champs = encoder_champs_films(model, films, pooling) if champs else None
+    table = construire_table(catalogue, embeddings, [hash_film(f) for f in films], embeddings_champs)
+
+    meta = {
+        "version_format": VERSION_FORMAT,
+        "modele": nom_modele,
+        "empreinte_modele": empreinte_modele(model, nom_modele),
+        "dimension": int(embeddings.shape[1]),
+        "pooling": pooling,
+        "dimension_champs": int(embeddings_champs.shape[1]) if champs else None,
+        "nb_films": len(films),
+        "source": os.path.abspath(chemin_referentiel),
+        "hash_source": hash_fichier(chemin_referentiel),
+        "blocs": catalogue.blocs,
+    }
+    table = table.replace_schema_metadata({"catalogue": json.dumps(meta, ensure_ascii=False)})
+
+    temporaire = chemin_artefact + ".tmp"
+    with pa.OSFile(temporaire, "wb") as sortie:
+        with pa.ipc.new_file(sortie, table.schema) as ecrivain:
+            ecrivain.write_table(table, max_chunksize=max(len(films), 1))
+    os.replace(temporaire, chemin_artefact)
+
+    print(f"✅ Artefact écrit : {chemin_artefact} ({len(films)} films, dim {meta['dimension']}"
+          f"{', vecteurs par champ' if champs else ''})")
+    return meta
+
+
+# ========== LECTURE ==========
+class FilmsArtefact(Sequence):
+    """
+    Vue en lecture seule sur les films de l'artefact : chaque film n'est
+    reconstruit en dict que lorsqu'il est demandé (ex. top-k d'une requête).
+    """
+
+    def __init__(self, table: pa.Table):
+        self._table = table
+        self._colonnes = {nom: table.column(nom) for nom in table.column_names if nom != "embedding"}
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        c = self._colonnes
+        film_id = c["FilmID"][i].as_py()
+        film = {
+            "FilmID": int(film_id) if c["FilmIDEntier"][i].as_py() else film_id,
+            "BlockID": c["BlockID"][i].as_py(),
+            "Categorie": c["Categorie"][i].as_py(),
+            "Film": c["Film"][i].as_py(),
+            "Description": c["Description"][i].as_py(),
+            "Keywords": c["Keywords"][i].as_py(),
+        }
+        annee = c["Annee"][i].as_py()
+        if annee != ANNEE_INCONNUE:
+            film["Annee"] = annee
+        langue = c["Langue"][i].as_py()
+        if langue:
+            film["Langue"] = langue
+        extras = c["Extras"][i].as_py()
+        if extras:
+            film.update(json.loads(extras))
+        return film
+
+    def colonne(self, nom: str) -> List[Any]:
+        """Colonne entière en liste Python."""
+        return self._colonnes[nom].to_pylist()
+
+    def colonne_arrow(self, nom: str) -> pa.ChunkedArray:
+        """Colonne entière telle que stockée (masques et BM25 calculés par les noyaux Arrow)."""
+        return self._colonnes[nom]
+
+
+def _matrice(table: pa.Table, nom: str, dimension: int) -> np.ndarray:
+    """Colonne de vecteurs en matrice (n, dimension), sans copie."""
+    colonne = table.column(nom)
+    colonne = colonne.chunk(0) if colonne.num_chunks == 1 else colonne.combine_chunks()
+    return colonne.values.to_numpy(zero_copy_only=True).reshape(len(table), dimension)
+
+
+def ouvrir_artefact(chemin: str, model=None, nom_modele: Optional[str] = None,
+                    pooling: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ouvre l'artefact en mémoire mappée et vérifie qu'il est à jour.
+
+    Args:
+        chemin: Fichier .arrow produit par `convertir`
+        model: Modèle SBERT courant (si fourni, son empreinte est vérifiée)
+        nom_modele: Nom du modèle courant
+        pooling: Pooling courant des textes longs (si fourni, il est vérifié)
+
+    Returns:
+        dict: {'meta', 'films' (FilmsArtefact), 'ids', 'hashes', 'embeddings' (n, d),
+               'embeddings_champs' (n, 3*d) ou None}
+
+    Raises:
+        ArtefactPerime: Version de format, modèle ou pooling différents
+    """
+    source = pa.memory_map(chemin, "r")
+    table = pa.ipc.open_file(source).read_all()
+
+    meta_brute = (table.schema.metadata or {}).get(b"catalogue")
+    if meta_brute is None:
+        raise ArtefactPerime(f"{chemin} : métadonnées absentes")
+    meta = json.loads(meta_brute)
+
+    if meta.get("version_format") != VERSION_FORMAT:
+        raise ArtefactPerime(f"{chemin} : format v{meta.get('version_format')}, v{VERSION_FORMAT} attendu")
+    if nom_modele is not None and meta.get("modele") != nom_modele:
+        raise ArtefactPerime(f"{chemin} : encodé avec {meta.get('modele')}, {nom_modele} attendu")
+    if model is not None and meta.get("empreinte_modele") != empreinte_modele(model, meta["modele"]):
+        raise ArtefactPerime(f"{chemin} : empreinte du modèle différente")
+    # Artefacts écrits avant l'enregistrement du pooling : pooling par défaut
+    if pooling is not None and meta.get("pooling", "mean") != pooling:
+        raise ArtefactPerime(f"{chemin} : pooling {meta.get('pooling', 'mean')}, {pooling} attendu")
+
+    embeddings = _matrice(table, "embedding", meta["dimension"])
+    embeddings_champs = None
+    if meta.get("dimension_champs") and "embedding_champs" in table.column_names:
+        embeddings_champs = _matrice(table, "embedding_champs", meta["dimension_champs"])
+
+    films = FilmsArtefact(table)
+    entiers = table.column("FilmIDEntier").to_pylist()
+    ids = [int(x) if e else x for x, e in zip(table.column("FilmID").to_pylist(), entiers)]
+
+    return {
+        "meta": meta,
+        "films": films,
+        "ids": ids,
+        "hashes": dict(zip(ids, table.column("Hash").to_pylist())),
+        "embeddings": embeddings,
+        "embeddings_champs": embeddings_champs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertit le référentiel JSON en artefact Arrow encodé.")
+    parser.add_argument("referentiel", nargs="?", default="referentiel_films.json")
+    parser.add_argument("artefact", nargs="?", default="catalogue.arrow")
+    parser.add_argument("--champs", action="store_true", help="Stocke aussi les vecteurs par champ (fusion)")
+    parser.add_argument("--pooling", choices=("mean", "max"), default=None)
+    args = parser.parse_args()
+    convertir(args.referentiel, args.artefact, champs=args.champs, pooling=args.pooling)
@@ -0,0 +1,54 @@
+"""
+Benchmark : temps de chargement du catalogue JSON vs artefact Arrow.
+
+    python -m benchmarks.bench_artefact --films 50000
+
+- JSON : parsing + validation du référentiel + encodage SBERT des films
+  (ce que fait le moteur au démarrage sans artefact)
+- Artefact : ouverture en mémoire mappée + vérification de l'empreinte du modèle
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.commun import catalogue_synthetique, ecrire_catalogue, chronometrer
+from nlp_engine import MODEL_NAME, charger_modele, charger_referentiel, encoder_textes, texte_film
+from artefact_catalogue import convertir, ouvrir_artefact
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--films", type=int, default=10000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    model = charger_modele()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin_json = os.path.join(dossier, "referentiel.json")
+        chemin_artefact = os.path.join(dossier, "catalogue.arrow")
+        ecrire_catalogue(catalogue_synthetique(args.films), chemin_json)
+        convertir(chemin_json, chemin_artefact, model=model)
+
+        t_parse, data = chronometrer(lambda: charger_referentiel(chemin_json), args.repetitions)
+        t_encode, _ = chronometrer(
+            lambda: encoder_textes(model, [texte_film(f) for f in data["films"]]), 1
+        )
+        t_artefact, _ = chronometrer(
+            lambda: ouvrir_artefact(chemin_artefact, model=model, nom_modele=MODEL_NAME), args.repetitions
+        )
+
+        taille_json = os.path.getsize(chemin_json) / 1e6
+        taille_artefact = os.path.getsize(chemin_artefact) / 1e6
+
+    print("\n" + "=" * 60)
+    print(f"Chargement du catalogue ({args.films} films)")
+    print("=" * 60)
+    print(f"JSON      parsing + validation : {t_parse * 1000:9.1f} ms   ({taille_json:.1f} Mo)")
+    print(f"JSON      + encodage SBERT     : {(t_parse + t_encode) * 1000:9.1f} ms")
+    print(f"Artefact  mmap + vérification  : {t_artefact * 1000:9.1f} ms   ({taille_artefact:.1f} Mo)")
+    print(f"Gain vs JSON + encodage        : x{(t_parse + t_encode) / t_artefact:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark : construction des graphiques d'un résultat (radar, camembert, scores).
+
+    python -m benchmarks.bench_figures --resultats 200 --top-n 5 10
+
+Temps par rendu (les trois figures d'un résultat) :
+    - objets Plotly   : go.Figure validées puis .to_json() (ancienne phase 6)
+    - spécifications  : figures_serialisees sur un résultat jamais vu (cache manqué)
+    - cache           : figures_serialisees sur un résultat déjà rendu
+    - relecture       : plotly.io.from_json des trois figures (chaque rerun
+                        Streamlit, hors cache de l'application)
+"""
+
+import argparse
+import json
+import random
+
+import plotly.io as pio
+
+from benchmarks.commun import chronometrer
+from visualisations import (
+    creer_camembert_categories,
+    creer_graphique_scores_recommandations,
+    creer_radar_preferences,
+    figures_serialisees,
+)
+
+GENRES = ["Thriller", "Romance", "Comédie", "Science-Fiction", "Drame", "Action", "Horreur", "Animation"]
+
+
+def resultats_aleatoires(films, n_resultats, top_n, graine=0):
+    generateur = random.Random(graine)
+    resultats = []
+    for _ in range(n_resultats):
+        recommandations = sorted(((film, generateur.random()) for film in generateur.sample(films, top_n)),
+                                 key=lambda rec: rec[1], reverse=True)
+        preferences = {genre: generateur.randint(1, 5) for genre in GENRES}
+        resultats.append((recommandations, preferences))
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resultats", type=int, default=200, help="Résultats distincts rendus")
+    parser.add_argument("--top-n", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    with open("referentiel_films.json", "r", encoding="utf-8") as f:
+        films = json.load(f)["films"]
+
+    print("\n" + "=" * 78)
+    print(f"Graphiques d'un résultat (radar + camembert + scores), {args.resultats} résultats")
+    print("=" * 78)
+    print(f"{'top-n':>6} {'objets Plotly':>14} {'spécifications':>15} {'cache':>9} {'relecture':>10} {'gain':>7}")
+    for graine, top_n in enumerate(args.top_n):
+        resultats = resultats_aleatoires(films, args.resultats, top_n, graine)
+        figures = [figures_serialisees(recs, prefs) for recs, prefs in resultats]   # préchauffage
+
+        def objets_plotly():
+            for recs, prefs in resultats:
+                creer_radar_preferences(prefs).to_json()
+                creer_camembert_categories(recs).to_json()
+                creer_graphique_scores_recommandations(recs).to_json()
+
+        def specifications():
+            # Résultats jamais vus : scores décalés à chaque appel, le cache manque
+            decalage = random.random()
+            for recs, prefs in resultats:
+                figures_serialisees([(film, score + decalage) for film, score in recs], prefs)
+
+        def cache():
+            for recs, prefs in resultats:
+                figures_serialisees(recs, prefs)
+
+        def relecture():
+            for serialisees in figures:
+                for figure in serialisees.values():
+                    pio.from_json(figure)
+
+        durees = [chronometrer(fonction, args.repetitions)[0] / len(resultats) * 1000
+                  for fonction in (objets_plotly, specifications, cache, relecture)]
+        print(f"{top_n:6d} {durees[0]:11.2f} ms {durees[1]:12.2f} ms {durees[2]:6.3f} ms {durees[3]:7.2f} ms "
+              f"x{durees[0] / durees[1]:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
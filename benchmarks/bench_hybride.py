@@ -0,0 +1,157 @@
+"""
+Benchmark : recherche hybride BM25 + SBERT contre la recherche dense seule.
+
+    python -m benchmarks.bench_hybride --films 200000
+    python -m benchmarks.bench_hybride --sans-latence --films-qualite 5000
+
+Les trois modes du moteur (lexical=None, "fusion", "candidats") sont mesurés
+sur le chemin de MoteurRecommandation.rechercher, avec ses seuils
+(CANDIDATS_MIN, rappel_lexical) : ce qui est mesuré est ce que l'application
+exécute.
+
+Latence (catalogue synthétique : référentiel répliqué, embeddings aléatoires
+normalisés de dimension 384, requête déjà encodée) :
+    - dense     : produit matrice-vecteur sur tout le catalogue + top-k
+    - fusion    : dense + scores BM25 + rappel des meilleurs films BM25
+    - candidats : scores BM25 puis produit matrice-vecteur sur les N meilleurs
+                  films BM25 (ou recherche dense sous CANDIDATS_MIN)
+
+Qualité (référentiel, éventuellement répliqué, encodé avec SBERT) : requêtes
+"film connu" (titre seul, mots-clés seuls). Rang du film attendu dans le
+classement par score final des candidats du moteur (hits@5, MRR, film
+absent des candidats), et part des requêtes où la génération de candidats
+BM25 s'est réellement engagée.
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.commun import catalogue_synthetique, chronometrer, ecrire_catalogue
+from filtres import construire_masques
+from index_lexical import IndexBM25
+from nlp_engine import EtatCatalogue, MoteurRecommandation
+from pipeline import TOP_N_RECHERCHE, classer
+
+DIMENSION = 384
+MODES = {"dense": None, "fusion": "fusion", "candidats": "candidats"}
+
+
+def requetes_latence(films, n=20):
+    """Requêtes réalistes : mots-clés de films du catalogue."""
+    return [films[i]["Keywords"] for i in range(0, len(films), max(1, len(films) // n))][:n]
+
+
+def moteur_sur_etat(etat, lexical, n_candidats=2000, model=None):
+    """Moteur du mode `lexical` servant un état déjà construit (pas de ré-encodage)."""
+    moteur = MoteurRecommandation(artefact=None, model=model, lexical=lexical, candidats_lexicaux=n_candidats)
+    moteur._etat = etat
+    return moteur
+
+
+def mesurer_latence(n_films, top_n, n_candidats, repetitions):
+    data = catalogue_synthetique(n_films)
+    films = data["films"]
+
+    duree_index, index = chronometrer(lambda: IndexBM25.construire(films), 1)
+    stats = index.statistiques()
+
+    generateur = np.random.default_rng(0)
+    matrice = generateur.standard_normal((n_films, DIMENSION), dtype=np.float32)
+    matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+    etat = EtatCatalogue(films=films, embeddings=matrice, hashes={},
+                         index={film["FilmID"]: i for i, film in enumerate(films)},
+                         version=1, masques=construire_masques(films), bm25=index)
+    requete = matrice[0]
+    reponses = [{"description": texte, "preferences": {}} for texte in requetes_latence(films)]
+
+    print("\n" + "=" * 60)
+    print(f"Latence sur {n_films} films (d={DIMENSION}), {len(reponses)} requêtes")
+    print("=" * 60)
+    print(f"Index BM25 : {duree_index:.2f} s ({stats['termes']} termes, {stats['postings']} postings)")
+    t_dense = None
+    for nom, lexical in MODES.items():
+        moteur = moteur_sur_etat(etat, lexical, n_candidats)
+        engagees = sum(moteur.classement(r, requete=requete).source == "candidats" for r in reponses)
+
+        def rechercher():
+            for r in reponses:
+                moteur.rechercher(r, top_n=top_n, requete=requete)
+
+        t, _ = chronometrer(rechercher, repetitions)
+        t_dense = t_dense or t
+        detail = f"   candidats BM25 engagés : {engagees}/{len(reponses)}" if lexical == "candidats" else ""
+        print(f"{nom:10s}: {t / len(reponses) * 1000:8.2f} ms/requête   x{t_dense / t:5.2f}{detail}")
+
+
+def mesurer_qualite(chemin, n_films, n_requetes, n_candidats):
+    from nlp_engine import charger_modele
+
+    temporaire = None
+    if n_films:
+        fd, temporaire = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        ecrire_catalogue(catalogue_synthetique(n_films, chemin), temporaire)
+        chemin = temporaire
+    try:
+        model = charger_modele()
+        reference = MoteurRecommandation(chemin, model=model, artefact=None, lexical="fusion")
+        etat = reference.etat
+    finally:
+        if temporaire:
+            os.remove(temporaire)
+    films = etat.films
+    cibles = range(0, len(films), max(1, len(films) // n_requetes))[:n_requetes]
+    moteurs = {nom: moteur_sur_etat(etat, lexical, n_candidats, model) for nom, lexical in MODES.items()}
+
+    familles = {
+        "titre": [(i, films[i]["Film"]) for i in cibles],
+        "mots-clés": [(i, ", ".join(films[i]["Keywords"].split(",")[:2])) for i in cibles],
+    }
+
+    print("\n" + "=" * 60)
+    print(f"Qualité sur {len(films)} films : film attendu dans le classement final "
+          f"({TOP_N_RECHERCHE} candidats par requête)")
+    print("=" * 60)
+    for famille, requetes in familles.items():
+        print(f"\nRequêtes '{famille}' ({len(requetes)}) :")
+        encodees = [({"description": texte, "preferences": {}}, cible) for cible, texte in requetes]
+        encodees = [(reponses, cible, reference.encoder_requete(reponses)) for reponses, cible in encodees]
+        for nom, moteur in moteurs.items():
+            rangs, engagees = [], 0
+            for reponses, cible, requete in encodees:
+                engagees += moteur.classement(reponses, requete=requete).source == "candidats"
+                classees = classer(reponses, moteur.rechercher(reponses, top_n=TOP_N_RECHERCHE, requete=requete))
+                ids = [rec["film"]["FilmID"] for rec in classees]
+                attendu = films[cible]["FilmID"]
+                rangs.append(ids.index(attendu) + 1 if attendu in ids else np.inf)
+            rangs = np.array(rangs)
+            detail = f"   candidats BM25 engagés {engagees / len(encodees):5.1%}" if nom == "candidats" else ""
+            print(f"   {nom:10s}: hits@5 {np.mean(rangs <= 5):5.1%}   MRR {np.mean(1.0 / rangs):.3f}   "
+                  f"absent {np.mean(np.isinf(rangs)):5.1%}{detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--films", type=int, default=200000)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--candidats", type=int, default=2000, help="Candidats BM25 du moteur (candidats_lexicaux)")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--films-qualite", type=int, default=0,
+                        help="Réplique le référentiel jusqu'à ce nombre de films (0 : tel quel)")
+    parser.add_argument("--requetes", type=int, default=200, help="Requêtes par famille (qualité)")
+    parser.add_argument("--sans-latence", action="store_true")
+    parser.add_argument("--sans-qualite", action="store_true", help="Latence seule (pas de modèle SBERT)")
+    args = parser.parse_args()
+
+    if not args.sans_latence:
+        mesurer_latence(args.films, args.top_n, args.candidats, args.repetitions)
+    if not args.sans_qualite:
+        mesurer_qualite(args.referentiel, args.films_qualite, args.requetes, args.candidats)
+
+
+if __name__ == "__main__":
+    main()
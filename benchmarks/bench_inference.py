@@ -0,0 +1,88 @@
+"""
+Benchmark : encodage de requêtes par des sessions concurrentes.
+
+    python -m benchmarks.bench_inference --sessions 1 4 8 16 --requetes 50
+
+Chaque session (un thread, comme une session Streamlit) encode des requêtes
+une par une. Deux modes comparés :
+    - direct : tous les threads appellent model.encode sur le modèle partagé
+    - file   : les demandes passent par FileInference (worker unique, batchs)
+
+Rapporte le débit (requêtes/s), la latence p50 / p95 par requête et, en mode
+file, la taille moyenne des batchs.
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from file_inference import FileInference
+from nlp_engine import charger_modele, encoder_textes
+
+TEXTES = [
+    "Film captivant avec du suspense et des rebondissements",
+    "Comédie légère pour décompresser en famille",
+    "Science-fiction spatiale, voyages dans le temps",
+    "Drame romantique émouvant à Paris",
+    "Film d'animation japonais poétique",
+    "Thriller psychologique sombre et mystérieux",
+]
+
+
+def mesurer(modele, n_sessions, n_requetes):
+    latences = []
+    verrou = threading.Lock()
+    depart = threading.Barrier(n_sessions + 1)
+
+    def session(indice):
+        locales = []
+        depart.wait()
+        for i in range(n_requetes):
+            debut = time.perf_counter()
+            encoder_textes(modele, [TEXTES[(indice + i) % len(TEXTES)] + f" {indice}-{i}"])
+            locales.append(time.perf_counter() - debut)
+        with verrou:
+            latences.extend(locales)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    depart.wait()
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - debut
+    latences = np.array(latences) * 1000
+    return len(latences) / duree, np.percentile(latences, 50), np.percentile(latences, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--requetes", type=int, default=50, help="Requêtes par session")
+    args = parser.parse_args()
+
+    modele = charger_modele()
+    encoder_textes(modele, TEXTES)   # préchauffage
+
+    print("\n" + "=" * 78)
+    print(f"Encodage de requêtes, {args.requetes} requêtes par session")
+    print("=" * 78)
+    print(f"{'sessions':>8} | {'direct req/s':>12} {'p50 ms':>7} {'p95 ms':>7} | "
+          f"{'file req/s':>10} {'p50 ms':>7} {'p95 ms':>7} {'batch':>6}")
+    for n_sessions in args.sessions:
+        direct = mesurer(modele, n_sessions, args.requetes)
+        file = FileInference(modele)
+        try:
+            en_file = mesurer(file, n_sessions, args.requetes)
+            metriques = file.metriques()
+        finally:
+            file.arreter()
+        print(f"{n_sessions:8d} | {direct[0]:12.1f} {direct[1]:7.1f} {direct[2]:7.1f} | "
+              f"{en_file[0]:10.1f} {en_file[1]:7.1f} {en_file[2]:7.1f} {metriques['taille_moyenne']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark : présélection sur embeddings réduits par ACP puis re-scoring pleine dimension.
+
+    python -m benchmarks.bench_reduction --films 500000 --dimensions 32 64 128 192
+    python -m benchmarks.bench_reduction --embeddings encodage/embeddings.npy
+
+Pour chaque dimension cible : variance conservée, rappel@k du top-k en deux
+temps (présélection réduite + re-scoring exact) par rapport au top-k pleine
+dimension, et latence comparée à la recherche pleine dimension.
+
+Sans --embeddings, la matrice est synthétique : quelques dizaines de
+directions latentes dominantes plus du bruit isotrope, normalisée (comme les
+embeddings de phrases, dont la variance est concentrée sur peu d'axes).
+Les requêtes sont des films du catalogue bruités.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.commun import chronometrer
+from projection_pca import ajuster_pca, preselection
+from shards import top_k_indices
+
+DIMENSION = 384
+
+
+def matrice_synthetique(n_films, rang=48, bruit=0.35, graine=0):
+    generateur = np.random.default_rng(graine)
+    base = np.linalg.qr(generateur.standard_normal((DIMENSION, rang)))[0].T.astype(np.float32)
+    poids = (1.0 / np.sqrt(np.arange(1, rang + 1))).astype(np.float32)
+    facteurs = generateur.standard_normal((n_films, rang), dtype=np.float32) * poids
+    matrice = facteurs @ base + bruit / np.sqrt(DIMENSION) * generateur.standard_normal(
+        (n_films, DIMENSION), dtype=np.float32)
+    matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+    return matrice.astype(np.float32)
+
+
+def requetes_bruitees(matrice, n_requetes, graine=1):
+    generateur = np.random.default_rng(graine)
+    requetes = matrice[generateur.integers(len(matrice), size=n_requetes)] + \
+        0.5 / np.sqrt(matrice.shape[1]) * generateur.standard_normal((n_requetes, matrice.shape[1]), dtype=np.float32)
+    return (requetes / np.linalg.norm(requetes, axis=1, keepdims=True)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--films", type=int, default=200000)
+    parser.add_argument("--embeddings", default=None, help="Matrice .npy réelle (ex. encodage/embeddings.npy)")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[32, 64, 128, 192])
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--preselection", type=int, default=1000)
+    parser.add_argument("--requetes", type=int, default=50)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        matrice = np.ascontiguousarray(np.load(args.embeddings), dtype=np.float32)
+    else:
+        matrice = matrice_synthetique(args.films)
+    requetes = requetes_bruitees(matrice, args.requetes)
+    attendus = [set(top_k_indices(matrice @ q, args.top_n).tolist()) for q in requetes]
+
+    def pleine_dimension():
+        for q in requetes:
+            top_k_indices(matrice @ q, args.top_n)
+
+    t_plein, _ = chronometrer(pleine_dimension, args.repetitions)
+
+    print("\n" + "=" * 78)
+    print(f"Top-{args.top_n} sur {len(matrice)} films (d={matrice.shape[1]}), "
+          f"présélection {args.preselection}, {args.requetes} requêtes")
+    print("=" * 78)
+    print(f"{'dimension':>9} {'variance':>9} {'rappel@k':>9} {'ms/requête':>11} {'gain':>6} "
+          f"{'mémoire':>9} {'ajustement':>11}")
+    print(f"{matrice.shape[1]:9d} {1:9.1%} {1:9.1%} {t_plein / len(requetes) * 1000:11.2f} {'x1.00':>6} "
+          f"{matrice.nbytes / 2**20:7.0f}Mo {'-':>11}")
+
+    for dimension in args.dimensions:
+        debut = time.perf_counter()
+        projection = ajuster_pca(matrice, dimension)
+        reduits = projection.projeter_films(matrice)
+        duree_ajustement = time.perf_counter() - debut
+        requetes_reduites = requetes @ projection.composantes
+
+        def deux_temps():
+            resultats = []
+            for q, q_reduite in zip(requetes, requetes_reduites):
+                lignes = preselection(reduits, q_reduite, args.preselection)
+                resultats.append(lignes[top_k_indices(matrice[lignes] @ q, args.top_n)])
+            return resultats
+
+        t_reduit, resultats = chronometrer(deux_temps, args.repetitions)
+        rappel = np.mean([len(attendu & set(r.tolist())) / len(attendu) for attendu, r in zip(attendus, resultats)])
+        print(f"{dimension:9d} {projection.variance_expliquee:9.1%} {rappel:9.1%} "
+              f"{t_reduit / len(requetes) * 1000:11.2f} x{t_plein / t_reduit:5.2f} "
+              f"{reduits.nbytes / 2**20:7.0f}Mo {duree_ajustement:10.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark : recherche top-k répartie sur 1..N shards (processus locaux).
+
+    python -m benchmarks.bench_shards --films 1000000 --shards 1 2 4 8
+
+La matrice est synthétique (vecteurs normalisés aléatoires de dimension 384,
+comme all-MiniLM-L6-v2) : seul le coût de la recherche est mesuré.
+
+Avant de chronométrer, le résultat shardé est comparé au calcul non shardé
+(voir meme_top_k), avec et sans filtre strict, sur une
+matrice contenant des lignes dupliquées (ex aequo).
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from benchmarks.commun import chronometrer
+from shards import CoordinateurShards, top_k_indices
+
+DIMENSION = 384
+ECART_ARRONDI = 1e-5   # arrondi du produit matrice-vecteur selon la taille de la tranche
+
+
+def matrice_synthetique(n_films, graine=0):
+    generateur = np.random.default_rng(graine)
+    matrice = generateur.standard_normal((n_films, DIMENSION), dtype=np.float32)
+    matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+    # Lignes dupliquées : ex aequo exacts à départager
+    matrice[1::97] = matrice[0]
+    return matrice
+
+
+def top_k_non_sharde(matrice, requete, k, masque=None):
+    if masque is None:
+        scores = matrice @ requete
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+    lignes = np.flatnonzero(masque)
+    scores = matrice[lignes] @ requete
+    locaux = top_k_indices(scores, k)
+    return lignes[locaux], scores[locaux]
+
+
+def meme_top_k(obtenu, matrice, requete, k, masque=None):
+    """
+    Top-k shardé conforme au calcul non shardé : scores à ECART_ARRONDI près,
+    mêmes films au même rang hors quasi ex aequo (ex. lignes dupliquées, dont
+    les scores sont arrondis différemment d'une tranche à l'autre).
+    """
+    indices, scores = obtenu
+    classement, scores_classement = top_k_non_sharde(matrice, requete, k + 1, masque)
+    attendus, scores_attendus = classement[:k], scores_classement[:k]
+    if len(indices) != len(attendus) or len(set(indices.tolist())) != len(indices):
+        return False
+    if not (np.allclose(scores, scores_attendus, rtol=0, atol=ECART_ARRONDI)
+            and np.allclose(matrice[indices] @ requete, scores_attendus, rtol=0, atol=ECART_ARRONDI)):
+        return False
+    proches = np.abs(np.diff(scores_classement)) <= ECART_ARRONDI
+    isoles = np.ones(len(classement), dtype=bool)
+    isoles[:-1] &= ~proches
+    isoles[1:] &= ~proches
+    return bool(np.array_equal(indices[isoles[:k]], attendus[isoles[:k]]))
+
+
+def verifier_identite(coordinateur, matrice, top_n, n_requetes=50):
+    """
+    Returns:
+        int: Nombre de requêtes dont le résultat shardé diffère
+    """
+    generateur = np.random.default_rng(1)
+    ecarts = 0
+    for i in range(n_requetes):
+        # Une requête sur 5 tombe exactement sur les lignes dupliquées
+        requete = matrice[0] if i % 5 == 0 else matrice[generateur.integers(len(matrice))]
+        masque = generateur.random(len(matrice)) < 0.3 if i % 2 else None
+        if not meme_top_k(coordinateur.top_k(requete, top_n, masque), matrice, requete, top_n, masque):
+            ecarts += 1
+    return ecarts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--films", type=int, default=200000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    matrice = matrice_synthetique(args.films)
+    requete = matrice[12345 % args.films]
+
+    t_local, _ = chronometrer(lambda: top_k_non_sharde(matrice, requete, args.top_n), args.repetitions)
+
+    print("\n" + "=" * 60)
+    print(f"Recherche top-{args.top_n} sur {args.films} films (d={DIMENSION})")
+    print("=" * 60)
+    print(f"Non shardé (processus courant) : {t_local * 1000:8.2f} ms")
+
+    identique = True
+    for n_shards in args.shards:
+        coordinateur = CoordinateurShards.lancer_locaux(n_shards)
+        try:
+            coordinateur.publier(matrice, version=1)
+            ecarts = verifier_identite(coordinateur, matrice, args.top_n)
+            identique &= ecarts == 0
+            t_shards, _ = chronometrer(lambda: coordinateur.top_k(requete, args.top_n), args.repetitions)
+        finally:
+            coordinateur.fermer()
+        statut = "✅ identique" if ecarts == 0 else f"❌ {ecarts} écarts"
+        print(f"{n_shards:2d} shard(s)                    : {t_shards * 1000:8.2f} ms   "
+              f"x{t_local / t_shards:5.2f}   {statut}")
+
+    if not identique:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Outils communs aux benchmarks : catalogue synthétique et chronométrage.
+
+Les benchmarks se lancent depuis la racine du projet :
+    python -m benchmarks.bench_artefact --films 50000
+"""
+
+import json
+import time
+import statistics
+
+
+def catalogue_synthetique(n_films, chemin_source="referentiel_films.json"):
+    """
+    Réplique le référentiel jusqu'à n_films films (FilmID uniques, textes variés).
+    """
+    with open(chemin_source, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    base = data["films"]
+    films = []
+    for i in range(n_films):
+        film = dict(base[i % len(base)])
+        copie = i // len(base)
+        film["FilmID"] = f"S{i:07d}"
+        if copie:
+            film["Film"] = f"{film['Film']} ({copie})"
+            film["Keywords"] = f"{film['Keywords']}, variante {copie}"
+        films.append(film)
+    return {"blocs": data["blocs"], "films": films}
+
+
+def ecrire_catalogue(data, chemin):
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def chronometrer(fonction, repetitions=5):
+    """
+    Exécute `fonction` plusieurs fois et retourne (médiane en s, dernier résultat).
+    """
+    durees = []
+    resultat = None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees), resultat
@@ -0,0 +1,296 @@
+"""
+Caches du pipeline de recommandation
+
+- CacheReponses : deux soumissions identiques du questionnaire (après
+  normalisation) renvoient le même résultat : films classés, ScoreBreakdown,
+  explications et graphiques sérialisés.
+- CacheSemantique : une requête paraphrasée (embedding proche d'une requête
+  déjà servie) réutilise la liste de candidats et les explications en cache ;
+  seul le scoring par utilisateur est recalculé.
+
+Les deux caches sont bornés (LRU) et vidés automatiquement quand le catalogue,
+le modèle ou les pondérations changent.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Hashable
+import hashlib
+import json
+import re
+import random
+import threading
+import time
+
+import numpy as np
+
+
+def _normaliser(valeur: Any) -> Any:
+    if isinstance(valeur, str):
+        return re.sub(r"\s+", " ", valeur.strip().lower())
+    if isinstance(valeur, dict):
+        return {str(k): _normaliser(v) for k, v in valeur.items() if v is not None}
+    if isinstance(valeur, (list, tuple)):
+        return [_normaliser(v) for v in valeur]
+    return valeur
+
+
+def cle_reponses(reponses: Dict[str, Any]) -> str:
+    """
+    Hash canonique des réponses du questionnaire.
+
+    Casse, espaces superflus et ordre des clés sont ignorés (le modèle SBERT
+    all-MiniLM-L6-v2 est insensible à la casse).
+    """
+    canonique = json.dumps(_normaliser(reponses), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonique.encode("utf-8")).hexdigest()
+
+
+def empreinte_config(*elements: Any) -> str:
+    """Empreinte courte d'une configuration (version du catalogue, modèle, pondérations...)."""
+    brut = json.dumps(elements, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(brut.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheReponses:
+    """
+    Cache LRU borné en nombre d'entrées et en durée de vie, sûr entre threads.
+
+    Chaque lecture/écriture fournit le `jeton` de configuration courant : s'il
+    diffère de celui des entrées stockées, tout le cache est invalidé.
+    """
+
+    def __init__(self, taille_max: int = 256, ttl: float = 3600.0):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._jeton: Optional[str] = None
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _verifier_jeton(self, jeton: Optional[str]):
+        if jeton is not None and jeton != self._jeton:
+            if self._entrees:
+                self.invalidations += 1
+            self._entrees.clear()
+            self._jeton = jeton
+
+    def obtenir(self, cle: Hashable, jeton: Optional[str] = None) -> Optional[Any]:
+        with self._verrou:
+            self._verifier_jeton(jeton)
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.echecs += 1
+                return None
+            expiration, valeur = entree
+            if expiration < time.monotonic():
+                del self._entrees[cle]
+                self.echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return valeur
+
+    def stocker(self, cle: Hashable, valeur: Any, jeton: Optional[str] = None):
+        with self._verrou:
+            self._verifier_jeton(jeton)
+            self._entrees[cle] = (time.monotonic() + self.ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+    @property
+    def taux_succes(self) -> float:
+        total = self.succes + self.echecs
+        return self.succes / total if total else 0.0
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "entrees": len(self._entrees),
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": self.taux_succes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class CacheSemantique:
+    """
+    Cache des candidats indexé par embedding de requête.
+
+    Les vecteurs des requêtes servies sont rangés dans une matrice (capacite, d) :
+    une recherche est un seul produit matrice-vecteur. Au-dessus de `seuil`
+    (cosinus), l'entrée la plus proche est réutilisée. Une entrée n'est
+    comparée qu'aux requêtes de même `contexte` (filtres stricts, top N...).
+
+    Une fraction `taux_verification` des succès est contrôlée par le pipeline
+    contre une recherche complète : un recouvrement du top insuffisant compte
+    comme "faux succès".
+    """
+
+    def __init__(
+        self,
+        capacite: int = 512,
+        seuil: float = 0.92,
+        taux_verification: float = 0.05,
+        recouvrement_min: float = 0.6
+    ):
+        self.capacite = capacite
+        self.seuil = seuil
+        self.taux_verification = taux_verification
+        self.recouvrement_min = recouvrement_min
+        self._vecteurs: Optional[np.ndarray] = None
+        self._contextes = np.full(capacite, -1, dtype=np.int64)
+        # Contexte -> code, tant qu'au moins une entrée l'utilise
+        self._codes_contexte: Dict[str, int] = {}
+        self._entrees_par_code: Dict[int, int] = {}
+        self._contexte_par_code: Dict[int, str] = {}
+        self._prochain_code = 0
+        self._valeurs: Dict[int, Any] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._libres = list(range(capacite - 1, -1, -1))
+        self._jeton: Optional[str] = None
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.faux_succes = 0
+        self.verifications = 0
+        self.evictions = 0
+
+    def _vider(self):
+        self._contextes[:] = -1
+        self._codes_contexte.clear()
+        self._entrees_par_code.clear()
+        self._contexte_par_code.clear()
+        self._valeurs.clear()
+        self._lru.clear()
+        self._libres = list(range(self.capacite - 1, -1, -1))
+
+    def vider(self):
+        with self._verrou:
+            self._vider()
+
+    def _liberer(self, slot: int):
+        """Retire le contexte d'une entrée évincée ; le code disparaît avec sa dernière entrée."""
+        code = int(self._contextes[slot])
+        self._contextes[slot] = -1
+        self._entrees_par_code[code] -= 1
+        if not self._entrees_par_code[code]:
+            del self._entrees_par_code[code]
+            del self._codes_contexte[self._contexte_par_code.pop(code)]
+
+    def _code(self, contexte: str) -> int:
+        code = self._codes_contexte.get(contexte)
+        if code is None:
+            code = self._codes_contexte[contexte] = self._prochain_code
+            self._contexte_par_code[code] = contexte
+            self._entrees_par_code[code] = 0
+            self._prochain_code += 1
+        self._entrees_par_code[code] += 1
+        return code
+
+    def _verifier_jeton(self, jeton: Optional[str]):
+        if jeton is not None and jeton != self._jeton:
+            self._vider()
+            self._jeton = jeton
+
+    @staticmethod
+    def _normaliser(vecteur: np.ndarray) -> np.ndarray:
+        vecteur = np.asarray(vecteur, dtype=np.float32)
+        norme = float(np.linalg.norm(vecteur))
+        return vecteur / norme if norme > 0 else vecteur
+
+    def chercher(self, vecteur: np.ndarray, contexte: str = "", jeton: Optional[str] = None):
+        """
+        Returns:
+            (valeur, similarite) de l'entrée la plus proche au-dessus du seuil, sinon (None, meilleure similarité)
+        """
+        with self._verrou:
+            self._verifier_jeton(jeton)
+            code = self._codes_contexte.get(contexte)
+            if self._vecteurs is None or code is None or not self._valeurs:
+                self.echecs += 1
+                return None, 0.0
+            similarites = self._vecteurs @ self._normaliser(vecteur)
+            similarites[self._contextes != code] = -np.inf
+            slot = int(np.argmax(similarites))
+            meilleure = float(similarites[slot])
+            if meilleure < self.seuil:
+                self.echecs += 1
+                return None, meilleure
+            self._lru.move_to_end(slot)
+            self.succes += 1
+            return self._valeurs[slot], meilleure
+
+    def stocker(self, vecteur: np.ndarray, valeur: Any, contexte: str = "", jeton: Optional[str] = None):
+        with self._verrou:
+            self._verifier_jeton(jeton)
+            vecteur = self._normaliser(vecteur)
+            if self._vecteurs is None or self._vecteurs.shape[1] != vecteur.shape[0]:
+                self._vecteurs = np.zeros((self.capacite, vecteur.shape[0]), dtype=np.float32)
+                self._vider()
+            if self._libres:
+                slot = self._libres.pop()
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self._liberer(slot)
+                self.evictions += 1
+            self._vecteurs[slot] = vecteur
+            self._contextes[slot] = self._code(contexte)
+            self._valeurs[slot] = valeur
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def a_verifier(self) -> bool:
+        """Tirage : ce succès doit-il être contrôlé par une recherche complète ?"""
+        return self.taux_verification > 0 and random.random() < self.taux_verification
+
+    def enregistrer_verification(self, ids_caches, ids_frais) -> bool:
+        """
+        Compare les FilmID du cache à ceux d'une recherche complète.
+
+        Returns:
+            bool: True si le succès était un faux succès
+        """
+        ids_frais = list(ids_frais)
+        if not ids_frais:
+            return False
+        recouvrement = len(set(ids_caches) & set(ids_frais)) / len(ids_frais)
+        faux = recouvrement < self.recouvrement_min
+        with self._verrou:
+            self.verifications += 1
+            if faux:
+                self.faux_succes += 1
+        return faux
+
+    def __len__(self):
+        return len(self._valeurs)
+
+    @property
+    def taux_succes(self) -> float:
+        total = self.succes + self.echecs
+        return self.succes / total if total else 0.0
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "entrees": len(self._valeurs),
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": self.taux_succes,
+            "verifications": self.verifications,
+            "faux_succes": self.faux_succes,
+            "taux_faux_succes": self.faux_succes / self.verifications if self.verifications else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,414 @@
+"""
+Catalogue - Chargement en flux et validation du référentiel de films
+
+Lit le référentiel film par film (JSON, JSONL ou Parquet) sans charger tout le
+fichier en mémoire, valide chaque enregistrement et remplit au fil de l'eau la
+structure finale : des colonnes (CatalogueColonnes, artefact et encodage) ou
+la liste des films du moteur (CatalogueFilms). Les lignes invalides sont
+signalées sans interrompre le chargement.
+"""
+
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Iterator, Tuple, Optional
+import json
+import os
+
+import numpy as np
+
+CHAMPS_OBLIGATOIRES = ("FilmID", "BlockID", "Categorie", "Film", "Description", "Keywords")
+CHAMPS_OPTIONNELS = ("Annee", "Langue")
+
+# Alias acceptés pour les champs optionnels (cf. scoring.period_match_score / language_match_score)
+ALIAS = {"Year": "Annee", "Language": "Langue"}
+
+ANNEE_INCONNUE = 0
+TAILLE_BLOC = 1 << 16
+# Au-delà, un enregistrement est jugé corrompu plutôt que de remplir le tampon jusqu'à la fin du fichier
+TAILLE_MAX_ENREGISTREMENT = 1 << 24
+
+
+@dataclass
+class LigneInvalide:
+    position: int                   # rang du film dans le fichier (0-based)
+    film_id: Any
+    erreurs: List[str]
+
+
+@dataclass
+class CatalogueColonnes:
+    """
+    Référentiel stocké par colonnes : une liste (ou un tableau NumPy) par champ.
+    La ligne i de chaque colonne décrit le même film.
+    """
+    film_id: List[Any] = field(default_factory=list)
+    block_id: List[str] = field(default_factory=list)
+    categorie: List[str] = field(default_factory=list)
+    titre: List[str] = field(default_factory=list)
+    description: List[str] = field(default_factory=list)
+    keywords: List[str] = field(default_factory=list)
+    annee: Any = field(default_factory=lambda: array("i"))
+    langue: List[str] = field(default_factory=list)
+    extras: List[Optional[Dict[str, Any]]] = field(default_factory=list)
+    blocs: List[Dict[str, Any]] = field(default_factory=list)
+    invalides: List[LigneInvalide] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.film_id)
+
+    def ajouter(self, film: Dict[str, Any]):
+        self.film_id.append(film["FilmID"])
+        self.block_id.append(film["BlockID"])
+        self.categorie.append(film["Categorie"])
+        self.titre.append(film["Film"])
+        self.description.append(film["Description"])
+        self.keywords.append(film["Keywords"])
+        self.annee.append(film["Annee"] if film.get("Annee") is not None else ANNEE_INCONNUE)
+        self.langue.append(film.get("Langue") or "")
+        extras = {k: v for k, v in film.items() if k not in CHAMPS_OBLIGATOIRES and k not in CHAMPS_OPTIONNELS}
+        self.extras.append(extras or None)
+
+    def finaliser(self):
+        """Convertit les colonnes numériques en tableaux NumPy."""
+        self.annee = np.frombuffer(self.annee, dtype=np.int32).copy() if isinstance(self.annee, array) else self.annee
+        return self
+
+    def film(self, i: int) -> Dict[str, Any]:
+        """Reconstruit le dict d'un film au format du référentiel JSON."""
+        film = {
+            "FilmID": self.film_id[i],
+            "BlockID": self.block_id[i],
+            "Categorie": self.categorie[i],
+            "Film": self.titre[i],
+            "Description": self.description[i],
+            "Keywords": self.keywords[i],
+        }
+        if int(self.annee[i]) != ANNEE_INCONNUE:
+            film["Annee"] = int(self.annee[i])
+        if self.langue[i]:
+            film["Langue"] = self.langue[i]
+        if self.extras[i]:
+            film.update(self.extras[i])
+        return film
+
+
+@dataclass
+class CatalogueFilms:
+    """
+    Référentiel stocké film par film, directement au format historique
+    {'blocs': [...], 'films': [...]} attendu par nlp_engine (sans colonnes
+    intermédiaires). Chaque film est identique à `CatalogueColonnes.film(i)`.
+    """
+    films: List[Dict[str, Any]] = field(default_factory=list)
+    blocs: List[Dict[str, Any]] = field(default_factory=list)
+    invalides: List[LigneInvalide] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.films)
+
+    def ajouter(self, film: Dict[str, Any]):
+        forme = {champ: film[champ] for champ in CHAMPS_OBLIGATOIRES}
+        if film.get("Annee") is not None and film["Annee"] != ANNEE_INCONNUE:
+            forme["Annee"] = film["Annee"]
+        if film.get("Langue"):
+            forme["Langue"] = film["Langue"]
+        forme.update((k, v) for k, v in film.items() if k not in CHAMPS_OBLIGATOIRES and k not in CHAMPS_OPTIONNELS)
+        self.films.append(forme)
+
+    def finaliser(self):
+        return self
+
+    def film(self, i: int) -> Dict[str, Any]:
+        return self.films[i]
+
+    def vers_referentiel(self) -> Dict[str, Any]:
+        """Format historique {'blocs': [...], 'films': [...]} (les films ne sont pas copiés)."""
+        return {"blocs": self.blocs, "films": self.films}
+
+
+# ========== VALIDATION ==========
+def valider_film(film: Any) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Valide un enregistrement film.
+
+    Returns:
+        (film normalisé ou None, liste des erreurs)
+    """
+    if not isinstance(film, dict):
+        return None, [f"enregistrement de type {type(film).__name__}, objet attendu"]
+
+    film = dict(film)
+    for alias, canonique in ALIAS.items():
+        if alias in film:
+            valeur = film.pop(alias)
+            if film.get(canonique) is None:
+                film[canonique] = valeur
+    erreurs = []
+
+    for champ in CHAMPS_OBLIGATOIRES:
+        valeur = film.get(champ)
+        if valeur is None:
+            erreurs.append(f"champ obligatoire manquant : {champ}")
+        elif champ == "FilmID":
+            if not isinstance(valeur, (str, int)) or isinstance(valeur, bool) or valeur == "":
+                erreurs.append("FilmID doit être une chaîne ou un entier non vide")
+        elif not isinstance(valeur, str):
+            erreurs.append(f"{champ} doit être une chaîne")
+        elif champ != "Keywords" and not valeur.strip():
+            erreurs.append(f"{champ} est vide")
+
+    annee = film.get("Annee")
+    if annee is not None:
+        try:
+            film["Annee"] = int(annee)
+        except (TypeError, ValueError):
+            erreurs.append(f"Annee invalide : {annee!r}")
+
+    langue = film.get("Langue")
+    if langue is not None and not isinstance(langue, str):
+        erreurs.append("Langue doit être une chaîne")
+
+    return (None if erreurs else film), erreurs
+
+
+# ========== LECTURE EN FLUX ==========
+class _LecteurJSON:
+    """
+    Parcourt un référentiel JSON {"blocs": [...], "films": [...]} sans le charger
+    entièrement : les films sont décodés un par un depuis un tampon glissant.
+    """
+
+    def __init__(self, f, taille_bloc=TAILLE_BLOC, taille_max=TAILLE_MAX_ENREGISTREMENT):
+        self.f = f
+        self.taille_bloc = taille_bloc
+        self.taille_max = taille_max
+        self.decodeur = json.JSONDecoder()
+        self.tampon = ""
+        self.pos = 0
+        self.fin = False
+
+    def _remplir(self) -> bool:
+        if self.fin:
+            return False
+        morceau = self.f.read(self.taille_bloc)
+        if not morceau:
+            self.fin = True
+            return False
+        self.tampon = self.tampon[self.pos:] + morceau
+        self.pos = 0
+        return True
+
+    def _caractere(self) -> str:
+        """Prochain caractère non blanc (sans le consommer)."""
+        while True:
+            while self.pos < len(self.tampon) and self.tampon[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.tampon):
+                return self.tampon[self.pos]
+            if not self._remplir():
+                raise ValueError("fin de fichier inattendue")
+
+    def _attendre(self, c: str):
+        if self._caractere() != c:
+            raise ValueError(f"'{c}' attendu à la position {self.pos}")
+        self.pos += 1
+
+    def _valeur(self) -> Any:
+        self._caractere()
+        while True:
+            try:
+                valeur, fin = self.decodeur.raw_decode(self.tampon, self.pos)
+            except json.JSONDecodeError:
+                if len(self.tampon) - self.pos > self.taille_max:
+                    raise ValueError(f"valeur de plus de {self.taille_max} caractères à la position {self.pos}")
+                if not self._remplir():
+                    raise
+                continue
+            # Un nombre coupé en fin de tampon serait décodé partiellement
+            if fin == len(self.tampon) and not self.fin and self._remplir():
+                continue
+            self.pos = fin
+            return valeur
+
+    def _fin_element(self, sauter: bool = False) -> Optional[int]:
+        """
+        Position du ',' ou ']' qui termine l'élément de liste courant.
+
+        Sans `sauter`, seul le tampon est examiné (None si l'élément n'y est pas
+        complet) ; avec `sauter`, le fichier est lu et le tampon vidé au fur et à mesure.
+        """
+        i, profondeur, chaine, echappe = self.pos, 0, False, False
+        while True:
+            if i == len(self.tampon):
+                if not sauter:
+                    return None
+                self.pos = i
+                if not self._remplir():
+                    raise ValueError("fin de fichier inattendue")
+                i = 0
+                continue
+            c = self.tampon[i]
+            if chaine:
+                if echappe:
+                    echappe = False
+                elif c == "\\":
+                    echappe = True
+                elif c == '"':
+                    chaine = False
+            elif c == '"':
+                chaine = True
+            elif c in "[{":
+                profondeur += 1
+            elif c in "]}":
+                if profondeur == 0 and c == "]":
+                    return i
+                profondeur = max(profondeur - 1, 0)
+            elif c == "," and profondeur == 0:
+                return i
+            i += 1
+
+    def _film(self) -> Tuple[Optional[dict], Optional[str]]:
+        """(film, None), ou (None, motif) si l'enregistrement est illisible : il est alors sauté."""
+        self._caractere()
+        while True:
+            try:
+                valeur, fin = self.decodeur.raw_decode(self.tampon, self.pos)
+            except json.JSONDecodeError as e:
+                fin = self._fin_element()
+                if fin is not None:
+                    self.pos = fin
+                    return None, f"JSON invalide ({e.msg})"
+                if len(self.tampon) - self.pos > self.taille_max:
+                    self.pos = self._fin_element(sauter=True)
+                    return None, f"enregistrement de plus de {self.taille_max} caractères"
+                if not self._remplir():
+                    raise ValueError("fin de fichier inattendue")
+                continue
+            if fin == len(self.tampon) and not self.fin and self._remplir():
+                continue
+            self.pos = fin
+            if self._caractere() not in ",]":
+                self.pos = self._fin_element(sauter=True)
+                return None, "JSON invalide (données après le film)"
+            return valeur, None
+
+    def parcourir(self) -> Iterator[Tuple[str, Any]]:
+        """Produit ('film', dict) pour chaque film et (clé, valeur) pour les autres clés."""
+        self._attendre("{")
+        if self._caractere() == "}":
+            return
+        while True:
+            cle = self._valeur()
+            self._attendre(":")
+            if cle == "films":
+                self._attendre("[")
+                if self._caractere() == "]":
+                    self.pos += 1
+                else:
+                    numero = 0
+                    while True:
+                        numero += 1
+                        film, motif = self._film()
+                        if motif is None:
+                            yield "film", film
+                        else:
+                            yield "erreur", f"film {numero} : {motif}"
+                        c = self._caractere()
+                        self.pos += 1
+                        if c == "]":
+                            break
+                        if c != ",":
+                            raise ValueError(f"',' ou ']' attendu à la position {self.pos - 1}")
+            else:
+                yield cle, self._valeur()
+            c = self._caractere()
+            self.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                raise ValueError(f"',' ou '}}' attendu à la position {self.pos - 1}")
+
+
+def _parcourir_jsonl(chemin: str) -> Iterator[Tuple[str, Any]]:
+    """Une ligne = un film. Les lignes illisibles sont signalées, pas bloquantes."""
+    with open(chemin, "r", encoding="utf-8") as f:
+        for numero, ligne in enumerate(f, 1):
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                yield "film", json.loads(ligne)
+            except json.JSONDecodeError as e:
+                yield "erreur", f"ligne {numero} : JSON invalide ({e.msg})"
+
+
+def _parcourir_parquet(chemin: str, taille_lot: int = 8192) -> Iterator[Tuple[str, Any]]:
+    import pyarrow.parquet as pq
+
+    fichier = pq.ParquetFile(chemin)
+    for lot in fichier.iter_batches(batch_size=taille_lot):
+        for film in lot.to_pylist():
+            yield "film", {k: v for k, v in film.items() if v is not None}
+
+
+def parcourir_referentiel(chemin: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Itère sur le référentiel selon l'extension du fichier (.json, .jsonl, .parquet).
+    """
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        yield from _parcourir_jsonl(chemin)
+    elif extension == ".parquet":
+        yield from _parcourir_parquet(chemin)
+    else:
+        with open(chemin, "r", encoding="utf-8") as f:
+            yield from _LecteurJSON(f).parcourir()
+
+
+def charger_catalogue(chemin: str = "referentiel_films.json", catalogue=None):
+    """
+    Charge le référentiel en flux et le valide film par film.
+
+    Args:
+        chemin: Fichier .json, .jsonl/.ndjson ou .parquet
+        catalogue: Structure remplie au fil de l'eau (CatalogueColonnes par
+            défaut, CatalogueFilms pour la liste de films du moteur)
+
+    Returns:
+        Le catalogue : films valides, avec la liste des lignes invalides
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas
+        ValueError: Si la structure JSON globale est illisible
+    """
+    catalogue = CatalogueColonnes() if catalogue is None else catalogue
+    vus = set()
+    position = 0
+
+    for cle, valeur in parcourir_referentiel(chemin):
+        if cle == "blocs" and isinstance(valeur, list):
+            catalogue.blocs = valeur
+            continue
+        if cle == "erreur":
+            catalogue.invalides.append(LigneInvalide(position, None, [valeur]))
+            position += 1
+            continue
+        if cle != "film":
+            continue
+
+        film, erreurs = valider_film(valeur)
+        film_id = valeur.get("FilmID") if isinstance(valeur, dict) else None
+        if film is not None and film["FilmID"] in vus:
+            film, erreurs = None, [f"FilmID en double : {film['FilmID']}"]
+        if film is None:
+            catalogue.invalides.append(LigneInvalide(position, film_id, erreurs))
+        else:
+            vus.add(film["FilmID"])
+            catalogue.ajouter(film)
+        position += 1
+
+    for ligne in catalogue.invalides:
+        print(f"⚠️ Film ignoré (position {ligne.position}, FilmID={ligne.film_id}) : {'; '.join(ligne.erreurs)}")
+
+    return catalogue.finaliser()
@@ -0,0 +1,203 @@
+"""
+Encodage massif - Encodage parallèle et reprenable des très grands catalogues
+
+Le catalogue est découpé en chunks de films encodés par un pool de processus
+(un modèle SBERT par worker, threads torch limités pour ne pas surcharger les
+cœurs). Chaque chunk terminé est sauvegardé sur disque : après une
+interruption, seuls les chunks manquants sont encodés. Les chunks sont enfin
+assemblés en une seule matrice (n, d) float32.
+
+Un chunk est identifié par son indice et une empreinte de ses textes, du
+modèle et du pooling des textes longs : un film modifié ne fait ré-encoder
+que son chunk, un autre pooling ré-encode tout.
+
+Usage :
+    python encodage_massif.py referentiel_films.json --dossier encodage --workers 4
+    python encodage_massif.py referentiel_films.json --artefact catalogue.arrow
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from catalogue import charger_catalogue
+from nlp_engine import MODEL_NAME, POOLING_DEFAUT, texte_film
+
+TAILLE_CHUNK = 4096
+NOM_MATRICE = "embeddings.npy"
+
+_modele_worker = None
+
+
+# ========== WORKERS ==========
+def _initialiser_worker(threads: int):
+    """Initialisation d'un worker : limite des threads torch puis chargement du modèle."""
+    global _modele_worker
+    import torch
+    from nlp_engine import charger_modele
+
+    torch.set_num_threads(threads)
+    _modele_worker = charger_modele()
+
+
+def _encoder_chunk(indice: int, textes: List[str], chemin: str, batch_size: int, pooling: str):
+    """
+    Encode un chunk et l'écrit de façon atomique.
+
+    Returns:
+        tuple: (indice, nombre de films, durée en s, pid du worker)
+    """
+    from nlp_engine import encoder_textes
+
+    debut = time.perf_counter()
+    embeddings = encoder_textes(_modele_worker, textes, batch_size=batch_size, pooling=pooling)
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(temporaire, chemin)
+    return indice, len(textes), time.perf_counter() - debut, os.getpid()
+
+
+# ========== CHUNKS ==========
+def empreinte_chunk(textes: List[str], nom_modele: str = MODEL_NAME, pooling: str = POOLING_DEFAUT) -> str:
+    """Empreinte du contenu d'un chunk (textes + modèle + pooling) : change si un film du chunk change."""
+    h = hashlib.sha1(f"{nom_modele}\0{pooling}\0".encode("utf-8"))
+    for texte in textes:
+        h.update(texte.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _chemin_chunk(dossier: str, indice: int, empreinte: str) -> str:
+    return os.path.join(dossier, f"chunk_{indice:06d}_{empreinte}.npy")
+
+
+def _nettoyer(dossier: str, attendus: set):
+    """Supprime les chunks périmés (autre découpage, films modifiés) et les écritures interrompues."""
+    for chemin in glob.glob(os.path.join(dossier, "chunk_*.npy*")):
+        if chemin not in attendus:
+            os.remove(chemin)
+
+
+def _assembler_chunks(chemins: List[str], chemin_sortie: str) -> np.ndarray:
+    """Concatène les chunks dans une matrice .npy (écrite en mémoire mappée)."""
+    chunks_lus = [np.load(c, mmap_mode="r") for c in chemins]
+    n = sum(len(p) for p in chunks_lus)
+    dimension = chunks_lus[0].shape[1] if chunks_lus else 0
+    temporaire = chemin_sortie + ".tmp"
+    matrice = np.lib.format.open_memmap(temporaire, mode="w+", dtype=np.float32, shape=(n, dimension))
+    ligne = 0
+    for chunk in chunks_lus:
+        matrice[ligne:ligne + len(chunk)] = chunk
+        ligne += len(chunk)
+    matrice.flush()
+    del matrice
+    os.replace(temporaire, chemin_sortie)
+    return np.load(chemin_sortie, mmap_mode="r")
+
+
+# ========== ENCODAGE ==========
+def encoder_en_parallele(
+    textes: List[str],
+    dossier: str = "encodage",
+    workers: Optional[int] = None,
+    threads_par_worker: Optional[int] = None,
+    taille_chunk: int = TAILLE_CHUNK,
+    batch_size: int = 64,
+    pooling: str = POOLING_DEFAUT
+) -> np.ndarray:
+    """
+    Encode `textes` par chunks sur un pool de processus, avec reprise.
+
+    Args:
+        textes: Textes à encoder (ex. texte_film de chaque film)
+        dossier: Dossier des chunks sauvegardés et de la matrice finale
+        workers: Nombre de processus (défaut : nombre de cœurs)
+        threads_par_worker: Threads torch par worker (défaut : cœurs / workers)
+        taille_chunk: Nombre de films par chunk (granularité de la reprise)
+        pooling: Regroupement des chunks de tokens des textes longs ("mean" / "max")
+
+    Returns:
+        np.ndarray: Matrice (n, d) float32 normalisée, en mémoire mappée
+    """
+    os.makedirs(dossier, exist_ok=True)
+    coeurs = os.cpu_count() or 1
+    workers = workers or coeurs
+    threads_par_worker = threads_par_worker or max(1, coeurs // workers)
+
+    chunks = []
+    for indice, debut in enumerate(range(0, len(textes), taille_chunk)):
+        textes_chunk = textes[debut:debut + taille_chunk]
+        chunks.append((indice, textes_chunk, _chemin_chunk(dossier, indice, empreinte_chunk(textes_chunk, pooling=pooling))))
+    _nettoyer(dossier, {chemin for _, _, chemin in chunks})
+
+    a_faire = [c for c in chunks if not os.path.exists(c[2])]
+    deja_faits = len(chunks) - len(a_faire)
+    print(f"📦 Encodage : {len(textes)} films, {len(chunks)} chunks "
+          f"({deja_faits} déjà encodés), {workers} workers x {threads_par_worker} threads")
+
+    par_worker: Dict[int, List[float]] = {}
+    debut_total = time.perf_counter()
+    if a_faire:
+        contexte = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(a_faire)),
+            mp_context=contexte,
+            initializer=_initialiser_worker,
+            initargs=(threads_par_worker,)
+        ) as pool:
+            futures = [pool.submit(_encoder_chunk, indice, t, chemin, batch_size, pooling) for indice, t, chemin in a_faire]
+            for termines, future in enumerate(as_completed(futures), start=1):
+                indice, n, duree, pid = future.result()
+                stats = par_worker.setdefault(pid, [0, 0.0])
+                stats[0] += n
+                stats[1] += duree
+                print(f"✅ Chunk {indice} ({n} films, {n / duree:.0f} films/s) - "
+                      f"{termines}/{len(a_faire)}")
+    duree_totale = time.perf_counter() - debut_total
+
+    matrice = _assembler_chunks([chemin for _, _, chemin in chunks], os.path.join(dossier, NOM_MATRICE))
+
+    for pid, (n, duree) in sorted(par_worker.items()):
+        print(f"   worker {pid} : {n} films, {n / duree:.0f} films/s")
+    encodes = sum(n for n, _ in par_worker.values())
+    if encodes:
+        print(f"✅ Total : {encodes} films encodés en {duree_totale:.1f} s ({encodes / duree_totale:.0f} films/s)")
+    return matrice
+
+
+def encoder_referentiel(chemin_referentiel: str, dossier: str = "encodage", **options) -> np.ndarray:
+    """Encode tous les films d'un référentiel (JSON, JSONL ou Parquet), dans l'ordre du fichier."""
+    catalogue = charger_catalogue(chemin_referentiel)
+    textes = [texte_film(catalogue.film(i)) for i in range(len(catalogue))]
+    return encoder_en_parallele(textes, dossier, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode un grand catalogue en parallèle, avec reprise.")
+    parser.add_argument("referentiel", nargs="?", default="referentiel_films.json")
+    parser.add_argument("--dossier", default="encodage", help="Chunks et matrice finale")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None, help="Threads torch par worker")
+    parser.add_argument("--taille-chunk", type=int, default=TAILLE_CHUNK)
+    parser.add_argument("--pooling", choices=("mean", "max"), default=POOLING_DEFAUT)
+    parser.add_argument("--artefact", default=None, help="Écrit aussi l'artefact Arrow avec ces embeddings")
+    parser.add_argument("--champs", action="store_true", help="Stocke aussi les vecteurs par champ dans l'artefact")
+    args = parser.parse_args()
+
+    embeddings = encoder_referentiel(
+        args.referentiel, args.dossier,
+        workers=args.workers, threads_par_worker=args.threads, taille_chunk=args.taille_chunk,
+        pooling=args.pooling
+    )
+    if args.artefact:
+        from artefact_catalogue import convertir
+        convertir(args.referentiel, args.artefact, embeddings=embeddings, champs=args.champs, pooling=args.pooling)
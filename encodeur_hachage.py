@@ -0,0 +1,74 @@
+"""
+Encodeur haché - Encodeur déterministe à l'interface de SentenceTransformer
+
+Sac de mots haché (md5 de chaque mot en minuscules, deux dimensions par mot) :
+deux textes qui partagent des mots sont proches, sans modèle à télécharger.
+Il sert aux classements de référence versionnés (regression_classements.py)
+et aux tests : le moteur, le découpage des textes longs (tokenizer avec
+offsets, max_seq_length) et l'artefact l'utilisent comme le modèle SBERT.
+"""
+
+from typing import List
+import hashlib
+import re
+
+import numpy as np
+
+NOM_ENCODEUR = "hachage-sac-de-mots"
+DIMENSION = 384
+
+_MOTS = re.compile(r"\w+")
+_TOKENS = re.compile(r"\w+|[^\w\s]")
+
+
+class _Tokenizer:
+    """Tokens = mots et signes de ponctuation (offsets en caractères)."""
+
+    def __call__(self, textes: List[str], add_special_tokens: bool = True,
+                 return_offsets_mapping: bool = False, **kwargs):
+        spans = [[m.span() for m in _TOKENS.finditer(texte)] for texte in textes]
+        speciaux = 2 if add_special_tokens else 0
+        sortie = {"input_ids": [[0] * (len(s) + speciaux) for s in spans]}
+        if return_offsets_mapping:
+            sortie["offset_mapping"] = spans
+        return sortie
+
+
+class EncodeurHachage:
+    """
+    Args:
+        dimension: Taille des vecteurs
+
+    `textes_encodes` compte les textes passés à `encode` (ré-encodages évités).
+    """
+
+    max_seq_length = 256
+
+    def __init__(self, dimension: int = DIMENSION):
+        self.dimension = dimension
+        self.tokenizer = _Tokenizer()
+        self.textes_encodes = 0
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _vecteur(self, texte: str) -> np.ndarray:
+        vecteur = np.zeros(self.dimension, dtype=np.float32)
+        for mot in _MOTS.findall(texte.lower()):
+            h = int(hashlib.md5(mot.encode("utf-8")).hexdigest(), 16)
+            vecteur[h % self.dimension] += 1.0
+            vecteur[(h >> 16) % self.dimension] += 0.5
+        return vecteur
+
+    def encode(self, textes, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        seul = isinstance(textes, str)
+        textes = [textes] if seul else list(textes)
+        self.textes_encodes += len(textes)
+        if textes:
+            matrice = np.stack([self._vecteur(texte) for texte in textes])
+        else:
+            matrice = np.zeros((0, self.dimension), dtype=np.float32)
+        if normalize_embeddings:
+            normes = np.linalg.norm(matrice, axis=1, keepdims=True)
+            matrice = matrice / np.where(normes == 0, 1.0, normes)
+        return matrice[0] if seul else matrice
@@ -0,0 +1,229 @@
+"""
+File d'inférence - Un seul thread propriétaire du modèle SBERT
+
+Streamlit exécute chaque session dans son propre thread : sans coordination,
+plusieurs `model.encode` tournent en même temps sur le même modèle et se
+disputent les threads torch. Ici, un worker unique possède le modèle et
+consomme une file de demandes d'encodage : tout ce qui est en attente quand
+il se libère est regroupé en un seul batch. Les appelants reçoivent un
+Future (ou attendent le résultat via `encode`).
+
+`FileInference` expose l'interface du SentenceTransformer utilisée par
+nlp_engine (`encode`, `tokenizer`, `max_seq_length`,
+`get_sentence_embedding_dimension`) : il se substitue au modèle sans
+changer les appelants.
+
+Les gros encodages (rechargement du catalogue) sont découpés en lots de
+`taille_batch_max` textes et passent après les requêtes interactives.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+TAILLE_BATCH_MAX = 64
+
+PRIORITE_INTERACTIVE = 0
+PRIORITE_MASSIVE = 1
+_PRIORITE_ARRET = 2
+
+
+@dataclass
+class _Travail:
+    future: Future
+    textes: Optional[List[str]] = None          # demande d'encodage
+    options: Dict[str, Any] = field(default_factory=dict)
+    appel: Optional[Callable[[], Any]] = None   # autre appel au modèle (tokenizer)
+    soumis: float = field(default_factory=time.perf_counter)
+
+
+class _TokenizerEnFile:
+    """Tokenizer du modèle, appelé dans le thread du worker."""
+
+    def __init__(self, file: "FileInference"):
+        self._file = file
+
+    def __call__(self, *args, **kwargs):
+        tokenizer = self._file.modele.tokenizer
+        return self._file.executer(lambda: tokenizer(*args, **kwargs)).result()
+
+
+class FileInference:
+    """
+    Worker d'inférence : possède le modèle, regroupe les demandes en batchs.
+
+    Args:
+        model: SentenceTransformer chargé (n'est plus appelé que par le worker)
+        taille_batch_max: Nombre de textes au-delà duquel les demandes en
+            attente ne sont plus ajoutées au batch courant
+    """
+
+    def __init__(self, model, taille_batch_max: int = TAILLE_BATCH_MAX):
+        self.modele = model
+        self.taille_batch_max = taille_batch_max
+        self._file: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._verrou = threading.Lock()
+        self._compteurs = {'demandes': 0, 'batchs': 0, 'textes': 0, 'taille_max': 0, 'derniere_taille': 0,
+                           'attente_s': 0.0, 'encodage_s': 0.0, 'erreurs': 0}
+        self._thread = threading.Thread(target=self._boucle, name="inference-sbert", daemon=True)
+        self._thread.start()
+
+    # ----- Interface SentenceTransformer -----
+    @property
+    def max_seq_length(self):
+        return self.modele.max_seq_length
+
+    @property
+    def tokenizer(self):
+        return _TokenizerEnFile(self)
+
+    def get_sentence_embedding_dimension(self):
+        return self.modele.get_sentence_embedding_dimension()
+
+    def encode(self, textes, **options):
+        """Comme SentenceTransformer.encode (sorties numpy) : attend le résultat du worker."""
+        unique = isinstance(textes, str)
+        embeddings = self.soumettre([textes] if unique else list(textes), **options).result()
+        return embeddings[0] if unique else embeddings
+
+    # ----- Soumission -----
+    def soumettre(self, textes: List[str], **options) -> Future:
+        """
+        Ajoute une demande d'encodage à la file.
+
+        Returns:
+            Future dont le résultat est la matrice (n, d) des textes, dans l'ordre
+        """
+        options = {cle: valeur for cle, valeur in options.items() if cle != 'convert_to_tensor'}
+        options['convert_to_numpy'] = True
+        if len(textes) <= self.taille_batch_max:
+            return self._ajouter(_Travail(Future(), textes=list(textes), options=options), PRIORITE_INTERACTIVE)
+
+        lots = [
+            self._ajouter(_Travail(Future(), textes=textes[debut:debut + self.taille_batch_max], options=options),
+                          PRIORITE_MASSIVE)
+            for debut in range(0, len(textes), self.taille_batch_max)
+        ]
+        resultat = Future()
+        restants = [len(lots)]
+        verrou = threading.Lock()
+
+        def termine(_):
+            with verrou:
+                restants[0] -= 1
+                if restants[0]:
+                    return
+            erreurs = [lot.exception() for lot in lots if lot.exception() is not None]
+            if erreurs:
+                resultat.set_exception(erreurs[0])
+            else:
+                resultat.set_result(np.concatenate([lot.result() for lot in lots]))
+
+        for lot in lots:
+            lot.add_done_callback(termine)
+        return resultat
+
+    def executer(self, fonction: Callable[[], Any]) -> Future:
+        """Exécute `fonction` dans le thread du worker (accès au modèle hors encodage)."""
+        return self._ajouter(_Travail(Future(), appel=fonction), PRIORITE_INTERACTIVE)
+
+    def _ajouter(self, travail: _Travail, priorite: int) -> Future:
+        with self._verrou:
+            self._compteurs['demandes'] += 1
+        self._file.put((priorite, next(self._sequence), travail))
+        return travail.future
+
+    def arreter(self):
+        """Termine les demandes en attente puis arrête le worker."""
+        self._file.put((_PRIORITE_ARRET, next(self._sequence), None))
+        self._thread.join()
+
+    # ----- Worker -----
+    def _boucle(self):
+        while True:
+            _, _, travail = self._file.get()
+            if travail is None:
+                return
+            lot = [travail]
+            textes = len(travail.textes or ())
+            while textes < self.taille_batch_max:
+                try:
+                    element = self._file.get_nowait()
+                except queue.Empty:
+                    break
+                if element[2] is None:
+                    self._file.put(element)
+                    break
+                lot.append(element[2])
+                textes += len(element[2].textes or ())
+            self._traiter(lot)
+
+    def _traiter(self, lot: List[_Travail]):
+        debut = time.perf_counter()
+        attente = sum(debut - travail.soumis for travail in lot)
+        groupes: Dict[tuple, List[_Travail]] = {}
+        for travail in lot:
+            if travail.appel is not None:
+                self._resoudre(travail, travail.appel)
+            else:
+                cle = tuple(sorted((k, v) for k, v in travail.options.items() if k != 'batch_size'))
+                groupes.setdefault(cle, []).append(travail)
+
+        textes = 0
+        for travaux in groupes.values():
+            tous = [texte for travail in travaux for texte in travail.textes]
+            textes += len(tous)
+            try:
+                options = dict(travaux[0].options, batch_size=max(len(tous), 1))
+                embeddings = self.modele.encode(tous, **options)
+            except Exception as e:
+                for travail in travaux:
+                    travail.future.set_exception(e)
+                with self._verrou:
+                    self._compteurs['erreurs'] += 1
+                continue
+            position = 0
+            for travail in travaux:
+                travail.future.set_result(embeddings[position:position + len(travail.textes)])
+                position += len(travail.textes)
+
+        with self._verrou:
+            if textes:
+                self._compteurs['batchs'] += 1
+                self._compteurs['textes'] += textes
+                self._compteurs['taille_max'] = max(self._compteurs['taille_max'], textes)
+                self._compteurs['derniere_taille'] = textes
+                self._compteurs['encodage_s'] += time.perf_counter() - debut
+            self._compteurs['attente_s'] += attente
+
+    def _resoudre(self, travail: _Travail, fonction: Callable[[], Any]):
+        try:
+            travail.future.set_result(fonction())
+        except Exception as e:
+            travail.future.set_exception(e)
+
+    # ----- Métriques -----
+    def metriques(self) -> Dict[str, Any]:
+        """Profondeur de la file, tailles de batch et temps d'attente / d'encodage moyens."""
+        with self._verrou:
+            c = dict(self._compteurs)
+        return {
+            'profondeur': self._file.qsize(),
+            'demandes': c['demandes'],
+            'batchs': c['batchs'],
+            'textes': c['textes'],
+            'taille_moyenne': c['textes'] / c['batchs'] if c['batchs'] else 0.0,
+            'taille_max': c['taille_max'],
+            'derniere_taille': c['derniere_taille'],
+            'attente_moyenne_ms': 1000 * c['attente_s'] / c['demandes'] if c['demandes'] else 0.0,
+            'encodage_moyen_ms': 1000 * c['encodage_s'] / c['batchs'] if c['batchs'] else 0.0,
+            'erreurs': c['erreurs'],
+        }
@@ -0,0 +1,220 @@
+"""
+Filtres stricts - Masques booléens précalculés sur le catalogue
+
+Les critères période / langue / genre sont d'habitude des scores "doux"
+(voir scoring.py). En mode strict, ils restreignent d'abord l'ensemble des
+candidats : la similarité n'est alors calculée que sur les films retenus.
+
+Un film dont la métadonnée est absente (pas d'année, pas de langue) n'est
+jamais exclu : les scores de scoring.py le considèrent neutre.
+
+`Exclusions` porte les exclusions propres à un utilisateur (films déjà vus ou
+rejetés, genres bloqués), appliquées au même endroit que les filtres stricts.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+from scoring import period_match_score, language_match_score
+
+PERIODES = [
+    "Peu importe",
+    "Classiques (avant 1980)",
+    "Années 80-90",
+    "Années 2000-2010",
+    "Récents (2010+)",
+]
+
+LANGUES = [
+    "Peu importe",
+    "Anglais",
+    "Français",
+    "Japonais (Animation)",
+    "Autres",
+]
+
+
+@dataclass(frozen=True)
+class MasquesCatalogue:
+    periode: Dict[str, np.ndarray]      # option -> masque (n,) bool
+    langue: Dict[str, np.ndarray]       # option -> masque (n,) bool
+    categories: List[str]               # catégories distinctes
+    code_categorie: np.ndarray          # (n,) int32, index dans `categories`
+
+    def masque(self, reponses: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Masque des films admissibles pour une requête, ou None si aucun filtre ne s'applique.
+
+        Clés lues dans les réponses :
+            - periode, langue : options du questionnaire
+            - genre_min : note minimale (1-5) d'un genre pour garder ses films
+        """
+        masque = None
+
+        periode = reponses.get("periode") or "Peu importe"
+        if periode in self.periode:
+            masque = self.periode[periode]
+
+        langue = reponses.get("langue") or "Peu importe"
+        if langue in self.langue:
+            masque = self.langue[langue] if masque is None else (masque & self.langue[langue])
+
+        genre_min = reponses.get("genre_min")
+        prefs = reponses.get("preferences") or {}
+        if genre_min and prefs:
+            genres_ok = np.array(
+                [prefs.get(cat, genre_min) >= genre_min for cat in self.categories] or [True],
+                dtype=bool,
+            )
+            masque_genre = genres_ok[self.code_categorie]
+            masque = masque_genre if masque is None else (masque & masque_genre)
+
+        return masque
+
+
+def _encoder(valeurs: List[Any]) -> Tuple[List[Any], np.ndarray]:
+    """(valeurs distinctes par ordre d'apparition, code (n,) int32 de chaque film)."""
+    distinctes = {}
+    codes = np.empty(len(valeurs), dtype=np.int32)
+    for i, v in enumerate(valeurs):
+        codes[i] = distinctes.setdefault(v, len(distinctes))
+    return list(distinctes), codes
+
+
+def _encoder_colonne(colonne) -> Tuple[List[Any], np.ndarray]:
+    """Même résultat que `_encoder`, calculé par Arrow sur une colonne de l'artefact."""
+    encodee = colonne.combine_chunks().dictionary_encode(null_encoding="encode")
+    return encodee.dictionary.to_pylist(), encodee.indices.to_numpy(zero_copy_only=False).astype(np.int32)
+
+
+def _metadonnees(films) -> tuple:
+    """
+    (categories, annees, langues) encodées par `_encoder`, films en dicts ou
+    vue artefact (colonnes Arrow encodées sans passer par les films).
+    """
+    if hasattr(films, "colonne_arrow"):
+        categories, annees, langues = (_encoder_colonne(films.colonne_arrow(nom))
+                                       for nom in ("Categorie", "Annee", "Langue"))
+        return categories, ([a or None for a in annees[0]], annees[1]), langues
+    categories = [str(f.get("Categorie", "")) for f in films]
+    annees = [f.get("Annee", f.get("Year")) for f in films]
+    langues = [f.get("Langue", f.get("Language")) for f in films]
+    return _encoder(categories), _encoder(annees), _encoder(langues)
+
+
+def _masque_par_valeur(encodees: Tuple[List[Any], np.ndarray], garder) -> np.ndarray:
+    """
+    Évalue `garder(valeur)` une fois par valeur distincte puis diffuse sur le catalogue.
+    """
+    distinctes, codes = encodees
+    table = np.array([garder(v) for v in distinctes] or [True], dtype=bool)
+    return table[codes]
+
+
+def construire_masques(films) -> MasquesCatalogue:
+    """
+    Précalcule les masques de toutes les options de période et de langue.
+
+    Un film est exclu par une option seulement si scoring lui donnerait 0.
+    """
+    categories, annees, langues = _metadonnees(films)
+
+    periode = {
+        option: _masque_par_valeur(annees, lambda a, o=option: period_match_score(o, {"Annee": a}) > 0.0)
+        for option in PERIODES if option != "Peu importe"
+    }
+    langue = {
+        option: _masque_par_valeur(langues, lambda l, o=option: language_match_score(o, {"Langue": l}) > 0.0)
+        for option in LANGUES if option != "Peu importe"
+    }
+
+    distinctes, code_categorie = categories
+    return MasquesCatalogue(
+        periode=periode,
+        langue=langue,
+        categories=distinctes,
+        code_categorie=code_categorie,
+    )
+
+
+class Exclusions:
+    """
+    Films et genres exclus pour un utilisateur (à garder en session).
+
+    Les FilmID et genres sont stockés tels quels ; le masque aligné sur la
+    matrice d'un état du catalogue est calculé à la demande et gardé en bitset
+    (n / 8 octets), recalculé seulement si l'état ou les exclusions changent.
+    """
+
+    def __init__(self, films: Iterable[Any] = (), genres: Iterable[str] = ()):
+        self.films = set(films)
+        self.genres = set(genres)
+        self.revision = 0
+        self._bitset = None        # (etat, revision, bits empaquetés, nombre d'exclus)
+        self._verrou = threading.Lock()
+
+    def _modifier(self):
+        self.revision += 1
+
+    def exclure_film(self, film_id):
+        if film_id not in self.films:
+            self.films.add(film_id)
+            self._modifier()
+
+    def retablir_film(self, film_id):
+        if film_id in self.films:
+            self.films.discard(film_id)
+            self._modifier()
+
+    def vider_films(self):
+        if self.films:
+            self.films.clear()
+            self._modifier()
+
+    def definir_genres(self, genres: Iterable[str]):
+        genres = set(genres)
+        if genres != self.genres:
+            self.genres = genres
+            self._modifier()
+
+    def __bool__(self):
+        return bool(self.films or self.genres)
+
+    def empreinte(self) -> str:
+        """Clé courte pour les caches (deux ensembles égaux ont la même empreinte)."""
+        brut = json.dumps([sorted(map(str, self.films)), sorted(self.genres)], ensure_ascii=False)
+        return hashlib.sha1(brut.encode("utf-8")).hexdigest()[:16]
+
+    def _calculer(self, etat) -> np.ndarray:
+        n = len(etat.films)
+        exclus = np.zeros(n, dtype=bool)
+        lignes = [etat.index[f] for f in self.films if f in etat.index]
+        if lignes:
+            exclus[lignes] = True
+        if self.genres and etat.masques is not None:
+            codes = [i for i, cat in enumerate(etat.masques.categories) if cat in self.genres]
+            if codes:
+                exclus |= np.isin(etat.masques.code_categorie, codes)
+        return exclus
+
+    def masque(self, etat) -> Optional[np.ndarray]:
+        """
+        Masque (n,) bool des films exclus dans `etat`, ou None si rien n'est exclu.
+        """
+        if not self:
+            return None
+        with self._verrou:
+            cache = self._bitset
+            if cache is None or cache[0] is not etat or cache[1] != self.revision:
+                exclus = self._calculer(etat)
+                cache = (etat, self.revision, np.packbits(exclus), int(exclus.sum()))
+                self._bitset = cache
+        if cache[3] == 0:
+            return None
+        return np.unpackbits(cache[2], count=len(etat.films)).view(bool)
@@ -2,14 +2,23 @@
 Module GenAI (Gemini) :
 - Génère une explication personnalisée "Pourquoi ce film" + pitch court
 - Fallback automatique si pas de clé API (ne casse pas l'app)
+- Couche de résilience : limiteur de débit (token bucket), retries avec
+  backoff + jitter sur erreurs transitoires, disjoncteur (circuit breaker)
 
 Nécessite une variable d'env:
 - GOOGLE_API_KEY (recommandé) ou GEMINI_API_KEY
 """
 
 from __future__ import annotations
+import json
 import os
-from typing import Dict, Any, Optional
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Iterable, Iterator
 
 try:
     import google.generativeai as genai
@@ -21,45 +30,472 @@ def _get_api_key() -> Optional[str]:
     return os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 
 
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+# Modèle injecté (ex: FakeGenerativeModel) à la place du vrai client Gemini
+_installed_model = None
+_real_model = None
+_model_lock = threading.Lock()
+
+
 def gemini_available() -> bool:
+    if _installed_model is not None:
+        return True
     return genai is not None and bool(_get_api_key())
 
 
-def generate_explanation(
-    user_answers: Dict[str, Any],
-    film: Dict[str, Any],
-    score_final: float,
-    max_chars: int = 420
-) -> str:
+def install_model(model) -> None:
     """
-    Retourne une explication en FR.
-    Si Gemini indisponible => fallback deterministe.
+    Remplace le client Gemini par un objet exposant `generate_content(prompt, **kwargs)`.
+    `install_model(None)` rétablit le vrai client.
     """
-    if not gemini_available():
-        return (
-            f"Ce film correspond à tes envies (score {score_final:.0%}). "
-            f"Il partage des thèmes proches de ta description et de l’ambiance recherchée, "
-            f"et il est aligné avec tes préférences de genre."
-        )
+    global _installed_model
+    _installed_model = model
+
+
+def _get_model():
+    global _real_model
+    if _installed_model is not None:
+        return _installed_model
+    with _model_lock:
+        if _real_model is None:
+            genai.configure(api_key=_get_api_key())
+            _real_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        return _real_model
+
+
+# ========== RÉSILIENCE ==========
+@dataclass
+class ResilienceConfig:
+    requests_per_minute: float = 15.0   # quota Gemini (gemini-1.5-flash, palier gratuit)
+    burst: int = 5                      # jetons disponibles d'un coup
+    acquire_timeout: float = 1.0        # attente max d'un jeton avant fallback (s)
+    request_timeout: float = 8.0        # timeout d'un appel Gemini (s)
+    max_retries: int = 2                # retries sur erreur transitoire
+    backoff_base: float = 0.4           # backoff exponentiel : base * 2^tentative (s)
+    backoff_max: float = 3.0
+    failure_threshold: int = 3          # échecs consécutifs avant ouverture du disjoncteur
+    reset_timeout: float = 30.0         # durée d'ouverture avant un essai (half-open)
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` jetons par seconde, au plus `capacity` en réserve."""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self) -> float:
+        """Prend un jeton si possible ; sinon retourne le délai d'attente (s) avant le prochain."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = self._clock() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return True
+            if self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold échecs consécutifs) -> open
+    open -> (reset_timeout écoulé) -> half_open : un seul appel d'essai
+    half_open -> succès : closed / échec : open
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self._clock()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Libère l'essai half_open réservé par `allow` quand l'appel n'a pas été tenté."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class GeminiUnavailable(RuntimeError):
+    """Appel non tenté ou abandonné (disjoncteur ouvert, quota, erreurs répétées)."""
+
+
+# Erreurs transitoires (google.api_core.exceptions) identifiées par nom de classe
+_TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "DeadlineExceeded", "InternalServerError", "GatewayTimeout", "Aborted",
+}
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return type(exc).__name__ in _TRANSIENT_ERRORS
+
+
+class ResilientCaller:
+    """
+    Enveloppe les appels Gemini : limiteur de débit, retries, disjoncteur, métriques.
+    """
+
+    def __init__(self, config: Optional[ResilienceConfig] = None, sleep: Callable[[float], None] = time.sleep):
+        self.config = config or ResilienceConfig()
+        self.bucket = TokenBucket(self.config.requests_per_minute / 60.0, self.config.burst)
+        self.breaker = CircuitBreaker(self.config.failure_threshold, self.config.reset_timeout)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=200)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "short_circuited": 0,
+            "rate_limited": 0,
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter" : délai uniforme dans [0, base * 2^tentative]
+        cap = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+        return random.uniform(0.0, cap)
 
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Exécute `fn` sous protection. Lève GeminiUnavailable si l'appel est
+        court-circuité ou échoue après les retries.
+        """
+        result = self._attempt(fn)
+        self._record_success()
+        return result
+
+    def stream(self, fn: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Comme `call` pour un appel streamé : `fn` ouvre le flux, dont les
+        morceaux sont relayés. Le succès ou l'échec n'est compté par le
+        disjoncteur qu'à la fin du flux (épuisé ou refermé par l'appelant :
+        succès ; exception pendant l'itération : échec).
+        """
+        chunks = self._attempt(fn)
+        failed = False
+        try:
+            for chunk in chunks:
+                yield chunk
+        except Exception:
+            failed = True
+            self._record_failure()
+            raise
+        finally:
+            close = getattr(chunks, "close", None)
+            if callable(close):
+                close()
+            if not failed:
+                self._record_success()
+
+    def _record_success(self):
+        self.breaker.record_success()
+        self._count("successes")
+
+    def _record_failure(self):
+        self.breaker.record_failure()
+        self._count("failures")
+
+    def _attempt(self, fn: Callable[[], Any]) -> Any:
+        """Appel avec disjoncteur, quota et retries ; le succès est compté par l'appelant."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise GeminiUnavailable("circuit ouvert")
+
+        last_exc: Optional[BaseException] = None
+        for attempt in range(self.config.max_retries + 1):
+            if not self.bucket.acquire(self.config.acquire_timeout):
+                self._count("rate_limited")
+                if attempt:
+                    # Erreur transitoire sans retry possible faute de jeton
+                    self._record_failure()
+                else:
+                    # Appel non tenté : l'essai half_open éventuel reste disponible
+                    self.breaker.release()
+                raise GeminiUnavailable("quota local atteint")
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as exc:
+                with self._lock:
+                    self._latencies.append(time.perf_counter() - start)
+                last_exc = exc
+                if is_transient(exc) and attempt < self.config.max_retries:
+                    self._count("retries")
+                    self._sleep(self._backoff(attempt))
+                    continue
+                break
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+            return result
+
+        self._record_failure()
+        raise GeminiUnavailable(f"échec Gemini : {last_exc!r}") from last_exc
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self.counters)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return {
+            **counters,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "tokens_available": round(self.bucket.tokens, 2),
+            "latency_p50_s": p50,
+            "latency_p95_s": p95,
+        }
+
+
+_caller = ResilientCaller()
+
+
+def configure_resilience(config: ResilienceConfig) -> ResilientCaller:
+    """Remplace la couche de résilience (nouveau quota, seuils...)."""
+    global _caller
+    _caller = ResilientCaller(config)
+    return _caller
+
+
+def gemini_metrics() -> Dict[str, Any]:
+    """État du disjoncteur, compteurs, latences et tailles de prompt des appels Gemini."""
+    return {**_caller.metrics(), "prompts": prompt_metrics()}
+
+
+# Taille des prompts/réponses par appel (coût et latence en fonction de la taille du prompt)
+_prompt_log = deque(maxlen=500)
+_prompt_log_lock = threading.Lock()
+
+
+def record_prompt_call(prompt_tokens: int, response_text: str, latency: float, trimmed=(), ok: bool = True):
+    with _prompt_log_lock:
+        _prompt_log.append({
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": estimate_tokens(response_text),
+            "latency_s": latency,
+            "trimmed": bool(trimmed),
+            "ok": ok,
+        })
+
+
+def prompt_metrics() -> Dict[str, Any]:
+    """Statistiques sur les derniers appels : tokens envoyés/reçus et latence par taille de prompt."""
+    with _prompt_log_lock:
+        calls = list(_prompt_log)
+    if not calls:
+        return {"calls": 0}
+    sizes = sorted(c["prompt_tokens"] for c in calls)
+    by_size = {}
+    for label, lo, hi in (("<200", 0, 200), ("200-400", 200, 400), (">=400", 400, float("inf"))):
+        bucket = [c["latency_s"] for c in calls if lo <= c["prompt_tokens"] < hi and c["ok"]]
+        if bucket:
+            by_size[label] = {"calls": len(bucket), "latency_mean_s": sum(bucket) / len(bucket)}
+    return {
+        "calls": len(calls),
+        "prompt_tokens_mean": sum(sizes) / len(sizes),
+        "prompt_tokens_p95": sizes[min(len(sizes) - 1, int(0.95 * len(sizes)))],
+        "response_tokens_mean": sum(c["response_tokens"] for c in calls) / len(calls),
+        "prompts_trimmed": sum(c["trimmed"] for c in calls),
+        "latency_by_prompt_tokens": by_size,
+    }
+
+
+def _generate(prompt: str, stats: Optional[Dict[str, Any]] = None, caller: Optional[ResilientCaller] = None) -> str:
+    """
+    Appel Gemini protégé ; lève une exception si aucune réponse exploitable.
+    `caller` remplace la couche de résilience partagée (ex. job hors ligne).
+    """
+    caller = caller or _caller
+    model = _get_model()
+    timeout = caller.config.request_timeout
+    stats = stats or {"prompt_tokens": estimate_tokens(prompt), "trimmed_fields": []}
+    start = time.perf_counter()
     try:
-        genai.configure(api_key=_get_api_key())
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        description = (user_answers.get("description") or "").strip()
-        ambiance = (user_answers.get("ambiance") or "").strip()
-        realisateurs = (user_answers.get("realisateurs") or "").strip()
-        acteurs = (user_answers.get("acteurs") or "").strip()
-        periode = (user_answers.get("periode") or "Peu importe").strip()
-        langue = (user_answers.get("langue") or "Peu importe").strip()
-        prefs = user_answers.get("preferences") or {}
-
-        film_title = film.get("Film", "")
-        film_cat = film.get("Categorie", "")
-        film_desc = film.get("Description", "")
-        film_kw = film.get("Keywords", "")
+        resp = caller.call(lambda: model.generate_content(prompt, request_options={"timeout": timeout}))
+    except Exception:
+        record_prompt_call(stats["prompt_tokens"], "", time.perf_counter() - start, stats["trimmed_fields"], ok=False)
+        raise
+    txt = (resp.text or "").strip()
+    record_prompt_call(stats["prompt_tokens"], txt, time.perf_counter() - start, stats["trimmed_fields"])
+    return txt
+
+
+class FakeGenerativeModel:
+    """
+    Faux client Gemini pour les essais locaux : latence et erreurs injectées.
+
+    Exemple :
+        install_model(FakeGenerativeModel(latency=0.3, error_rate=0.5))
+    """
+
+    class ServiceUnavailable(Exception):
+        """Même nom que google.api_core.exceptions.ServiceUnavailable (transitoire)."""
+
+    def __init__(
+        self,
+        text: str = "Un film qui colle à ton envie de suspense, avec une ambiance sombre et prenante.",
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error: Optional[Callable[[], BaseException]] = None,
+        seed: Optional[int] = None,
+        chunk_chars: int = 16,
+        chunk_latency: float = 0.0
+    ):
+        self.text = text
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error = error or (lambda: FakeGenerativeModel.ServiceUnavailable("503 injected"))
+        self.chunk_chars = chunk_chars
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self.chunks_sent = 0
+        self.prompts = []
+        self._rng = random.Random(seed)
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def _stream(self):
+        for i in range(0, len(self.text), self.chunk_chars):
+            if self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            self.chunks_sent += 1
+            yield self._Response(self.text[i:i + self.chunk_chars])
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        self.calls += 1
+        self.prompts.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            raise self.error()
+        if stream:
+            return self._stream()
+        return self._Response(self.text)
+
+
+def fallback_explanation(score_final: float) -> str:
+    """
+    Explication deterministe utilisee sans Gemini.
+    """
+    return (
+        f"Ce film correspond à tes envies (score {score_final:.0%}). "
+        f"Il partage des thèmes proches de ta description et de l’ambiance recherchée, "
+        f"et il est aligné avec tes préférences de genre."
+    )
+
+
+# ========== BUDGET DE TOKENS DU PROMPT ==========
+@dataclass
+class PromptBudget:
+    max_input_tokens: int = 380     # budget du prompt complet (consignes incluses)
+    min_film_description: int = 40  # tokens gardés au minimum pour la description du film
+    min_user_text: int = 30         # tokens gardés au minimum pour chaque réponse libre
+
+
+_budget = PromptBudget()
 
-        prompt = f"""
+
+def configure_prompt_budget(budget: PromptBudget) -> None:
+    global _budget
+    _budget = budget
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimation locale du nombre de tokens (sans tokenizer) : ~1,3 token par mot
+    et au moins 1 token pour 4 caractères, ponctuation comptée à part.
+    """
+    if not text:
+        return 0
+    words = len(re.findall(r"\w+", text))
+    punct = len(re.findall(r"[^\w\s]", text))
+    return max(int(words * 1.3 + punct + 0.5), (len(text) + 3) // 4)
+
+
+def _trim_to_tokens(text: str, tokens: int) -> str:
+    """Coupe `text` (à une frontière de mot) pour tenir dans ~`tokens` tokens."""
+    if tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= tokens:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(" ".join(words[:mid]) + "…") <= tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return (" ".join(words[:lo]).rstrip(" ,;:") + "…") if lo else ""
+
+
+_PROMPT_HEADER = """
 Tu es un assistant cinéma. Ta tâche: expliquer brièvement (en français) pourquoi un film est recommandé.
 
 Contraintes:
@@ -68,37 +504,308 @@ Contraintes:
 - Pas de spoilers
 - Mentionne 1 ou 2 éléments précis (ambiance, thème, genre) qui relient le film aux réponses
 - Longueur max ~{max_chars} caractères
-
-Réponses utilisateur:
-- Type recherché: {description}
-- Ambiance: {ambiance}
-- Réalisateurs aimés: {realisateurs}
-- Acteurs aimés: {acteurs}
-- Période: {periode}
-- Langue: {langue}
-- Préférences de genres (1-5): {prefs}
-
-Film recommandé:
-- Titre: {film_title}
-- Genre: {film_cat}
-- Description: {film_desc}
-- Mots-clés: {film_kw}
-
-Score final: {score_final:.2f}
 """
 
-        resp = model.generate_content(prompt)
-        txt = (resp.text or "").strip()
+# Ordre de coupe quand le budget est dépassé : (champ, minimum dans PromptBudget)
+_TRIM_ORDER = [
+    ("film_kw", None),
+    ("film_desc", "min_film_description"),
+    ("acteurs", "min_user_text"),
+    ("realisateurs", "min_user_text"),
+    ("ambiance", "min_user_text"),
+    ("description", "min_user_text"),
+]
+
+
+def build_prompt_with_stats(
+    user_answers: Dict[str, Any],
+    film: Dict[str, Any],
+    score_final: float,
+    max_chars: int = 420,
+    pitch: Optional[Dict[str, Any]] = None,
+    budget: Optional[PromptBudget] = None
+) -> tuple:
+    """
+    Construit le prompt en respectant le budget de tokens.
+
+    - Les préférences de genre égales à la valeur par défaut (3) sont omises,
+      ainsi que période/langue "Peu importe" et les champs vides.
+    - Au-delà du budget, les champs sont raccourcis dans l'ordre : mots-clés,
+      description du film, puis réponses libres de l'utilisateur.
+
+    Returns:
+        (prompt, stats) avec stats = {'prompt_tokens', 'trimmed_fields'}
+    """
+    budget = budget or _budget
+    if pitch:
+        film_desc = pitch.get("pitch", "")
+        film_kw = ", ".join(pitch.get("themes", []))
+    else:
+        film_desc = film.get("Description", "")
+        film_kw = film.get("Keywords", "")
+
+    fields = {
+        "description": (user_answers.get("description") or "").strip(),
+        "ambiance": (user_answers.get("ambiance") or "").strip(),
+        "realisateurs": (user_answers.get("realisateurs") or "").strip(),
+        "acteurs": (user_answers.get("acteurs") or "").strip(),
+        "film_desc": str(film_desc or "").strip(),
+        "film_kw": str(film_kw or "").strip(),
+    }
+    periode = (user_answers.get("periode") or "Peu importe").strip()
+    langue = (user_answers.get("langue") or "Peu importe").strip()
+    prefs = {g: v for g, v in (user_answers.get("preferences") or {}).items() if v != 3}
+
+    def render() -> str:
+        user_lines = [
+            ("Type recherché", fields["description"]),
+            ("Ambiance", fields["ambiance"]),
+            ("Réalisateurs aimés", fields["realisateurs"]),
+            ("Acteurs aimés", fields["acteurs"]),
+            ("Période", "" if periode == "Peu importe" else periode),
+            ("Langue", "" if langue == "Peu importe" else langue),
+            ("Préférences de genres (1-5, 3 = neutre)", ", ".join(f"{g} {v}" for g, v in prefs.items())),
+        ]
+        film_lines = [
+            ("Titre", film.get("Film", "")),
+            ("Genre", film.get("Categorie", "")),
+            ("Description", fields["film_desc"]),
+            ("Mots-clés", fields["film_kw"]),
+        ]
+        parts = [_PROMPT_HEADER.format(max_chars=max_chars), "Réponses utilisateur:"]
+        parts += [f"- {label}: {value}" for label, value in user_lines if value]
+        parts += ["", "Film recommandé:"]
+        parts += [f"- {label}: {value}" for label, value in film_lines if value]
+        parts += ["", f"Score final: {score_final:.2f}", ""]
+        return "\n".join(parts)
+
+    prompt = render()
+    total = estimate_tokens(prompt)
+    trimmed = []
+    for name, min_attr in _TRIM_ORDER:
+        excess = total - budget.max_input_tokens
+        if excess <= 0:
+            break
+        current = estimate_tokens(fields[name])
+        minimum = getattr(budget, min_attr) if min_attr else 0
+        if current <= minimum:
+            continue
+        fields[name] = _trim_to_tokens(fields[name], max(minimum, current - excess))
+        trimmed.append(name)
+        prompt = render()
+        total = estimate_tokens(prompt)
+
+    return prompt, {"prompt_tokens": total, "trimmed_fields": trimmed}
+
+
+def build_prompt(
+    user_answers: Dict[str, Any],
+    film: Dict[str, Any],
+    score_final: float,
+    max_chars: int = 420,
+    pitch: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Prompt d'explication. Avec un pitch précalculé (pitchs_films.py), le pitch
+    et les thèmes remplacent la description et les mots-clés complets.
+    """
+    return build_prompt_with_stats(user_answers, film, score_final, max_chars, pitch)[0]
+
+
+def _error_fallback(score_final: float) -> str:
+    return (
+        f"Ce film colle bien à tes goûts (score {score_final:.0%}). "
+        f"Son genre et son ambiance sont proches de ce que tu as décrit."
+    )
+
+
+def _truncate(txt: str, max_chars: int) -> str:
+    if len(txt) > max_chars:
+        txt = txt[: max_chars - 3].rstrip() + "..."
+    return txt
+
+
+def local_explanation(
+    user_answers: Dict[str, Any],
+    film: Dict[str, Any],
+    pitch: Dict[str, Any],
+    score_final: float,
+    max_chars: int = 420
+) -> str:
+    """
+    Explication assemblée sans LLM à partir du pitch et des thèmes précalculés.
+    Les thèmes présents dans les réponses de l'utilisateur sont cités en premier.
+    """
+    user_text = " ".join(
+        str(user_answers.get(k) or "") for k in ("description", "ambiance", "realisateurs", "acteurs")
+    ).lower()
+    themes = list(pitch.get("themes") or [])
+    themes.sort(key=lambda t: not any(w in user_text for w in re.findall(r"\w{4,}", t.lower())))
+
+    txt = f"{film.get('Film', 'Ce film')} : {pitch.get('pitch', '').strip()}"
+    if themes:
+        txt += f" On y retrouve {' et '.join(themes[:2])}, en phase avec ce que tu recherches"
+    else:
+        txt += " Un choix en phase avec ce que tu recherches"
+    txt += f" (score {score_final:.0%})."
+    return _truncate(txt, max_chars)
+
+
+def generate_explanation(
+    user_answers: Dict[str, Any],
+    film: Dict[str, Any],
+    score_final: float,
+    max_chars: int = 420,
+    pitch: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Retourne une explication en FR.
+    Si Gemini indisponible => explication locale depuis le pitch, sinon fallback deterministe.
+    """
+    if not gemini_available():
+        if pitch:
+            return local_explanation(user_answers, film, pitch, score_final, max_chars)
+        return fallback_explanation(score_final)
+
+    try:
+        prompt, stats = build_prompt_with_stats(user_answers, film, score_final, max_chars, pitch)
+
+        txt = _generate(prompt, stats)
         if not txt:
             raise RuntimeError("Empty response")
 
         txt = txt.replace("\n", " ").strip()
-        if len(txt) > max_chars:
-            txt = txt[: max_chars - 3].rstrip() + "..."
-        return txt
+        return _truncate(txt, max_chars)
 
     except Exception:
-        return (
-            f"Ce film colle bien à tes goûts (score {score_final:.0%}). "
-            f"Son genre et son ambiance sont proches de ce que tu as décrit."
+        if pitch:
+            return local_explanation(user_answers, film, pitch, score_final, max_chars)
+        return _error_fallback(score_final)
+
+
+def clean_stream(chunks: Iterable[str], max_chars: int = 420) -> Iterator[str]:
+    """
+    Applique au fil de l'eau le nettoyage de `generate_explanation` :
+    sauts de ligne -> espaces, strip, coupe à max_chars avec "...".
+
+    La concaténation des morceaux produits est identique au texte nettoyé
+    de la version non streamée. Les espaces en fin de morceau et les 3 derniers
+    caractères du budget sont retenus tant qu'on ne sait pas si le texte
+    dépassera `max_chars`. La lecture s'arrête dès que le budget est dépassé.
+    """
+    head = max_chars - 3
+    emitted = 0
+    held = ""
+    started = False
+
+    for chunk in chunks:
+        text = (chunk or "").replace("\n", " ")
+        if not started:
+            text = text.lstrip()
+            if not text:
+                continue
+            started = True
+        held += text
+
+        if emitted + len(held.rstrip()) > max_chars:
+            yield held[: max(head - emitted, 0)].rstrip() + "..."
+            return
+
+        safe = held[: max(head - emitted, 0)].rstrip()
+        if safe:
+            yield safe
+            emitted += len(safe)
+            held = held[len(safe):]
+
+    tail = held.rstrip()
+    if tail:
+        yield tail
+
+
+def generate_explanation_stream(
+    user_answers: Dict[str, Any],
+    film: Dict[str, Any],
+    score_final: float,
+    max_chars: int = 420,
+    pitch: Optional[Dict[str, Any]] = None
+) -> Iterator[str]:
+    """
+    Variante streamée de `generate_explanation` : produit l'explication par
+    morceaux dès leur arrivée (temps perçu = premier token). La génération est
+    abandonnée dès que `max_chars` est atteint.
+    """
+    if not gemini_available():
+        if pitch:
+            yield local_explanation(user_answers, film, pitch, score_final, max_chars)
+        else:
+            yield fallback_explanation(score_final)
+        return
+
+    emitted = False
+    stream = None
+    received = []
+    stats = {"prompt_tokens": 0, "trimmed_fields": []}
+    start = time.perf_counter()
+    try:
+        model = _get_model()
+        prompt, stats = build_prompt_with_stats(user_answers, film, score_final, max_chars, pitch)
+        timeout = _caller.config.request_timeout
+        stream = _caller.stream(
+            lambda: model.generate_content(prompt, stream=True, request_options={"timeout": timeout})
         )
+        for piece in clean_stream((getattr(c, "text", "") for c in stream), max_chars):
+            emitted = True
+            received.append(piece)
+            yield piece
+        record_prompt_call(stats["prompt_tokens"], "".join(received), time.perf_counter() - start,
+                           stats["trimmed_fields"])
+    except Exception:
+        record_prompt_call(stats["prompt_tokens"], "".join(received), time.perf_counter() - start,
+                           stats["trimmed_fields"], ok=False)
+        if emitted:
+            # Flux interrompu après les premiers morceaux (échec compté par _caller.stream) : on coupe proprement
+            yield "..."
+        elif pitch:
+            yield local_explanation(user_answers, film, pitch, score_final, max_chars)
+        else:
+            yield _error_fallback(score_final)
+        return
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
+
+    if not emitted:
+        yield _error_fallback(score_final)
+
+
+def generate_film_pitch(film: Dict[str, Any], n_themes: int = 4, max_chars: int = 160,
+                        caller: Optional[ResilientCaller] = None) -> Dict[str, Any]:
+    """
+    Pitch d'une phrase + thèmes d'un film (job hors ligne pitchs_films.py).
+    `caller` : couche de résilience propre au job (par défaut, celle de l'application).
+
+    Raises:
+        GeminiUnavailable: Appel court-circuité ou en échec
+        ValueError: Réponse non conforme au JSON demandé
+    """
+    prompt = f"""
+Tu résumes un film pour un moteur de recommandation. Réponds uniquement en JSON:
+{{"pitch": "<une phrase en français, sans spoiler, {max_chars} caractères max>",
+  "themes": ["<{n_themes} thèmes courts en français>"]}}
+
+Titre: {film.get("Film", "")}
+Genre: {film.get("Categorie", "")}
+Description: {film.get("Description", "")}
+Mots-clés: {film.get("Keywords", "")}
+"""
+    txt = _generate(prompt, caller=caller)
+    match = re.search(r"\{.*\}", txt, re.S)
+    if not match:
+        raise ValueError("pas de JSON dans la réponse")
+    data = json.loads(match.group(0))
+    pitch = str(data.get("pitch") or "").replace("\n", " ").strip()
+    themes = [str(t).strip() for t in (data.get("themes") or []) if str(t).strip()][:n_themes]
+    if not pitch:
+        raise ValueError("pitch vide")
+    return {"pitch": _truncate(pitch, max_chars), "themes": themes}
@@ -0,0 +1,215 @@
+"""
+Index lexical - Index inversé BM25 sur le titre, la description et les mots-clés
+
+Complète la recherche sémantique SBERT pour les termes exacts (noms propres,
+lieux, titres) que l'embedding dilue :
+
+- génération de candidats : seuls les meilleurs films BM25 passent au
+  stage dense (produit matrice-vecteur sur quelques lignes) ;
+- score lexical normalisé, fusionné au score sémantique dans
+  scoring.compute_final_score.
+
+Les postings sont stockés en CSR (un tableau de films et un tableau de poids
+BM25 précalculés par terme) : scorer une requête revient à quelques
+additions vectorisées par terme de la requête. Sur un artefact Arrow,
+l'index est construit par les noyaux Arrow (tokenisation) et numpy
+(fréquences), sans boucle Python par film.
+"""
+
+from __future__ import annotations
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional
+import re
+import unicodedata
+
+import numpy as np
+
+from shards import top_k_indices
+
+K1 = 1.2
+B = 0.75
+
+# Poids de chaque champ dans la fréquence des termes (BM25F simplifié)
+POIDS_CHAMPS: Dict[str, float] = {
+    "Film": 3.0,
+    "Keywords": 2.0,
+    "Description": 1.0,
+}
+
+# En dessous de ce nombre de films correspondants, la génération de candidats
+# est abandonnée au profit de la recherche dense sur tout le catalogue
+CANDIDATS_MIN = 100
+
+MOTS_VIDES = frozenset("""
+    a au aux avec ce ces cette dans de des du elle en est et etre il ils je la le les leur lui
+    ma mais me mes mon ne nous on ou par pas pour qu que qui sa se ses son sont sur ta te tes
+    ton tu un une vos votre vous y film films
+    an and are as at be but by for from has have he her his in into is it its of on or she
+    that the their them they this to was were which who will with movie
+""".split())
+
+_MOT = re.compile(r"[a-z0-9]+")
+_SEPARATEUR = r"[^a-z0-9]+"
+_NON_ASCII = r"[^\x00-\x7f]"
+
+
+def tokeniser(texte: str) -> List[str]:
+    """Minuscules, accents retirés, mots de 2 caractères et plus hors mots vides."""
+    texte = unicodedata.normalize("NFKD", str(texte or "").lower()).encode("ascii", "ignore").decode("ascii")
+    return [mot for mot in _MOT.findall(texte) if len(mot) > 1 and mot not in MOTS_VIDES]
+
+
+def _postings(films, champs: Dict[str, float]):
+    """
+    (vocabulaire, termes, docs, fréquences, longueurs) de films en dicts :
+    un couple (terme, film) par posting, trié par terme puis film.
+    """
+    colonnes = [([str(f.get(nom, "") or "") for f in films], poids) for nom, poids in champs.items()]
+    n = len(films)
+
+    vocabulaire: Dict[str, int] = {}
+    termes, docs, frequences = array("i"), array("i"), array("f")
+    longueurs = np.zeros(n, dtype=np.float32)
+    for ligne in range(n):
+        compte = Counter()
+        for valeurs, poids in colonnes:
+            for mot in tokeniser(valeurs[ligne]):
+                compte[mot] += poids
+        longueurs[ligne] = sum(compte.values())
+        for mot, frequence in compte.items():
+            termes.append(vocabulaire.setdefault(mot, len(vocabulaire)))
+            docs.append(ligne)
+            frequences.append(frequence)
+
+    termes = np.frombuffer(termes, dtype=np.int32)
+    ordre = np.argsort(termes, kind="stable")   # stable : films croissants dans chaque terme
+    return (vocabulaire, termes[ordre], np.frombuffer(docs, dtype=np.int32)[ordre],
+            np.frombuffer(frequences, dtype=np.float32)[ordre], longueurs)
+
+
+def _postings_arrow(films, champs: Dict[str, float]):
+    """
+    Même résultat que `_postings` sur une vue artefact (`colonne_arrow`) :
+    `tokeniser` appliqué par les noyaux Arrow à chaque colonne, puis
+    fréquences agrégées par (terme, film) en numpy.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n = len(films)
+    mots, lignes, poids_mots = [], [], []
+    for nom, poids in champs.items():
+        textes = pc.fill_null(films.colonne_arrow(nom).combine_chunks(), "")
+        textes = pc.utf8_normalize(pc.utf8_lower(textes), "NFKD")
+        listes = pc.split_pattern_regex(pc.replace_substring_regex(textes, _NON_ASCII, ""), _SEPARATEUR)
+        valeurs = pc.list_flatten(listes)
+        parents = pc.list_parent_indices(listes)
+        garder = pc.and_(pc.greater(pc.utf8_length(valeurs), 1),
+                         pc.invert(pc.is_in(valeurs, value_set=pa.array(sorted(MOTS_VIDES)))))
+        mots.append(pc.filter(valeurs, garder))
+        lignes.append(pc.filter(parents, garder).to_numpy().astype(np.int64))
+        poids_mots.append(np.full(len(lignes[-1]), poids, dtype=np.float64))
+
+    encodes = pa.chunked_array(mots, pa.string()).combine_chunks().dictionary_encode()
+    vocabulaire = {mot: i for i, mot in enumerate(encodes.dictionary.to_pylist())}
+    lignes, poids_mots = np.concatenate(lignes), np.concatenate(poids_mots)
+    cles, positions = np.unique(encodes.indices.to_numpy().astype(np.int64) * n + lignes, return_inverse=True)
+    frequences = np.bincount(positions, weights=poids_mots, minlength=len(cles)).astype(np.float32)
+    longueurs = np.bincount(lignes, weights=poids_mots, minlength=n).astype(np.float32)
+    return (vocabulaire, (cles // max(n, 1)).astype(np.int32), (cles % max(n, 1)).astype(np.int32),
+            frequences, longueurs)
+
+
+class IndexBM25:
+    """
+    Index inversé BM25 en lecture seule.
+
+    Les films du terme t sont docs[debuts[t]:debuts[t + 1]] (lignes du
+    catalogue croissantes), avec leur poids BM25 dans `poids`.
+    """
+
+    def __init__(self, vocabulaire: Dict[str, int], debuts: np.ndarray, docs: np.ndarray,
+                 poids: np.ndarray, n_docs: int):
+        self.vocabulaire = vocabulaire
+        self.debuts = debuts
+        self.docs = docs
+        self.poids = poids
+        self.n_docs = n_docs
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def construire(cls, films, champs: Optional[Dict[str, float]] = None,
+                   k1: float = K1, b: float = B) -> "IndexBM25":
+        """
+        Args:
+            films: Films du catalogue (liste de dicts ou vue artefact), dans l'ordre de la matrice
+            champs: Champ -> poids dans la fréquence des termes (défaut : POIDS_CHAMPS)
+
+        Returns:
+            IndexBM25 aligné sur les lignes du catalogue
+        """
+        champs = champs or POIDS_CHAMPS
+        n = len(films)
+        construire_postings = _postings_arrow if hasattr(films, "colonne_arrow") else _postings
+        vocabulaire, termes, docs, frequences, longueurs = construire_postings(films, champs)
+
+        df = np.bincount(termes, minlength=len(vocabulaire))
+        debuts = np.zeros(len(vocabulaire) + 1, dtype=np.int64)
+        np.cumsum(df, out=debuts[1:])
+
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        longueur_moyenne = float(longueurs.mean()) if n and longueurs.mean() > 0 else 1.0
+        normalisation = k1 * (1.0 - b + b * longueurs[docs] / longueur_moyenne)
+        poids = (idf[termes] * frequences * (k1 + 1.0) / (frequences + normalisation)).astype(np.float32)
+        return cls(vocabulaire, debuts, docs, poids, n)
+
+    def scores(self, texte: str) -> np.ndarray:
+        """
+        Scores BM25 (n,) float32 de tous les films pour une requête texte
+        (0 pour les films sans aucun terme commun).
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for mot in set(tokeniser(texte)):
+            terme = self.vocabulaire.get(mot)
+            if terme is None:
+                continue
+            debut, fin = self.debuts[terme], self.debuts[terme + 1]
+            scores[self.docs[debut:fin]] += self.poids[debut:fin]
+        return scores
+
+    def statistiques(self) -> Dict[str, int]:
+        return {"films": self.n_docs, "termes": len(self.vocabulaire), "postings": len(self.docs)}
+
+
+def normaliser_scores(scores: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Scores ramenés dans [0, 1] (1 = meilleur film de la requête),
+    ou None si aucun film ne contient un terme de la requête.
+    """
+    maximum = float(scores.max()) if len(scores) else 0.0
+    if maximum <= 0.0:
+        return None
+    return scores / maximum
+
+
+def candidats_lexicaux(scores: np.ndarray, n: int, masque: Optional[np.ndarray] = None,
+                       minimum: int = CANDIDATS_MIN) -> Optional[np.ndarray]:
+    """
+    Lignes des n meilleurs films BM25 parmi les films admissibles (`masque`).
+
+    Returns:
+        np.ndarray des lignes (croissantes), ou None si moins de `minimum` films
+        admissibles contiennent un terme de la requête (recherche dense complète)
+    """
+    correspondants = scores > 0
+    if masque is not None:
+        correspondants &= masque
+    lignes = np.flatnonzero(correspondants)
+    if len(lignes) < minimum:
+        return None
+    if len(lignes) > n:
+        lignes = np.sort(lignes[top_k_indices(scores[lignes], n)])
+    return lignes
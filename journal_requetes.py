@@ -0,0 +1,180 @@
+"""
+Journal des requêtes - Capture des questionnaires soumis et de la durée de chaque étape
+
+Chaque exécution du pipeline peut ajouter une ligne JSON au journal :
+réponses du questionnaire anonymisées, durée de chaque étape (ms), source du
+résultat (calcul, cache, cache sémantique). Le fichier tourne par taille
+(journal.jsonl -> journal.jsonl.1 -> ... -> journal.jsonl.N, le plus ancien
+est supprimé).
+
+Le journal sert de trafic de référence pour rejeu_requetes.py.
+
+Activation dans l'application : variable d'environnement JOURNAL_REQUETES
+(chemin du fichier, ex. logs/requetes.jsonl).
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import re
+import threading
+import time
+
+CHEMIN_JOURNAL = "logs/requetes.jsonl"
+TAILLE_MAX = 10 * 1024 * 1024   # octets par fichier
+FICHIERS_MAX = 5                # fichiers tournés conservés
+
+# Champs du questionnaire conservés (tout autre champ est ignoré)
+CHAMPS_QUESTIONNAIRE = (
+    "description", "ambiance", "realisateurs", "acteurs",
+    "periode", "langue", "filtres_stricts", "genre_min", "preferences",
+)
+CHAMPS_TEXTE = ("description", "ambiance", "realisateurs", "acteurs")
+
+_MOTIFS_PERSONNELS = (
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"https?://\S+|www\.\S+"), "<url>"),
+    (re.compile(r"(?:\+\d{1,3}[\s.-]?|\b0)[1-9](?:[\s.-]?\d{2}){4}\b"), "<telephone>"),
+)
+
+
+def anonymiser(reponses: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Réponses réduites aux champs du questionnaire, e-mails / URL / numéros
+    masqués dans les champs texte.
+    """
+    anonymes = {}
+    for champ in CHAMPS_QUESTIONNAIRE:
+        if champ not in reponses:
+            continue
+        valeur = reponses[champ]
+        if champ in CHAMPS_TEXTE and isinstance(valeur, str):
+            for motif, remplacement in _MOTIFS_PERSONNELS:
+                valeur = motif.sub(remplacement, valeur)
+        anonymes[champ] = valeur
+    return anonymes
+
+
+class Etapes:
+    """Durées (ms) des étapes d'une exécution du pipeline."""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.durees: Dict[str, float] = {}
+        self.source = "calcul"      # "calcul", "cache" ou "cache_semantique"
+
+    @contextmanager
+    def __call__(self, nom: str) -> Iterator[None]:
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durees[nom] = self.durees.get(nom, 0.0) + (time.perf_counter() - debut) * 1000
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.debut) * 1000
+
+
+class JournalRequetes:
+    """
+    Journal JSONL avec rotation par taille, partagé entre les sessions.
+
+    Args:
+        chemin: Fichier courant (les fichiers tournés prennent le suffixe .1, .2, ...)
+        taille_max: Taille en octets au-delà de laquelle le fichier tourne
+        fichiers_max: Nombre de fichiers tournés conservés
+    """
+
+    def __init__(self, chemin: str = CHEMIN_JOURNAL, taille_max: int = TAILLE_MAX,
+                 fichiers_max: int = FICHIERS_MAX):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.fichiers_max = fichiers_max
+        self._verrou = threading.Lock()
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+
+    def enregistrer(self, reponses: Dict[str, Any], etapes: Etapes, **contexte):
+        """
+        Ajoute une exécution au journal.
+
+        Args:
+            contexte: Paramètres de l'exécution (top_n, diversite, ...) et nombre de résultats
+        """
+        ligne = json.dumps({
+            "ts": int(time.time()),
+            "reponses": anonymiser(reponses),
+            "source": etapes.source,
+            "durees_ms": {nom: round(duree, 3) for nom, duree in etapes.durees.items()},
+            "total_ms": round(etapes.total_ms, 3),
+            **contexte,
+        }, ensure_ascii=False) + "\n"
+        donnees = ligne.encode("utf-8")
+        with self._verrou:
+            try:
+                if os.path.exists(self.chemin) and os.path.getsize(self.chemin) + len(donnees) > self.taille_max:
+                    self._tourner()
+                with open(self.chemin, "ab") as f:
+                    f.write(donnees)
+            except OSError as e:
+                print(f"⚠️ Journal des requêtes non écrit : {e}")
+
+    def _tourner(self):
+        """journal.jsonl.(i) -> .(i+1), le plus ancien est supprimé."""
+        plus_ancien = f"{self.chemin}.{self.fichiers_max}"
+        if os.path.exists(plus_ancien):
+            os.remove(plus_ancien)
+        for i in range(self.fichiers_max - 1, 0, -1):
+            if os.path.exists(f"{self.chemin}.{i}"):
+                os.replace(f"{self.chemin}.{i}", f"{self.chemin}.{i + 1}")
+        if self.fichiers_max > 0:
+            os.replace(self.chemin, f"{self.chemin}.1")
+        else:
+            os.remove(self.chemin)
+
+
+class JournalMemoire:
+    """Journal gardé en mémoire (ex. durées par étape d'un rejeu)."""
+
+    def __init__(self):
+        self.entrees: List[Dict[str, Any]] = []
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, reponses: Dict[str, Any], etapes: Etapes, **contexte):
+        with self._verrou:
+            self.entrees.append({"source": etapes.source, "durees_ms": dict(etapes.durees),
+                                 "total_ms": etapes.total_ms, **contexte})
+
+
+def lire_journal(chemin: str, avec_tournes: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Entrées du journal, de la plus ancienne à la plus récente (lignes illisibles ignorées).
+
+    Args:
+        avec_tournes: Lit aussi les fichiers tournés (.N ... .1) avant le fichier courant
+    """
+    chemins = [chemin]
+    if avec_tournes:
+        i = 1
+        while os.path.exists(f"{chemin}.{i}"):
+            chemins.insert(0, f"{chemin}.{i}")
+            i += 1
+    for fichier in chemins:
+        with open(fichier, "r", encoding="utf-8") as f:
+            for ligne in f:
+                try:
+                    entree = json.loads(ligne)
+                except ValueError:
+                    continue
+                if isinstance(entree, dict) and isinstance(entree.get("reponses"), dict):
+                    yield entree
+
+
+def journal_depuis_environnement() -> Optional[JournalRequetes]:
+    """Journal activé par la variable JOURNAL_REQUETES (chemin), sinon None."""
+    chemin = os.getenv("JOURNAL_REQUETES")
+    return JournalRequetes(chemin) if chemin else None
@@ -0,0 +1,317 @@
+"""
+Moteur de référence - Recherche et scoring d'avant les optimisations, figés
+
+Copie du chemin de recommandation tel qu'il était avant les optimisations
+du moteur (chargement, recherche, scoring) : films encodés un par un,
+cosinus film par film, tri complet, puis compute_final_score sans score
+lexical. regression_classements.py en tire les classements de référence :
+ce module ne doit pas suivre les évolutions de nlp_engine.py ni de scoring.py.
+
+Deux écarts assumés avec le code d'origine :
+- les textes plus longs que la fenêtre du modèle sont encodés par
+  nlp_engine.encoder_textes (chunks regroupés par le pooling par défaut) au
+  lieu d'être tronqués : ce gain de qualité fait partie de la référence ;
+- les filtres stricts, qui n'existaient pas, sont appliqués au classement
+  complet avec leur définition (période ou langue à 0, genre < genre_min).
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple
+import json
+import re
+
+import numpy as np
+
+from nlp_engine import POOLING_DEFAUT, encoder_textes
+
+
+# ========== SCORING (scoring.py d'origine) ==========
+def clamp(x: float, lo: float = 0.0, hi: float = 1.0) -> float:
+    return max(lo, min(hi, x))
+
+
+def normalize_cosine(cos: float) -> float:
+    """
+    SentenceTransformer cos_sim est généralement dans [-1, 1].
+    On convertit vers [0, 1] pour un scoring plus lisible.
+    """
+    return clamp((cos + 1.0) / 2.0)
+
+
+def _clean_text(s: str) -> str:
+    s = s.lower().strip()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def _contains_any(haystack: str, needles_csv: str) -> Tuple[int, int]:
+    """
+    Retourne (match_count, total_items) en cherchant chaque item (séparé par virgule)
+    dans haystack.
+    """
+    needles_csv = (needles_csv or "").strip()
+    if not needles_csv:
+        return (0, 0)
+
+    items = [x.strip() for x in needles_csv.split(",") if x.strip()]
+    if not items:
+        return (0, 0)
+
+    h = _clean_text(haystack)
+    matches = 0
+    for it in items:
+        it_clean = _clean_text(it)
+        if it_clean and (it_clean in h):
+            matches += 1
+    return (matches, len(items))
+
+
+def genre_preference_score(film_category: str, user_preferences: Dict[str, int]) -> float:
+    """
+    Map slider 1-5 vers [0,1]. Si genre absent: neutre 0.55.
+    """
+    if not user_preferences:
+        return 0.55
+
+    val = user_preferences.get(film_category)
+    if val is None:
+        return 0.55
+
+    return clamp((val - 1) / 4.0)
+
+
+def period_match_score(user_period: str, film: Dict[str, Any]) -> float:
+    """
+    Si le référentiel contient une année, on score selon la période choisie.
+    Sinon on retourne neutre.
+    """
+    if not user_period or user_period == "Peu importe":
+        return 0.60
+
+    year = film.get("Annee", film.get("Year"))
+    if year is None:
+        return 0.60
+
+    try:
+        y = int(year)
+    except Exception:
+        return 0.60
+
+    if user_period == "Classiques (avant 1980)":
+        return 1.0 if y < 1980 else 0.0
+    if user_period == "Années 80-90":
+        return 1.0 if 1980 <= y <= 1999 else 0.0
+    if user_period == "Années 2000-2010":
+        return 1.0 if 2000 <= y <= 2010 else 0.0
+    if user_period == "Récents (2010+)":
+        return 1.0 if y >= 2010 else 0.0
+
+    return 0.60
+
+
+def language_match_score(user_lang: str, film: Dict[str, Any]) -> float:
+    """
+    Si le référentiel contient une langue, on score selon la langue choisie.
+    Sinon neutre.
+    """
+    if not user_lang or user_lang == "Peu importe":
+        return 0.60
+
+    lang = film.get("Langue", film.get("Language"))
+    if not lang:
+        return 0.60
+
+    lang_clean = _clean_text(str(lang))
+
+    if user_lang == "Anglais":
+        return 1.0 if ("en" in lang_clean or "anglais" in lang_clean or "english" in lang_clean) else 0.0
+    if user_lang == "Français":
+        return 1.0 if ("fr" in lang_clean or "français" in lang_clean or "french" in lang_clean) else 0.0
+    if user_lang == "Japonais (Animation)":
+        return 1.0 if ("ja" in lang_clean or "japonais" in lang_clean or "japanese" in lang_clean) else 0.0
+    if user_lang == "Autres":
+        if ("en" in lang_clean or "anglais" in lang_clean or "english" in lang_clean):
+            return 0.0
+        if ("fr" in lang_clean or "français" in lang_clean or "french" in lang_clean):
+            return 0.0
+        if ("ja" in lang_clean or "japonais" in lang_clean or "japanese" in lang_clean):
+            return 0.0
+        return 1.0
+
+    return 0.60
+
+
+def people_bonus_score(user_realisateurs: str, user_acteurs: str, film: Dict[str, Any]) -> float:
+    """
+    Bonus si réalisateurs/acteurs donnés par l'utilisateur apparaissent dans:
+    - film["Keywords"]
+    - film["Description"]
+    - film["Film"] (titre)
+    - (optionnel) film["Realisateur"], film["Acteurs"]
+    """
+    haystack = " ".join([
+        str(film.get("Film", "")),
+        str(film.get("Description", "")),
+        str(film.get("Keywords", "")),
+        str(film.get("Realisateur", "")),
+        str(film.get("Acteurs", "")),
+    ])
+
+    r_matches, r_total = _contains_any(haystack, user_realisateurs)
+    a_matches, a_total = _contains_any(haystack, user_acteurs)
+
+    bonus = 0.0
+    if r_total > 0:
+        bonus += (r_matches / r_total) * 0.20
+    if a_total > 0:
+        bonus += (a_matches / a_total) * 0.20
+
+    return clamp(bonus, 0.0, 0.35)
+
+
+@dataclass
+class ScoreBreakdown:
+    semantic: float
+    genre: float
+    period: float
+    language: float
+    people_bonus: float
+    final: float
+
+
+def compute_final_score(
+    cosine_similarity_raw: float,
+    film: Dict[str, Any],
+    user_answers: Dict[str, Any],
+    weights: Dict[str, float] | None = None
+) -> ScoreBreakdown:
+    """
+    Combine tout en un score final [0,1].
+
+    weights (par défaut):
+      - semantic: 0.62
+      - genre:    0.23
+      - period:   0.07
+      - language: 0.06
+      - people:   0.02  (bonus ajouté séparément)
+
+    NB: people_bonus est un petit "add-on" (jusqu'à +0.35 max, mais en pratique souvent < 0.15).
+    """
+    w = weights or {
+        "semantic": 0.62,
+        "genre": 0.23,
+        "period": 0.07,
+        "language": 0.06,
+        "people": 0.02,
+    }
+
+    sem = normalize_cosine(float(cosine_similarity_raw))
+    prefs = user_answers.get("preferences", {}) or {}
+    gen = genre_preference_score(str(film.get("Categorie", "")), prefs)
+
+    per = period_match_score(str(user_answers.get("periode", "Peu importe")), film)
+    lan = language_match_score(str(user_answers.get("langue", "Peu importe")), film)
+
+    pb = people_bonus_score(
+        str(user_answers.get("realisateurs", "")),
+        str(user_answers.get("acteurs", "")),
+        film
+    )
+
+    base = (w["semantic"] * sem) + (w["genre"] * gen) + (w["period"] * per) + (w["language"] * lan)
+    final = clamp(base + pb)
+
+    return ScoreBreakdown(
+        semantic=sem,
+        genre=gen,
+        period=per,
+        language=lan,
+        people_bonus=pb,
+        final=final
+    )
+
+
+# ========== RECHERCHE (nlp_engine.py d'origine) ==========
+def charger_films(chemin: str = "referentiel_films.json") -> List[Dict[str, Any]]:
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)["films"]
+
+
+def encoder_texte(model, texte: str) -> np.ndarray:
+    return encoder_textes(model, [texte], pooling=POOLING_DEFAUT)[0]
+
+
+def encoder_films(model, films: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """{FilmID: {'embedding', 'film'}}, un film à la fois (description + mots-clés)."""
+    embeddings_films = {}
+    for film in films:
+        texte_complet = f"{film['Description']} {film['Keywords']}"
+        embeddings_films[film['FilmID']] = {
+            'embedding': encoder_texte(model, texte_complet),
+            'film': film
+        }
+    return embeddings_films
+
+
+def encoder_requete_utilisateur(model, reponses: Dict[str, Any]) -> np.ndarray:
+    texte_utilisateur = f"{reponses.get('description', '')} {reponses.get('ambiance', '')}"
+    if reponses.get('realisateurs'):
+        texte_utilisateur += f" {reponses['realisateurs']}"
+    if reponses.get('acteurs'):
+        texte_utilisateur += f" {reponses['acteurs']}"
+    return encoder_texte(model, texte_utilisateur)
+
+
+def cos_sim(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def calculer_similarites(embedding_utilisateur, embeddings_films) -> List[Dict[str, Any]]:
+    """Similarité cosinus avec chaque film, triée par score décroissant."""
+    resultats = []
+    for film_id, data in embeddings_films.items():
+        resultats.append({
+            'film': data['film'],
+            'score_semantique': cos_sim(embedding_utilisateur, data['embedding'])
+        })
+    resultats.sort(key=lambda x: x['score_semantique'], reverse=True)
+    return resultats
+
+
+# ========== CLASSEMENT D'UN PROFIL ==========
+def admissible(film: Dict[str, Any], reponses: Dict[str, Any]) -> bool:
+    """Définition des filtres stricts appliquée au classement complet."""
+    periode = reponses.get("periode") or "Peu importe"
+    langue = reponses.get("langue") or "Peu importe"
+    if periode != "Peu importe" and period_match_score(periode, film) <= 0.0:
+        return False
+    if langue != "Peu importe" and language_match_score(langue, film) <= 0.0:
+        return False
+    genre_min, preferences = reponses.get("genre_min"), reponses.get("preferences") or {}
+    return not (genre_min and preferences and preferences.get(film["Categorie"], genre_min) < genre_min)
+
+
+def classer_profils(model, profils: List[Dict[str, Any]], films: List[Dict[str, Any]],
+                    top_k: int, top_n_recherche: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Classements de référence : les `top_n_recherche` meilleurs films sémantiques
+    (admissibles), re-classés par score final, limités à `top_k`.
+
+    Returns:
+        {nom du profil: [{'film', 'score_semantique', 'breakdown'}]}
+    """
+    embeddings_films = encoder_films(model, films)
+    classements = {}
+    for profil in profils:
+        reponses = profil["reponses"]
+        resultats = calculer_similarites(encoder_requete_utilisateur(model, reponses), embeddings_films)
+        if reponses.get("filtres_stricts"):
+            resultats = [r for r in resultats if admissible(r["film"], reponses)]
+        classes = [
+            dict(r, breakdown=compute_final_score(r["score_semantique"], r["film"], reponses))
+            for r in resultats[:top_n_recherche]
+        ]
+        classes.sort(key=lambda r: r["breakdown"].final, reverse=True)
+        classements[profil["nom"]] = classes[:top_k]
+    return classements
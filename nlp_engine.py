@@ -4,9 +4,21 @@ Utilise SBERT (Sentence-BERT) pour encoder les textes et la similarité cosinus
 """
 
 from sentence_transformers import SentenceTransformer, util
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+import hashlib
 import json
+import os
+import threading
 import numpy as np
 
+from catalogue import CatalogueFilms, charger_catalogue
+from filtres import construire_masques
+from shards import CoordinateurShards, top_k_indices
+from index_lexical import CANDIDATS_MIN, IndexBM25, candidats_lexicaux, normaliser_scores
+from projection_pca import CHEMIN_PROJECTION, ajuster_pca, ecrire_projection, lire_projection, preselection
+from file_inference import FileInference
+
 # ========== CHARGEMENT DU MODÈLE SBERT ==========
 # all-MiniLM-L6-v2 : modèle léger et performant pour le français et l'anglais
 MODEL_NAME = "all-MiniLM-L6-v2"
@@ -25,25 +37,162 @@ def charger_modele():
 # ========== CHARGEMENT DU RÉFÉRENTIEL ==========
 def charger_referentiel(chemin="referentiel_films.json"):
     """
-    Charge le référentiel de films depuis le fichier JSON.
+    Charge le référentiel de films (JSON, JSONL ou Parquet).
+    
+    La lecture se fait en flux et chaque film est validé : les films invalides
+    sont signalés et ignorés (voir catalogue.charger_catalogue). Les films
+    valides sont ajoutés directement à la liste renvoyée.
     
     Returns:
         dict: Données du référentiel (blocs et films)
     """
     try:
-        with open(chemin, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        catalogue = charger_catalogue(chemin, CatalogueFilms())
+        data = catalogue.vers_referentiel()
         print(f"✅ Référentiel chargé : {len(data['films'])} films, {len(data['blocs'])} catégories")
+        if catalogue.invalides:
+            print(f"⚠️ {len(catalogue.invalides)} film(s) invalide(s) ignoré(s)")
         return data
     except FileNotFoundError:
         print(f"❌ Fichier {chemin} non trouvé")
         return None
-    except json.JSONDecodeError:
+    except ValueError:
+        # json.JSONDecodeError hérite de ValueError
         print(f"❌ Erreur de format JSON dans {chemin}")
         return None
 
 
 # ========== ENCODAGE DES FILMS ==========
+def texte_film(film):
+    """
+    Texte encodé pour un film : description + mots-clés.
+    """
+    return f"{film['Description']} {film['Keywords']}"
+
+
+def hash_film(film):
+    """
+    Empreinte du contenu d'un film (sert à détecter les films modifiés au rechargement).
+    """
+    contenu = json.dumps(film, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(contenu.encode("utf-8")).hexdigest()
+
+
+# ========== TEXTES LONGS ==========
+# Le modèle tronque silencieusement au-delà de max_seq_length tokens : un texte
+# plus long est découpé en chunks qui se chevauchent, encodés dans le même
+# appel batché, puis regroupés en un seul vecteur.
+POOLING_DEFAUT = "mean"     # "mean" (moyenne des chunks) ou "max" (maximum par dimension)
+CHEVAUCHEMENT_TOKENS = 32   # tokens communs à deux chunks consécutifs
+MAX_CHUNKS = 16             # au-delà, la fin du texte est tronquée
+
+_COMPTEURS_DECOUPAGE = {'textes': 0, 'decoupes': 0, 'chunks': 0, 'tronques': 0}
+_VERROU_COMPTEURS = threading.Lock()
+
+
+def statistiques_decoupage():
+    """Textes encodés / découpés / tronqués depuis le démarrage du processus."""
+    with _VERROU_COMPTEURS:
+        return dict(_COMPTEURS_DECOUPAGE)
+
+
+def _fenetre_tokens(model):
+    """Tokens de texte par passage du modèle (hors [CLS] / [SEP])."""
+    return max(CHEVAUCHEMENT_TOKENS * 2, int(getattr(model, 'max_seq_length', None) or 256) - 2)
+
+
+def decouper_textes(model, textes):
+    """
+    Découpe les textes trop longs pour le modèle en fenêtres de tokens.
+    
+    Seuls les textes de plus de `fenêtre` caractères sont tokenisés (un token
+    couvre au moins un caractère) : les textes courts gardent le passage unique.
+    
+    Returns:
+        tuple: (morceaux à encoder, indice du texte de chaque morceau, nombre de textes tronqués)
+    """
+    fenetre = _fenetre_tokens(model)
+    pas = fenetre - CHEVAUCHEMENT_TOKENS
+    longs = [i for i, texte in enumerate(textes) if len(texte) > fenetre]
+    decoupes = {}
+    tronques = 0
+    if longs:
+        offsets = model.tokenizer(
+            [textes[i] for i in longs], add_special_tokens=False, return_offsets_mapping=True
+        )['offset_mapping']
+        for i, offsets_texte in zip(longs, offsets):
+            n = len(offsets_texte)
+            if n <= fenetre:
+                continue
+            debuts = list(range(0, n - fenetre + pas, pas))
+            if len(debuts) > MAX_CHUNKS:
+                debuts = debuts[:MAX_CHUNKS]
+                tronques += 1
+            decoupes[i] = [
+                textes[i][offsets_texte[d][0]:offsets_texte[min(d + fenetre, n) - 1][1]]
+                for d in debuts
+            ]
+
+    morceaux, proprietaires = [], []
+    for i, texte in enumerate(textes):
+        for morceau in decoupes.get(i, (texte,)):
+            morceaux.append(morceau)
+            proprietaires.append(i)
+    return morceaux, np.asarray(proprietaires, dtype=np.int64), tronques
+
+
+def encoder_textes(model, textes, batch_size=64, pooling=POOLING_DEFAUT, bilan=None):
+    """
+    Encode une liste de textes en un seul appel batché.
+    
+    Les textes plus longs que la fenêtre du modèle sont découpés (voir
+    decouper_textes) et leurs chunks regroupés par `pooling` ("mean" ou "max").
+    
+    Args:
+        bilan: Dict optionnel complété avec les nombres de textes découpés / tronqués
+    
+    Returns:
+        np.ndarray: Matrice (n, d) float32 de vecteurs normalisés (norme L2 = 1),
+        de sorte que la similarité cosinus se réduit à un produit scalaire.
+    """
+    if pooling not in ("mean", "max"):
+        raise ValueError(f"Pooling inconnu : {pooling!r}")
+    if not textes:
+        dim = model.get_sentence_embedding_dimension()
+        return np.zeros((0, dim), dtype=np.float32)
+    textes = list(textes)
+    morceaux, proprietaires, tronques = decouper_textes(model, textes)
+    embeddings = np.asarray(model.encode(
+        morceaux,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    ), dtype=np.float32)
+
+    decoupes = len(morceaux) - len(textes)
+    if decoupes:
+        if pooling == "mean":
+            regroupes = np.zeros((len(textes), embeddings.shape[1]), dtype=np.float32)
+            np.add.at(regroupes, proprietaires, embeddings)
+        else:
+            regroupes = np.full((len(textes), embeddings.shape[1]), -np.inf, dtype=np.float32)
+            np.maximum.at(regroupes, proprietaires, embeddings)
+        normes = np.linalg.norm(regroupes, axis=1, keepdims=True)
+        embeddings = regroupes / np.where(normes > 0, normes, 1.0)
+
+    n_decoupes = int(np.count_nonzero(np.bincount(proprietaires) > 1)) if decoupes else 0
+    with _VERROU_COMPTEURS:
+        _COMPTEURS_DECOUPAGE['textes'] += len(textes)
+        _COMPTEURS_DECOUPAGE['decoupes'] += n_decoupes
+        _COMPTEURS_DECOUPAGE['chunks'] += len(morceaux) if decoupes else 0
+        _COMPTEURS_DECOUPAGE['tronques'] += tronques
+    if bilan is not None:
+        for cle, valeur in (('decoupes', n_decoupes), ('tronques', tronques)):
+            bilan[cle] = bilan.get(cle, 0) + valeur
+    return embeddings
+
+
 def encoder_films(model, films):
     """
     Encode les descriptions de tous les films du référentiel.
@@ -57,12 +206,12 @@ def encoder_films(model, films):
     """
     print("Encodage des descriptions de films...")
     
+    # Combine description + keywords pour un embedding plus riche
+    # (un seul appel batché, textes longs découpés au lieu d'être tronqués)
+    embeddings = encoder_textes(model, [texte_film(film) for film in films])
     embeddings_films = {}
     
-    for film in films:
-        # Combine description + keywords pour un embedding plus riche
-        texte_complet = f"{film['Description']} {film['Keywords']}"
-        embedding = model.encode(texte_complet, convert_to_tensor=True)
+    for film, embedding in zip(films, embeddings):
         embeddings_films[film['FilmID']] = {
             'embedding': embedding,
             'film': film
@@ -73,6 +222,21 @@ def encoder_films(model, films):
 
 
 # ========== ENCODAGE DE LA REQUÊTE UTILISATEUR ==========
+def texte_requete(reponses):
+    """
+    Construit le texte combiné encodé pour une requête utilisateur.
+    """
+    texte_utilisateur = f"{reponses.get('description', '')} {reponses.get('ambiance', '')}"
+    
+    # Ajouter réalisateurs/acteurs si présents
+    if reponses.get('realisateurs'):
+        texte_utilisateur += f" {reponses['realisateurs']}"
+    if reponses.get('acteurs'):
+        texte_utilisateur += f" {reponses['acteurs']}"
+    
+    return texte_utilisateur
+
+
 def encoder_requete_utilisateur(model, reponses):
     """
     Encode les réponses textuelles de l'utilisateur en un seul embedding.
@@ -82,24 +246,87 @@ def encoder_requete_utilisateur(model, reponses):
         reponses: Dictionnaire des réponses utilisateur
         
     Returns:
-        tensor: Embedding de la requête utilisateur
+        np.ndarray: Embedding normalisé de la requête utilisateur
     """
-    # Construire un texte combiné à partir des réponses
-    texte_utilisateur = f"{reponses.get('description', '')} {reponses.get('ambiance', '')}"
-    
-    # Ajouter réalisateurs/acteurs si présents
-    if reponses.get('realisateurs'):
-        texte_utilisateur += f" {reponses['realisateurs']}"
-    if reponses.get('acteurs'):
-        texte_utilisateur += f" {reponses['acteurs']}"
+    texte_utilisateur = texte_requete(reponses)
     
     print(f"Encodage de la requête utilisateur...")
-    embedding = model.encode(texte_utilisateur, convert_to_tensor=True)
+    embedding = encoder_textes(model, [texte_utilisateur])[0]
     print("✅ Requête encodée")
     
     return embedding
 
 
+# ========== REPRÉSENTATIONS MULTI-VECTEURS ==========
+# Champs encodés séparément pour chaque film (ordre des blocs dans la matrice)
+CHAMPS_FILM = ("description", "keywords", "titre")
+
+# Champs de la requête encodés séparément
+CHAMPS_REQUETE = ("description", "ambiance", "realisateurs", "acteurs")
+
+# Poids de fusion : (champ requête, champ film) -> poids.
+# Les poids des champs requête vides sont ignorés puis le total est renormalisé à 1,
+# de sorte que le score fusionné reste une moyenne de cosinus dans [-1, 1].
+POIDS_FUSION_DEFAUT = {
+    ("description", "description"): 0.30,
+    ("description", "keywords"): 0.15,
+    ("description", "titre"): 0.06,
+    ("ambiance", "description"): 0.20,
+    ("ambiance", "keywords"): 0.15,
+    ("realisateurs", "keywords"): 0.05,
+    ("realisateurs", "titre"): 0.02,
+    ("acteurs", "keywords"): 0.05,
+    ("acteurs", "titre"): 0.02,
+}
+
+
+def textes_champs_film(film):
+    """Textes des champs de CHAMPS_FILM pour un film."""
+    return [film['Description'], film['Keywords'], film['Film']]
+
+
+def encoder_champs_films(model, films, pooling=POOLING_DEFAUT):
+    """
+    Encode description, mots-clés et titre de tous les films en un seul appel batché
+    (champs longs découpés en chunks regroupés par `pooling`).
+    
+    Returns:
+        np.ndarray: Matrice (n, 3*d) : [description | keywords | titre] par ligne
+    """
+    k = len(CHAMPS_FILM)
+    textes = [texte for film in films for texte in textes_champs_film(film)]
+    embeddings = encoder_textes(model, textes, pooling=pooling)
+    return embeddings.reshape(len(films), k * embeddings.shape[1])
+
+
+def vecteur_fusion(model, reponses, poids=None, pooling=POOLING_DEFAUT):
+    """
+    Encode chaque champ non vide de la requête (un seul appel batché, `pooling`
+    des champs longs) et les combine en un vecteur (3*d,) aligné sur la matrice
+    de `encoder_champs_films`.
+    
+    Le score fusionné d'un film est alors un unique produit scalaire :
+        sum_(champ_req, champ_film) poids * cos(requete[champ_req], film[champ_film])
+    """
+    poids = poids or POIDS_FUSION_DEFAUT
+    presents = [c for c in CHAMPS_REQUETE if str(reponses.get(c) or '').strip()]
+    if not presents:
+        presents = ["description"]
+    vecteurs = dict(zip(presents, encoder_textes(model, [str(reponses.get(c) or '') for c in presents],
+                                                  pooling=pooling)))
+    
+    dim = next(iter(vecteurs.values())).shape[0]
+    requete = np.zeros((len(CHAMPS_FILM), dim), dtype=np.float32)
+    total = 0.0
+    for (champ_req, champ_film), w in poids.items():
+        if champ_req in vecteurs and w:
+            requete[CHAMPS_FILM.index(champ_film)] += w * vecteurs[champ_req]
+            total += w
+    if total > 0:
+        requete /= total
+    return requete.ravel()
+
+
 # ========== CALCUL DE SIMILARITÉ ==========
 def calculer_similarites(embedding_utilisateur, embeddings_films):
     """
@@ -132,6 +359,650 @@ def calculer_similarites(embedding_utilisateur, embeddings_films):
     return resultats
 
 
+# ========== MOTEUR PERSISTANT (RECHARGEMENT À CHAUD) ==========
+@dataclass(frozen=True)
+class EtatCatalogue:
+    """
+    Instantané immuable du catalogue encodé.
+    
+    Le moteur ne modifie jamais un état publié : un rechargement construit un
+    nouvel état puis remplace la référence en une seule affectation. Une requête
+    qui a lu `moteur.etat` travaille donc jusqu'au bout sur un catalogue cohérent.
+    """
+    films: List[Dict[str, Any]]
+    embeddings: np.ndarray          # (n, d) float32, lignes normalisées
+    hashes: Dict[str, str]          # FilmID -> hash_film(film)
+    index: Dict[str, int]           # FilmID -> ligne dans embeddings
+    version: int = 0
+    blocs: List[Dict[str, Any]] = field(default_factory=list)
+    masques: Any = None             # filtres.MasquesCatalogue (filtres stricts)
+    embeddings_champs: Optional[np.ndarray] = None  # (n, 3*d) si multi-vecteurs
+    bm25: Any = None                # index_lexical.IndexBM25 si recherche hybride
+    projection: Any = None          # projection_pca.ProjectionPCA si présélection réduite
+    embeddings_reduits: Optional[np.ndarray] = None  # (n, k) films projetés
+
+    def __len__(self):
+        return len(self.films)
+
+
+class MoteurRecommandation:
+    """
+    Moteur qui garde en mémoire le modèle SBERT et la matrice des films encodés.
+    
+    - `recharger()` relit le référentiel, compare les films par FilmID + hash de
+      contenu et n'encode que les films ajoutés ou modifiés.
+    - `demarrer_surveillance()` lance un thread qui recharge automatiquement
+      le catalogue quand le fichier change sur disque.
+    - `fusion` (dict de poids, voir POIDS_FUSION_DEFAUT) active les représentations
+      multi-vecteurs : description, mots-clés et titre sont encodés séparément et
+      le score sémantique est une fusion pondérée calculée en un produit matriciel.
+    - `shards` répartit la matrice entre plusieurs workers (voir shards.py) :
+      un entier lance autant de processus locaux, un CoordinateurShards
+      connecté à des workers distants est utilisé tel quel.
+    - `lexical` active la recherche hybride avec un index BM25 (index_lexical.py)
+      construit à chaque chargement du catalogue :
+        - "fusion" : recherche dense sur tout le catalogue, chaque résultat
+          porte son score lexical (fusionné dans compute_final_score) ;
+        - "candidats" : les `candidats_lexicaux` meilleurs films BM25 sont les
+          seuls scorés par le stage dense (repli sur la recherche dense
+          complète quand moins de `candidats_min` films contiennent un terme
+          de la requête).
+      Quand la recherche dense porte sur tout le catalogue, les `rappel_lexical`
+      meilleurs films BM25 sont ajoutés au top dense : un titre ou un mot-clé
+      exact que l'embedding a manqué reste candidat au score final.
+    - `pooling` ("mean" / "max") regroupe les chunks des textes plus longs que
+      la fenêtre du modèle (films et requêtes), au lieu de les tronquer.
+    - `reduction` (nombre de dimensions, ex. 64) active la présélection sur
+      les embeddings projetés par ACP (projection_pca.py) : les `preselection`
+      meilleurs films réduits sont re-scorés en pleine dimension. La projection
+      est relue depuis `chemin_projection`, ou ajustée puis écrite au premier
+      chargement.
+    - `file_inference` confie le modèle à un worker unique (file_inference.py) :
+      les encodages des sessions concurrentes sont regroupés en batchs au lieu
+      d'appeler le modèle en parallèle.
+    """
+
+    def __init__(self, chemin="referentiel_films.json", model=None, artefact=None, fusion=None, shards=None,
+                 lexical=None, candidats_lexicaux=2000, candidats_min=CANDIDATS_MIN, rappel_lexical=10,
+                 pooling=POOLING_DEFAUT,
+                 reduction=None, preselection=1000, chemin_projection=CHEMIN_PROJECTION,
+                 file_inference=False):
+        if lexical not in (None, "fusion", "candidats"):
+            raise ValueError(f"Mode lexical inconnu : {lexical!r}")
+        self.chemin = chemin
+        self.artefact = artefact
+        self.fusion = fusion
+        self.shards = shards
+        self.lexical = lexical
+        self.candidats_lexicaux = candidats_lexicaux
+        self.candidats_min = candidats_min
+        self.rappel_lexical = rappel_lexical
+        self.pooling = pooling
+        self.reduction = reduction
+        self.preselection = preselection
+        self.chemin_projection = chemin_projection
+        self._projection = None
+        self.file_inference = file_inference
+        self._model = model
+        self._etat = None
+        self._verrou_modele = threading.Lock()
+        self._verrou_rechargement = threading.Lock()
+        self._surveillance = None
+        self._arret_surveillance = threading.Event()
+        self._signature_fichier = None
+        self._version = 0
+
+    def _version_suivante(self):
+        """Numéro du prochain état publié (appelé sous le verrou de rechargement)."""
+        self._version += 1
+        return self._version
+
+    @property
+    def model(self):
+        if self._model is None or (self.file_inference and not isinstance(self._model, FileInference)):
+            with self._verrou_modele:
+                if self._model is None:
+                    self._model = charger_modele()
+                if self.file_inference and not isinstance(self._model, FileInference):
+                    self._model = FileInference(self._model)
+        return self._model
+
+    def metriques_inference(self):
+        """Métriques de la file d'inférence (None sans file_inference)."""
+        return self._model.metriques() if isinstance(self._model, FileInference) else None
+
+    @property
+    def etat(self):
+        """État courant du catalogue (chargé à la première utilisation)."""
+        if self._etat is None:
+            if self.artefact and os.path.exists(self.artefact):
+                self.charger_artefact(self.artefact)
+            if self._etat is None:
+                self.recharger()
+        return self._etat
+
+    # ----- Artefact binaire -----
+    def charger_artefact(self, chemin):
+        """
+        Publie l'état depuis un artefact Arrow (voir artefact_catalogue.py).
+        
+        Si le référentiel JSON a changé depuis la conversion, les écarts sont
+        rattrapés par un rechargement incrémental.
+        
+        Returns:
+            bool: True si l'artefact a été utilisé, False s'il est périmé/illisible
+        """
+        from artefact_catalogue import ouvrir_artefact, hash_fichier, ArtefactPerime
+        
+        try:
+            artefact = ouvrir_artefact(chemin, model=self.model, nom_modele=MODEL_NAME, pooling=self.pooling)
+        except (ArtefactPerime, OSError) as e:
+            print(f"⚠️ Artefact ignoré : {e}")
+            return False
+        
+        embeddings_champs = None
+        if self.fusion:
+            embeddings_champs = artefact['embeddings_champs']
+            if embeddings_champs is None:
+                print("⚠️ Vecteurs par champ absents de l'artefact (convertir avec --champs) : encodage")
+                embeddings_champs = encoder_champs_films(self.model, artefact['films'], self.pooling)
+        
+        with self._verrou_rechargement:
+            ids = artefact['ids']
+            self._etat = EtatCatalogue(
+                films=artefact['films'],
+                embeddings=artefact['embeddings'],
+                hashes=artefact['hashes'],
+                index={film_id: i for i, film_id in enumerate(ids)},
+                version=self._version_suivante(),
+                blocs=artefact['meta'].get('blocs', []),
+                masques=construire_masques(artefact['films']),
+                embeddings_champs=embeddings_champs,
+                bm25=IndexBM25.construire(artefact['films']) if self.lexical else None,
+                **self._reduire(artefact['embeddings']),
+            )
+            self._publier_shards()
+        print(f"✅ Artefact chargé : {len(ids)} films ({chemin})")
+        
+        if os.path.exists(self.chemin) and hash_fichier(self.chemin) != artefact['meta'].get('hash_source'):
+            self.recharger()
+        else:
+            self._signature_fichier = self._signature()
+        return True
+
+    # ----- Rechargement -----
+    def _signature(self):
+        try:
+            st = os.stat(self.chemin)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def recharger(self, referentiel=None):
+        """
+        Recharge le catalogue et publie un nouvel état de façon atomique.
+        
+        Args:
+            referentiel: Données déjà chargées (sinon lecture de `self.chemin`)
+            
+        Returns:
+            dict: Nombre de films ajoutés / modifiés / supprimés / inchangés,
+            ou None si le référentiel n'a pas pu être chargé (l'état courant est conservé).
+        """
+        with self._verrou_rechargement:
+            signature = self._signature()
+            if referentiel is None:
+                referentiel = charger_referentiel(self.chemin)
+            if not referentiel:
+                return None
+
+            ancien = self._etat
+            films = referentiel['films']
+            hashes = {film['FilmID']: hash_film(film) for film in films}
+            blocs = list(referentiel.get('blocs', []))
+
+            if ancien is not None and hashes == ancien.hashes and blocs == ancien.blocs:
+                self._signature_fichier = signature
+                return {'ajoutes': 0, 'modifies': 0, 'supprimes': 0, 'inchanges': len(films)}
+
+            a_encoder = []
+            for ligne, film in enumerate(films):
+                film_id = film['FilmID']
+                if ancien is None or ancien.hashes.get(film_id) != hashes[film_id]:
+                    a_encoder.append(ligne)
+
+            decoupage = {}
+            nouveaux = encoder_textes(self.model, [texte_film(films[i]) for i in a_encoder],
+                                      pooling=self.pooling, bilan=decoupage)
+            if decoupage.get('decoupes'):
+                print(f"⚠️ {decoupage['decoupes']} film(s) trop long(s) pour le modèle encodé(s) par chunks "
+                      f"({decoupage['tronques']} tronqué(s) au-delà de {MAX_CHUNKS} chunks)")
+            embeddings = _assembler(films, a_encoder, nouveaux, ancien, 'embeddings')
+
+            embeddings_champs = None
+            if self.fusion:
+                if ancien is None or ancien.embeddings_champs is None:
+                    lignes_champs = list(range(len(films)))
+                else:
+                    lignes_champs = a_encoder
+                champs = encoder_champs_films(self.model, [films[i] for i in lignes_champs], self.pooling)
+                embeddings_champs = _assembler(films, lignes_champs, champs, ancien, 'embeddings_champs')
+
+            reduits = self._reduire(embeddings, films, a_encoder, nouveaux, ancien)
+
+            ids_anciens = set(ancien.index) if ancien is not None else set()
+            ajoutes = sum(1 for film in films if film['FilmID'] not in ids_anciens)
+            bilan = {
+                'ajoutes': ajoutes,
+                'modifies': len(a_encoder) - ajoutes,
+                'supprimes': len(ids_anciens - set(hashes)),
+                'inchanges': len(films) - len(a_encoder),
+            }
+
+            self._etat = EtatCatalogue(
+                films=list(films),
+                embeddings=embeddings,
+                hashes=hashes,
+                index={film['FilmID']: i for i, film in enumerate(films)},
+                version=self._version_suivante(),
+                blocs=blocs,
+                masques=construire_masques(films),
+                embeddings_champs=embeddings_champs,
+                bm25=IndexBM25.construire(films) if self.lexical else None,
+                **reduits,
+            )
+            self._signature_fichier = signature
+            self._publier_shards()
+            print(f"🔄 Catalogue v{self._etat.version} : {bilan['ajoutes']} ajoutés, "
+                  f"{bilan['modifies']} modifiés, {bilan['supprimes']} supprimés")
+            return bilan
+
+    def projection(self, embeddings):
+        """
+        Projection PCA du moteur : relue depuis `chemin_projection` si elle
+        correspond au modèle et aux dimensions, sinon ajustée sur `embeddings`
+        puis écrite.
+        """
+        if self._projection is None:
+            projection = lire_projection(self.chemin_projection, MODEL_NAME, embeddings.shape[1], self.reduction)
+            if projection is None:
+                projection = ajuster_pca(embeddings, self.reduction, MODEL_NAME)
+                try:
+                    ecrire_projection(projection, self.chemin_projection)
+                except OSError as e:
+                    print(f"⚠️ Projection PCA non sauvegardée : {e}")
+                print(f"✅ Projection PCA ajustée : {projection.dimension} dimensions, "
+                      f"{projection.variance_expliquee:.1%} de la variance conservée")
+            self._projection = projection
+        return self._projection
+
+    def _reduire(self, embeddings, films=None, lignes_encodees=None, nouveaux=None, ancien=None):
+        """
+        Champs `projection` / `embeddings_reduits` du nouvel état. Au
+        rechargement, seules les lignes ré-encodées sont projetées.
+        """
+        if not self.reduction:
+            return {}
+        projection = self.projection(embeddings)
+        if ancien is None or ancien.embeddings_reduits is None or ancien.projection is not projection:
+            reduits = projection.projeter_films(embeddings)
+        else:
+            reduits = _assembler(films, lignes_encodees, projection.projeter_films(nouveaux), ancien,
+                                 'embeddings_reduits')
+        return {'projection': projection, 'embeddings_reduits': reduits}
+
+    def _publier_shards(self):
+        """Envoie la matrice de l'état courant aux shards (appelé sous le verrou de rechargement)."""
+        if not self.shards:
+            return
+        if isinstance(self.shards, int):
+            self.shards = CoordinateurShards.lancer_locaux(self.shards)
+            print(f"✅ {len(self.shards)} shards de recherche démarrés")
+        self.shards.publier(self.matrice(self._etat), version=self._etat.version)
+
+    def demarrer_surveillance(self, intervalle=2.0):
+        """
+        Surveille le fichier du référentiel et le recharge quand il change.
+        """
+        if self._surveillance is not None and self._surveillance.is_alive():
+            return
+        self._arret_surveillance.clear()
+
+        def boucle():
+            while not self._arret_surveillance.wait(intervalle):
+                signature = self._signature()
+                if signature is None or signature == self._signature_fichier:
+                    continue
+                try:
+                    self.recharger()
+                except Exception as e:
+                    print(f"❌ Rechargement du catalogue échoué : {e}")
+                    self._signature_fichier = signature
+
+        self._surveillance = threading.Thread(target=boucle, name="surveillance-catalogue", daemon=True)
+        self._surveillance.start()
+
+    def arreter_surveillance(self):
+        self._arret_surveillance.set()
+        if self._surveillance is not None:
+            self._surveillance.join()
+            self._surveillance = None
+
+    # ----- Recherche -----
+    def encoder_requete(self, reponses):
+        """Embedding normalisé (d,) de la requête utilisateur."""
+        return encoder_textes(self.model, [texte_requete(reponses)], pooling=self.pooling)[0]
+
+    def masque_candidats(self, etat, reponses_utilisateur):
+        """
+        Masque (n,) bool des films admissibles en mode filtres stricts, ou None (tout le catalogue).
+        
+        Activé par `reponses_utilisateur['filtres_stricts']` : la période, la langue
+        et `genre_min` excluent les films avant le calcul de similarité.
+        """
+        if not reponses_utilisateur.get('filtres_stricts') or etat.masques is None:
+            return None
+        return etat.masques.masque(reponses_utilisateur)
+
+    def lignes_candidates(self, etat, reponses_utilisateur):
+        """Lignes du catalogue admissibles (voir masque_candidats), ou None."""
+        masque = self.masque_candidats(etat, reponses_utilisateur)
+        return None if masque is None else np.flatnonzero(masque)
+
+    def matrice(self, etat):
+        """Matrice des films utilisée pour le score sémantique."""
+        if self.fusion and etat.embeddings_champs is not None:
+            return etat.embeddings_champs
+        return etat.embeddings
+
+    def matrice_et_requete(self, etat, reponses_utilisateur):
+        """
+        (matrice des films, vecteur requête) dont le produit donne le score sémantique.
+        """
+        if self.fusion and etat.embeddings_champs is not None:
+            return etat.embeddings_champs, vecteur_fusion(self.model, reponses_utilisateur, self.fusion, self.pooling)
+        return etat.embeddings, self.encoder_requete(reponses_utilisateur)
+
+    def rechercher(self, reponses_utilisateur, top_n=10, requete=None, exclusions=None):
+        """
+        Retourne le top N au même format que `calculer_similarites`.
+        
+        Args:
+            requete: Vecteur requête déjà calculé par `matrice_et_requete` (évite de ré-encoder)
+            exclusions: filtres.Exclusions de l'utilisateur ; le top N ne contient
+                que des films admissibles, quel que soit le nombre d'exclus
+        """
+        etat = self.etat
+        if etat is None:
+            return []
+        if requete is None:
+            matrice, embedding_utilisateur = self.matrice_et_requete(etat, reponses_utilisateur)
+        else:
+            matrice, embedding_utilisateur = self.matrice(etat), requete
+        selection = self._selection(etat, reponses_utilisateur, exclusions)
+        masque, exclus, lexical, candidats, rappel = selection
+        if candidats is None and self.shards and not isinstance(self.shards, int):
+            top = self.shards.top_k(embedding_utilisateur, top_n, _admissibles(masque, exclus),
+                                    version=etat.version)
+            if top is not None:
+                indices, scores = top
+                if rappel is not None:
+                    ajouts = rappel[~np.isin(rappel, indices)]
+                    indices = np.concatenate([indices, ajouts])
+                    scores = np.concatenate([scores, matrice[ajouts] @ embedding_utilisateur])
+                return _formater_top(etat, scores, np.arange(len(indices)), indices, lexical)
+        return self._classer(etat, matrice, embedding_utilisateur, selection).premiers(top_n)
+
+    def classement(self, reponses_utilisateur, requete=None, exclusions=None, taille_min=0):
+        """
+        Classement sémantique complet d'une requête, pour la pagination :
+        les pages suivantes sont lues dans ce classement sans recalcul.
+        
+        Args:
+            taille_min: Nombre de films que le classement doit couvrir : les
+                présélections (candidats BM25, ACP) sont élargies d'autant, et
+                abandonnées pour la recherche dense si elles n'y suffisent pas
+        
+        Returns:
+            ClassementRequete lié à l'état courant (il reste valide après un rechargement)
+        """
+        etat = self.etat
+        if requete is None:
+            matrice, requete = self.matrice_et_requete(etat, reponses_utilisateur)
+        else:
+            matrice = self.matrice(etat)
+        selection = self._selection(etat, reponses_utilisateur, exclusions, taille_min)
+        return self._classer(etat, matrice, requete, selection, taille_min)
+
+    def scores_lexicaux(self, etat, reponses_utilisateur):
+        """
+        Scores BM25 (n,) de la requête normalisés dans [0, 1], ou None
+        (mode lexical désactivé, ou aucun terme de la requête dans le catalogue).
+        """
+        if not self.lexical or etat.bm25 is None:
+            return None
+        return normaliser_scores(etat.bm25.scores(texte_requete(reponses_utilisateur)))
+
+    def annoter_lexical(self, reponses_utilisateur, recommandations, etat=None):
+        """
+        Copie des résultats avec le score lexical de cette requête
+        (ex. candidats d'une requête proche repris du cache sémantique).
+        """
+        etat = etat or self.etat
+        lexical = self.scores_lexicaux(etat, reponses_utilisateur)
+        annotees = []
+        for rec in recommandations:
+            rec = {cle: valeur for cle, valeur in rec.items() if cle != 'score_lexical'}
+            ligne = etat.index.get(rec['film']['FilmID'])
+            if lexical is not None and ligne is not None:
+                rec['score_lexical'] = float(lexical[ligne])
+            annotees.append(rec)
+        return annotees
+
+    def _selection(self, etat, reponses_utilisateur, exclusions=None, taille_min=0):
+        """
+        (masque strict, masque des exclus, scores lexicaux, lignes candidates BM25,
+        lignes de rappel BM25) d'une requête, parmi les films admissibles.
+        
+        Les lignes candidates ne sont calculées qu'en mode lexical "candidats",
+        et abandonnées si elles sont moins de `taille_min` ; sans elles (mode
+        "fusion" ou repli sur la recherche dense), les lignes de rappel sont
+        les `rappel_lexical` meilleurs films BM25, ajoutés au top dense.
+        """
+        masque = self.masque_candidats(etat, reponses_utilisateur)
+        exclus = exclusions.masque(etat) if exclusions else None
+        lexical = self.scores_lexicaux(etat, reponses_utilisateur)
+        candidats = rappel = None
+        if lexical is not None:
+            admissibles = _admissibles(masque, exclus)
+            if self.lexical == "candidats":
+                candidats = candidats_lexicaux(lexical, max(self.candidats_lexicaux, taille_min), admissibles,
+                                               max(self.candidats_min, taille_min))
+            if candidats is None and self.rappel_lexical:
+                rappel = candidats_lexicaux(lexical, self.rappel_lexical, admissibles, minimum=1)
+        return masque, exclus, lexical, candidats, rappel
+
+    def _classer(self, etat, matrice, requete, selection, taille_min=0):
+        """
+        Scores de la requête sur les films admissibles.
+        
+        Sans filtre strict, les films exclus reçoivent -inf après le produit
+        matrice-vecteur (pas de copie de la matrice) et sont retirés du nombre
+        de films admissibles : ils ne peuvent jamais entrer dans le top N.
+        
+        Avec la réduction de dimension, seuls les films présélectionnés sur la
+        matrice réduite (au moins `taille_min`, et les lignes de rappel BM25)
+        sont re-scorés : le classement est alors partiel (`complet` faux).
+        """
+        masque, exclus, lexical, candidats, rappel = selection
+        if candidats is not None:
+            complet = len(candidats) >= _nombre_admissibles(etat, masque, exclus)
+            return ClassementRequete(etat, matrice[candidats] @ requete, candidats, lexical=lexical,
+                                     complet=complet, source="candidats")
+        taille = max(self.preselection, taille_min)
+        if (self.reduction and etat.embeddings_reduits is not None and matrice is etat.embeddings
+                and len(etat) > taille):
+            admissibles = _admissibles(masque, exclus)
+            lignes = preselection(etat.embeddings_reduits, etat.projection.projeter_requete(requete),
+                                  taille, admissibles)
+            complet = len(lignes) >= _nombre_admissibles(etat, masque, exclus)
+            if rappel is not None:
+                lignes = np.union1d(lignes, rappel)
+            return ClassementRequete(etat, matrice[lignes] @ requete, lignes, lexical=lexical, rappel=rappel,
+                                     complet=complet, source="preselection")
+        if masque is None:
+            scores = matrice @ requete
+            if exclus is None:
+                return ClassementRequete(etat, scores, lexical=lexical, rappel=rappel)
+            scores[exclus] = -np.inf
+            return ClassementRequete(etat, scores, admissibles=len(scores) - int(exclus.sum()),
+                                     lexical=lexical, rappel=rappel)
+        if exclus is not None:
+            masque = masque & ~exclus
+        lignes = np.flatnonzero(masque)
+        return ClassementRequete(etat, matrice[lignes] @ requete, lignes, lexical=lexical, rappel=rappel)
+
+
+class ClassementRequete:
+    """
+    Scores sémantiques de tous les films admissibles pour une requête.
+    
+    Le tri est fait à la demande : `premiers(n)` trie un préfixe (doublé quand
+    il ne suffit plus), les pages suivantes sont donc de simples découpes.
+    
+    Les films de `rappel` (lignes du catalogue, meilleurs films BM25) absents
+    des n premiers sont ajoutés après eux : `premiers(n)` peut alors renvoyer
+    plus de n films, re-classés ensuite par score final.
+    
+    Un classement issu d'une présélection (candidats BM25, ACP) n'est pas
+    `complet` : une fois parcouru, il est recalculé plus large
+    (voir MoteurRecommandation.classement).
+    """
+
+    PREFIXE_MIN = 64
+
+    def __init__(self, etat, scores, lignes=None, admissibles=None, lexical=None, rappel=None, complet=True,
+                 source="dense"):
+        self.etat = etat
+        self.scores = scores
+        self.lignes = lignes
+        self.complet = complet          # couvre tous les films admissibles du catalogue
+        self.source = source            # "dense", "candidats" (BM25) ou "preselection" (ACP)
+        self.lexical = lexical          # scores BM25 normalisés (n,) du catalogue, ou None
+        # Films exclus notés -inf en fin de classement : ils ne sont jamais renvoyés
+        self.admissibles = len(scores) if admissibles is None else admissibles
+        self._rappel = np.empty(0, dtype=np.int64) if rappel is None else self._positions(rappel)
+        self._rappel = self._rappel[np.isfinite(scores[self._rappel])]
+        self._ordre = np.empty(0, dtype=np.int64)
+        self._verrou = threading.Lock()
+
+    def __len__(self):
+        return self.admissibles
+
+    def premiers(self, n):
+        """Les n meilleurs films, au format de `selectionner_top`."""
+        n = min(n, self.admissibles)
+        with self._verrou:
+            if n > len(self._ordre):
+                taille = max(n, 2 * len(self._ordre), self.PREFIXE_MIN)
+                self._ordre = top_k_indices(self.scores, taille)
+            ordre = self._ordre[:n]
+        if len(self._rappel):
+            ordre = np.concatenate([ordre, self._rappel[~np.isin(self._rappel, ordre)]])
+        return _formater_top(self.etat, self.scores, ordre, self.lignes, self.lexical)
+
+    def _positions(self, lignes):
+        """Positions dans `scores` des lignes du catalogue présentes dans le classement."""
+        lignes = np.asarray(lignes, dtype=np.int64)
+        if self.lignes is None or not len(lignes):
+            return lignes
+        tri = np.argsort(self.lignes)
+        positions = tri[np.minimum(np.searchsorted(self.lignes, lignes, sorter=tri), len(tri) - 1)]
+        return positions[self.lignes[positions] == lignes]
+
+    def compter_admissibles(self, film_ids):
+        """Nombre de films de `film_ids` présents dans le classement (ni filtrés, ni exclus)."""
+        lignes = self._positions([self.etat.index[f] for f in film_ids if f in self.etat.index])
+        return int(np.count_nonzero(np.isfinite(self.scores[lignes])))
+
+
+def _admissibles(masque, exclus):
+    """Masque des films admissibles (filtres stricts et exclusions), ou None (tout le catalogue)."""
+    if exclus is None:
+        return masque
+    return ~exclus if masque is None else (masque & ~exclus)
+
+
+def _nombre_admissibles(etat, masque, exclus):
+    admissibles = _admissibles(masque, exclus)
+    return len(etat) if admissibles is None else int(np.count_nonzero(admissibles))
+
+
+def _assembler(films, lignes_encodees, nouveaux, ancien, attribut):
+    """
+    Matrice du nouvel état : lignes ré-encodées + lignes reprises de l'ancien état.
+    """
+    n = len(films)
+    dim = nouveaux.shape[1] if len(nouveaux) else getattr(ancien, attribut).shape[1]
+    matrice = np.empty((n, dim), dtype=np.float32)
+    if len(lignes_encodees):
+        matrice[lignes_encodees] = nouveaux
+    encodees = set(lignes_encodees)
+    reprises = [i for i in range(n) if i not in encodees]
+    if reprises:
+        sources = [ancien.index[films[i]['FilmID']] for i in reprises]
+        matrice[reprises] = getattr(ancien, attribut)[sources]
+    matrice.setflags(write=False)
+    return matrice
+
+
+def selectionner_top(etat, scores, top_n, lignes=None):
+    """
+    Sélectionne les top_n lignes de `scores` (ordre décroissant).
+    
+    Si `lignes` est fourni, scores[i] correspond au film etat.films[lignes[i]].
+    Les ex aequo sont départagés par ligne croissante, comme la recherche shardée.
+    """
+    return _formater_top(etat, scores, top_k_indices(scores, top_n), lignes)
+
+
+def _formater_top(etat, scores, ordre, lignes, lexical=None):
+    films_lignes = ordre if lignes is None else lignes[ordre]
+    resultats = [
+        {'film': etat.films[ligne], 'score_semantique': float(scores[i])}
+        for i, ligne in zip(ordre, films_lignes)
+    ]
+    if lexical is not None:
+        for resultat, ligne in zip(resultats, films_lignes):
+            resultat['score_lexical'] = float(lexical[ligne])
+    return resultats
+
+
+_MOTEUR = None
+_VERROU_MOTEUR = threading.Lock()
+
+
+def obtenir_moteur(chemin="referentiel_films.json", artefact="catalogue.arrow", fusion=None, shards=None,
+                   lexical=None, reduction=None, file_inference=False):
+    """
+    Retourne le moteur partagé du processus (créé au premier appel).
+    
+    Si l'artefact binaire existe et est à jour, il est utilisé au démarrage
+    à la place du parsing JSON + encodage des films. `fusion` active le
+    scoring multi-vecteurs (voir POIDS_FUSION_DEFAUT), `shards` la recherche
+    répartie entre plusieurs processus (voir shards.py), `lexical` la
+    recherche hybride BM25 + SBERT ("fusion" ou "candidats"), `reduction`
+    la présélection sur embeddings projetés par ACP (voir projection_pca.py),
+    `file_inference` le worker d'inférence unique (voir file_inference.py).
+    """
+    global _MOTEUR
+    with _VERROU_MOTEUR:
+        if _MOTEUR is None:
+            _MOTEUR = MoteurRecommandation(chemin, artefact=artefact, fusion=fusion, shards=shards,
+                                           lexical=lexical, reduction=reduction, file_inference=file_inference)
+        return _MOTEUR
+
+
 # ========== FONCTION PRINCIPALE DE RECOMMANDATION ==========
 def obtenir_recommandations(reponses_utilisateur, top_n=10):
     """
@@ -144,25 +1015,13 @@ def obtenir_recommandations(reponses_utilisateur, top_n=10):
     Returns:
         list: Top N films recommandés avec leurs scores
     """
-    # 1. Charger le modèle
-    model = charger_modele()
-    
-    # 2. Charger le référentiel
-    referentiel = charger_referentiel()
-    if not referentiel:
+    # Le modèle et les films encodés restent en mémoire entre deux appels :
+    # seuls les films ajoutés/modifiés sont ré-encodés quand le référentiel change.
+    moteur = obtenir_moteur()
+    if moteur.etat is None:
         return []
     
-    # 3. Encoder les films
-    embeddings_films = encoder_films(model, referentiel['films'])
-    
-    # 4. Encoder la requête utilisateur
-    embedding_utilisateur = encoder_requete_utilisateur(model, reponses_utilisateur)
-    
-    # 5. Calculer les similarités
-    resultats = calculer_similarites(embedding_utilisateur, embeddings_films)
-    
-    # 6. Retourner le top N
-    return resultats[:top_n]
+    return moteur.rechercher(reponses_utilisateur, top_n=top_n)
 
 
 # ========== FONCTION AVEC PONDÉRATION PAR GENRE ==========
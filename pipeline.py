@@ -0,0 +1,445 @@
+"""
+Pipeline de recommandation (hors interface)
+
+Enchaîne les phases de app.py :
+    3. Recherche sémantique (nlp_engine)
+    4. Scoring pondéré (scoring)
+    5. Explications Gemini (genai_module)
+    6. Graphiques Plotly (visualisations), sérialisés en JSON
+
+Le résultat complet peut être mis en cache, et les candidats d'une requête
+proche réutilisés par le cache sémantique (voir cache.py).
+
+Les pages suivantes ("5 films de plus") sont servies par un curseur sur le
+classement complet de la requête, sans relancer le pipeline.
+"""
+
+from __future__ import annotations
+import copy
+from dataclasses import dataclass, field, replace
+from typing import Dict, Any, List, Optional, Callable, Set
+
+import numpy as np
+
+from nlp_engine import MODEL_NAME, obtenir_moteur
+from scoring import compute_final_score, mmr_rerank, DEFAULT_WEIGHTS
+from genai_module import generate_explanation, gemini_available, fallback_explanation, local_explanation
+from pitchs_films import obtenir_pitch
+from visualisations import figures_serialisees
+from cache import CacheReponses, CacheSemantique, cle_reponses, empreinte_config
+from filtres import Exclusions
+from profil_session import ProfilSession
+from journal_requetes import Etapes
+
+TOP_N_RECHERCHE = 10
+TOP_N_AFFICHES = 5
+
+
+@dataclass
+class ResultatRecommandation:
+    recommandations: List[Dict[str, Any]]   # film, score_semantique, breakdown, score_final, explanation
+    figures: Dict[str, str] = field(default_factory=dict)  # nom -> figure Plotly en JSON
+    depuis_cache: bool = False
+    requete: Optional[np.ndarray] = field(default=None, repr=False)  # vecteur requête (profil de session)
+    # Explications différées : à appeler une fois les explications remplies
+    # par l'appelant (ex. streamées dans l'interface) pour alimenter les caches
+    memoriser: Optional[Callable[[], None]] = field(default=None, repr=False, compare=False)
+
+
+def classer(reponses_utilisateur, recommandations_brutes, weights=None):
+    """
+    Phase 4 : score final pondéré de chaque film, trié par score décroissant.
+    """
+    recommandations_enrichies = []
+    for rec in recommandations_brutes:
+        breakdown = compute_final_score(
+            cosine_similarity_raw=rec['score_semantique'],
+            film=rec['film'],
+            user_answers=reponses_utilisateur,
+            weights=weights,
+            lexical_score=rec.get('score_lexical')
+        )
+        recommandations_enrichies.append({
+            'film': rec['film'],
+            'score_semantique': rec['score_semantique'],
+            'breakdown': breakdown,
+            'score_final': breakdown.final
+        })
+    recommandations_enrichies.sort(key=lambda x: x['score_final'], reverse=True)
+    return recommandations_enrichies
+
+
+def diversifier(recommandations, etat, top_n, diversite):
+    """
+    Re-classement MMR des films classés : score_final contre redondance
+    (cosinus entre embeddings de films), pour éviter un top N d'un seul genre.
+
+    Args:
+        diversite: lambda MMR (1.0 = score_final seul, plus bas = plus de diversité)
+    """
+    if any(rec['film']['FilmID'] not in etat.index for rec in recommandations):
+        return recommandations[:top_n]
+    lignes = [etat.index[rec['film']['FilmID']] for rec in recommandations]
+    ordre = mmr_rerank(
+        [rec['score_final'] for rec in recommandations],
+        etat.embeddings[lignes],
+        top_n,
+        diversite
+    )
+    return [recommandations[i] for i in ordre]
+
+
+def selectionner(reponses_utilisateur, recommandations_brutes, weights=None, top_n=TOP_N_AFFICHES,
+                 diversite=None, etat=None):
+    """Phase 4 complète : classement par score final puis, si demandé, diversification."""
+    classees = classer(reponses_utilisateur, recommandations_brutes, weights)
+    if diversite is None or etat is None:
+        return classees[:top_n]
+    return diversifier(classees, etat, top_n, diversite)
+
+
+def expliquer(reponses_utilisateur, recommandations):
+    """Phase 5 : explication Gemini (ou fallback) pour chaque film."""
+    for rec in recommandations:
+        rec['explanation'] = generate_explanation(
+            user_answers=reponses_utilisateur,
+            film=rec['film'],
+            score_final=rec['score_final'],
+            pitch=obtenir_pitch(rec['film'])
+        )
+    return recommandations
+
+
+def construire_figures(reponses_utilisateur, recommandations):
+    """Phase 6 : graphiques sérialisés (plotly.io.from_json pour les relire), en cache par résultat."""
+    recommandations_viz = [(rec['film'], rec['score_final']) for rec in recommandations]
+    return figures_serialisees(recommandations_viz, reponses_utilisateur["preferences"])
+
+
+def jeton_configuration(moteur, weights=None):
+    """
+    Tout ce qui invalide un résultat mis en cache : version du catalogue,
+    modèle, pondérations (recherche et scoring), modes lexical et de pooling,
+    réduction de dimension, disponibilité de Gemini.
+    """
+    etat = moteur.etat
+    return empreinte_config(
+        MODEL_NAME,
+        etat.version if etat is not None else None,
+        sorted((weights or DEFAULT_WEIGHTS).items()),
+        sorted((f"{a}/{b}", w) for (a, b), w in (moteur.fusion or {}).items()),
+        moteur.lexical,
+        moteur.pooling,
+        (moteur.reduction, moteur.preselection) if moteur.reduction else None,
+        gemini_available(),
+    )
+
+
+def contexte_recherche(reponses_utilisateur, top_n_recherche, exclusions=None):
+    """
+    Paramètres (hors texte) qui changent la liste des candidats : deux requêtes
+    proches ne partagent leurs candidats que si leur contexte est identique.
+    """
+    contexte = {'top_n': top_n_recherche}
+    if exclusions:
+        contexte['exclusions'] = exclusions.empreinte()
+    if reponses_utilisateur.get('filtres_stricts'):
+        contexte.update({
+            'periode': reponses_utilisateur.get('periode'),
+            'langue': reponses_utilisateur.get('langue'),
+            'genre_min': reponses_utilisateur.get('genre_min'),
+            'preferences': reponses_utilisateur.get('preferences') if reponses_utilisateur.get('genre_min') else None,
+        })
+    return empreinte_config(contexte)
+
+
+def _depuis_candidats(reponses_utilisateur, entree, weights, top_n, requete=None, diversite=None, etat=None):
+    """
+    Succès du cache sémantique : re-scoring des candidats pour cet utilisateur,
+    explications reprises du cache (fallback pour les films qui n'en ont pas).
+    """
+    top_recommandations = selectionner(reponses_utilisateur, entree['candidats'], weights, top_n, diversite, etat)
+    for rec in top_recommandations:
+        explication = entree['explications'].get(rec['film']['FilmID'])
+        if not explication:
+            pitch = obtenir_pitch(rec['film'])
+            explication = local_explanation(reponses_utilisateur, rec['film'], pitch, rec['score_final']) \
+                if pitch else fallback_explanation(rec['score_final'])
+        rec['explanation'] = explication
+    return ResultatRecommandation(
+        recommandations=top_recommandations,
+        figures=construire_figures(reponses_utilisateur, top_recommandations),
+        depuis_cache=True,
+        requete=requete,
+    )
+
+
+def executer_pipeline(
+    reponses_utilisateur: Dict[str, Any],
+    moteur=None,
+    cache: Optional[CacheReponses] = None,
+    cache_semantique: Optional[CacheSemantique] = None,
+    weights: Optional[Dict[str, float]] = None,
+    top_n_recherche: int = TOP_N_RECHERCHE,
+    top_n: int = TOP_N_AFFICHES,
+    differer_explications: bool = False,
+    exclusions: Optional[Exclusions] = None,
+    diversite: Optional[float] = None,
+    journal=None
+) -> ResultatRecommandation:
+    """
+    Exécute tout le pipeline pour une soumission du questionnaire.
+
+    `exclusions` (films déjà vus, genres bloqués) est appliqué dans la
+    sélection du top N : les films affichés sont tous admissibles.
+
+    `diversite` (lambda MMR, ex. 0.7) re-classe les `top_n_recherche`
+    candidats pour limiter les films redondants dans le top N.
+
+    Avec `differer_explications`, les films sont retournés sans 'explanation' :
+    l'appelant les génère (ex. generate_explanation_stream) puis appelle
+    `resultat.memoriser()` pour mettre le résultat complet en cache.
+
+    `journal` (journal_requetes.JournalRequetes) reçoit les réponses
+    anonymisées et la durée de chaque étape de l'exécution.
+
+    Returns:
+        ResultatRecommandation (liste vide si aucun film ne correspond)
+    """
+    etapes = Etapes()
+    resultat = _executer_pipeline(reponses_utilisateur, moteur or obtenir_moteur(), cache, cache_semantique,
+                                  weights, top_n_recherche, top_n, differer_explications, exclusions,
+                                  diversite, etapes)
+    if journal is not None:
+        journal.enregistrer(
+            reponses_utilisateur, etapes,
+            top_n=top_n, top_n_recherche=top_n_recherche, diversite=diversite,
+            genres_exclus=sorted(exclusions.genres) if exclusions else [],
+            films_exclus=len(exclusions.films) if exclusions else 0,
+            resultats=len(resultat.recommandations),
+        )
+    return resultat
+
+
+def _copie_independante(resultat: ResultatRecommandation, **changements) -> ResultatRecommandation:
+    """
+    Copie d'un résultat mis en cache : ses recommandations peuvent être modifiées
+    (explications streamées, etc.) sans altérer l'entrée partagée entre les
+    sessions. Les films du référentiel restent partagés.
+    """
+    films = {id(rec['film']): rec['film'] for rec in resultat.recommandations}
+    return replace(resultat, recommandations=copy.deepcopy(resultat.recommandations, films),
+                   figures=dict(resultat.figures), **changements)
+
+
+def _executer_pipeline(reponses_utilisateur, moteur, cache, cache_semantique, weights, top_n_recherche, top_n,
+                       differer_explications, exclusions, diversite, etapes: Etapes) -> ResultatRecommandation:
+    cle = None
+    jeton = jeton_configuration(moteur, weights) if cache is not None or cache_semantique is not None else None
+    if cache is not None:
+        cle = (cle_reponses(reponses_utilisateur), top_n_recherche, top_n,
+               exclusions.empreinte() if exclusions else None, diversite)
+        with etapes("cache"):
+            resultat = cache.obtenir(cle, jeton)
+        if resultat is not None:
+            etapes.source = "cache"
+            return _copie_independante(resultat, depuis_cache=True)
+
+    # Encodé une fois : sert au cache sémantique, à la recherche et au profil de session
+    with etapes("encodage"):
+        _, requete = moteur.matrice_et_requete(moteur.etat, reponses_utilisateur)
+    contexte = None
+    if cache_semantique is not None:
+        contexte = contexte_recherche(reponses_utilisateur, top_n_recherche, exclusions)
+        with etapes("cache_semantique"):
+            entree, _ = cache_semantique.chercher(requete, contexte, jeton)
+        if entree is not None:
+            etapes.source = "cache_semantique"
+            if cache_semantique.a_verifier():
+                with etapes("recherche"):
+                    frais = moteur.rechercher(reponses_utilisateur, top_n=top_n_recherche, requete=requete,
+                                              exclusions=exclusions)
+                cache_semantique.enregistrer_verification(
+                    [c['film']['FilmID'] for c in entree['candidats']],
+                    [c['film']['FilmID'] for c in frais]
+                )
+            with etapes("scoring"):
+                # Scores lexicaux recalculés : ils dépendent des termes exacts de cette requête
+                entree = dict(entree, candidats=moteur.annoter_lexical(reponses_utilisateur, entree['candidats']))
+                resultat = _depuis_candidats(reponses_utilisateur, entree, weights, top_n, requete,
+                                             diversite, moteur.etat)
+            if cache is not None:
+                cache.stocker(cle, _copie_independante(resultat), jeton)
+            return resultat
+
+    with etapes("recherche"):
+        recommandations_brutes = moteur.rechercher(reponses_utilisateur, top_n=top_n_recherche, requete=requete,
+                                                   exclusions=exclusions)
+    if not recommandations_brutes:
+        return ResultatRecommandation(recommandations=[], requete=requete)
+
+    with etapes("scoring"):
+        top_recommandations = selectionner(reponses_utilisateur, recommandations_brutes, weights, top_n,
+                                           diversite, moteur.etat)
+    if not differer_explications:
+        with etapes("explications"):
+            expliquer(reponses_utilisateur, top_recommandations)
+    with etapes("figures"):
+        figures = construire_figures(reponses_utilisateur, top_recommandations)
+    resultat = ResultatRecommandation(
+        recommandations=top_recommandations,
+        figures=figures,
+        requete=requete,
+    )
+
+    def memoriser():
+        resultat.memoriser = None
+        if cache is not None:
+            cache.stocker(cle, _copie_independante(resultat), jeton)
+        if cache_semantique is not None:
+            cache_semantique.stocker(requete, {
+                'candidats': recommandations_brutes,
+                'explications': {
+                    rec['film']['FilmID']: rec['explanation']
+                    for rec in top_recommandations if rec.get('explanation')
+                },
+            }, contexte, jeton)
+
+    if differer_explications:
+        resultat.memoriser = memoriser
+    else:
+        memoriser()
+    return resultat
+
+
+# ========== RETOURS UTILISATEUR ==========
+def reclasser(
+    reponses_utilisateur: Dict[str, Any],
+    profil: ProfilSession,
+    moteur=None,
+    weights: Optional[Dict[str, float]] = None,
+    top_n_recherche: int = TOP_N_RECHERCHE,
+    top_n: int = TOP_N_AFFICHES,
+    exclusions: Optional[Exclusions] = None,
+    explications_connues: Optional[Dict[Any, str]] = None,
+    differer_explications: bool = False,
+    diversite: Optional[float] = None
+) -> ResultatRecommandation:
+    """
+    Reclasse le catalogue avec le vecteur du profil de session (après un retour
+    "plus comme ça / moins comme ça") : un produit matrice-vecteur, sans SBERT.
+
+    Args:
+        explications_connues: FilmID -> explication déjà affichée, reprise telle quelle
+
+    Returns:
+        ResultatRecommandation (non mis en cache : il dépend des retours de la session)
+    """
+    moteur = moteur or obtenir_moteur()
+    etat = moteur.etat
+    requete = profil.vecteur(etat, moteur.matrice(etat))
+    recommandations_brutes = moteur.rechercher(reponses_utilisateur, top_n=top_n_recherche, requete=requete,
+                                               exclusions=exclusions)
+    top_recommandations = selectionner(reponses_utilisateur, recommandations_brutes, weights, top_n,
+                                       diversite, etat)
+
+    explications_connues = explications_connues or {}
+    nouveaux = []
+    for rec in top_recommandations:
+        explication = explications_connues.get(rec['film']['FilmID'])
+        if explication:
+            rec['explanation'] = explication
+        else:
+            nouveaux.append(rec)
+    if not differer_explications:
+        expliquer(reponses_utilisateur, nouveaux)
+
+    return ResultatRecommandation(
+        recommandations=top_recommandations,
+        figures=construire_figures(reponses_utilisateur, top_recommandations) if top_recommandations else {},
+        requete=requete,
+    )
+
+
+# ========== PAGINATION ==========
+@dataclass
+class CurseurRecommandations:
+    """
+    Position d'un utilisateur dans le classement de sa requête (à garder en session).
+
+    Chaque page reprend la règle de la première : les candidats sont les
+    `top_n_recherche` meilleurs films sémantiques non encore affichés, classés
+    par score final. Un classement partiel (présélection BM25 ou ACP) est
+    élargi quand il ne reste plus assez de films non affichés.
+    """
+    reponses_utilisateur: Dict[str, Any]
+    moteur: Any
+    vus: Set[Any] = field(default_factory=set)   # FilmID déjà affichés
+    weights: Optional[Dict[str, float]] = None
+    top_n_recherche: int = TOP_N_RECHERCHE
+    exclusions: Optional[Exclusions] = None
+    requete: Optional[np.ndarray] = None           # vecteur du profil de session, sinon requête encodée
+    classement: Any = None                         # ClassementRequete, calculé au premier appel
+    revision_exclusions: Optional[int] = None      # révision des exclusions du classement
+
+    @property
+    def epuise(self) -> bool:
+        # Les films vus hors du classement (exclus depuis, filtrés) ne comptent pas
+        return (self.classement is not None and self.classement.complet
+                and self.classement.compter_admissibles(self.vus) >= len(self.classement))
+
+    def restants(self) -> int:
+        """Films du classement courant pas encore affichés."""
+        return len(self.classement) - self.classement.compter_admissibles(self.vus)
+
+
+def ouvrir_curseur(reponses_utilisateur, resultat: ResultatRecommandation, moteur=None, weights=None,
+                   top_n_recherche: int = TOP_N_RECHERCHE,
+                   exclusions: Optional[Exclusions] = None) -> CurseurRecommandations:
+    """Curseur placé après les films déjà affichés par `executer_pipeline`."""
+    return CurseurRecommandations(
+        reponses_utilisateur=reponses_utilisateur,
+        moteur=moteur or obtenir_moteur(),
+        vus={rec['film']['FilmID'] for rec in resultat.recommandations},
+        weights=weights,
+        top_n_recherche=top_n_recherche,
+        exclusions=exclusions,
+        requete=resultat.requete,
+    )
+
+
+def page_suivante(curseur: CurseurRecommandations, taille: int = TOP_N_AFFICHES,
+                  avec_explications: bool = False) -> List[Dict[str, Any]]:
+    """
+    Films de la page suivante, au format de `ResultatRecommandation.recommandations`.
+
+    Le classement sémantique complet n'est calculé qu'une fois par curseur
+    (et de nouveau si les exclusions ont changé, ou pour élargir un classement
+    partiel parcouru) ; seuls les films de la page sont scorés (et expliqués
+    si demandé).
+
+    Returns:
+        Liste vide quand tout le catalogue admissible a été parcouru
+    """
+    revision = curseur.exclusions.revision if curseur.exclusions is not None else None
+    besoin = len(curseur.vus) + curseur.top_n_recherche
+    taille_min = None
+    if curseur.classement is None or revision != curseur.revision_exclusions:
+        taille_min = besoin
+    elif not curseur.classement.complet and curseur.restants() < curseur.top_n_recherche:
+        taille_min = max(besoin, 2 * len(curseur.classement))
+    if taille_min is not None:
+        curseur.classement = curseur.moteur.classement(
+            curseur.reponses_utilisateur, requete=curseur.requete, exclusions=curseur.exclusions,
+            taille_min=taille_min
+        )
+        curseur.revision_exclusions = revision
+    candidats = [
+        c for c in curseur.classement.premiers(len(curseur.vus) + curseur.top_n_recherche)
+        if c['film']['FilmID'] not in curseur.vus
+    ]
+    page = classer(curseur.reponses_utilisateur, candidats, curseur.weights)[:taille]
+    curseur.vus.update(rec['film']['FilmID'] for rec in page)
+    if avec_explications:
+        expliquer(curseur.reponses_utilisateur, page)
+    return page
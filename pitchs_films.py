@@ -0,0 +1,192 @@
+"""
+Pitchs films - Pré-génération hors ligne d'un pitch court et de thèmes par film
+
+Le job parcourt le catalogue et stocke pour chaque film un pitch d'une phrase
+et quelques thèmes (via Gemini, ou extraits localement sans clé API). Le
+fichier est sauvegardé au fil de l'eau : un job interrompu reprend là où il
+s'était arrêté, et seuls les films nouveaux ou modifiés sont regénérés.
+
+En ligne, genai_module envoie ces résumés à la place de la description et des
+mots-clés complets (prompts plus courts), ou compose une explication locale
+quand Gemini est indisponible.
+
+Usage :
+    python pitchs_films.py --referentiel referentiel_films.json --sortie pitchs_films.json
+"""
+
+from __future__ import annotations
+from typing import Dict, Any, Optional
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from nlp_engine import charger_referentiel, hash_film
+
+CHEMIN_PITCHS = "pitchs_films.json"
+VERSION_PITCHS = 1
+NB_THEMES = 4
+LONGUEUR_PITCH = 160
+TENTATIVES_MAX = 3   # passages par film avant de le compter en échec
+
+_cache_pitchs = {"signature": None, "films": {}}
+_verrou_pitchs = threading.Lock()
+
+
+# ========== STOCKAGE ==========
+def lire_pitchs(chemin: str = CHEMIN_PITCHS) -> Dict[str, Dict[str, Any]]:
+    """Pitchs stockés {FilmID (str): {'hash', 'pitch', 'themes', 'source'}}."""
+    try:
+        with open(chemin, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != VERSION_PITCHS:
+        return {}
+    return data.get("films", {})
+
+
+def ecrire_pitchs(pitchs: Dict[str, Dict[str, Any]], chemin: str = CHEMIN_PITCHS):
+    """Écriture atomique (fichier temporaire puis renommage)."""
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION_PITCHS, "films": pitchs}, f, ensure_ascii=False, indent=1)
+    os.replace(temporaire, chemin)
+
+
+def obtenir_pitch(film: Dict[str, Any], chemin: str = CHEMIN_PITCHS) -> Optional[Dict[str, Any]]:
+    """
+    Pitch précalculé d'un film, ou None s'il n'existe pas ou si le film a changé
+    depuis sa génération. Le fichier est relu seulement quand il change sur disque.
+    """
+    try:
+        st = os.stat(chemin)
+        signature = (chemin, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+    with _verrou_pitchs:
+        if _cache_pitchs["signature"] != signature:
+            _cache_pitchs["films"] = lire_pitchs(chemin)
+            _cache_pitchs["signature"] = signature
+        entree = _cache_pitchs["films"].get(str(film.get("FilmID")))
+    if entree is None or entree.get("hash") != hash_film(film):
+        return None
+    return entree
+
+
+# ========== GÉNÉRATION ==========
+def pitch_local(film: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pitch extrait sans LLM : première phrase de la description, premiers mots-clés.
+    """
+    description = (film.get("Description") or "").strip()
+    phrases = re.split(r"(?<=[.!?])\s+", description)
+    pitch = phrases[0] if phrases else description
+    if len(pitch) > LONGUEUR_PITCH:
+        coupe = pitch[: LONGUEUR_PITCH - 3]
+        pitch = (coupe.rsplit(" ", 1)[0] if " " in coupe else coupe).rstrip(" ,;:") + "..."
+    themes = [k.strip() for k in (film.get("Keywords") or "").split(",") if k.strip()][:NB_THEMES]
+    return {"pitch": pitch, "themes": themes}
+
+
+def generer_pitchs(
+    chemin_referentiel: str = "referentiel_films.json",
+    chemin_sortie: str = CHEMIN_PITCHS,
+    local: bool = False,
+    limite: Optional[int] = None,
+    sauvegarde_tous: int = 5,
+    requetes_par_minute: Optional[float] = None
+) -> Dict[str, int]:
+    """
+    Génère les pitchs manquants ou périmés, avec reprise sur interruption.
+
+    Le job a sa propre couche de résilience : il attend chaque jeton du
+    limiteur de débit (au rythme de `requetes_par_minute`, quota Gemini par
+    défaut) au lieu d'abandonner au bout d'une seconde comme l'application.
+    Un film en échec transitoire est retenté en fin de parcours, jusqu'à
+    TENTATIVES_MAX fois ; si le disjoncteur s'ouvre, le job s'arrête
+    proprement (relancer la commande pour reprendre).
+
+    Returns:
+        dict: Compteurs generes / deja_a_jour / echecs
+    """
+    from genai_module import (gemini_available, generate_film_pitch, GeminiUnavailable,
+                              ResilienceConfig, ResilientCaller)
+
+    config = ResilienceConfig(acquire_timeout=float("inf"))
+    if requetes_par_minute:
+        config.requests_per_minute = requetes_par_minute
+    caller = ResilientCaller(config)
+
+    referentiel = charger_referentiel(chemin_referentiel)
+    if not referentiel:
+        return {"generes": 0, "deja_a_jour": 0, "echecs": 0}
+
+    pitchs = lire_pitchs(chemin_sortie)
+    utiliser_gemini = gemini_available() and not local
+    bilan = {"generes": 0, "deja_a_jour": 0, "echecs": 0}
+    depuis_sauvegarde = 0
+    debut = time.perf_counter()
+
+    a_traiter = []
+    for film in referentiel["films"]:
+        if pitchs.get(str(film["FilmID"]), {}).get("hash") == hash_film(film):
+            bilan["deja_a_jour"] += 1
+        else:
+            a_traiter.append((film, 1))
+
+    try:
+        while a_traiter:
+            film, tentative = a_traiter.pop(0)
+            cle = str(film["FilmID"])
+            empreinte = hash_film(film)
+            if limite is not None and bilan["generes"] >= limite:
+                break
+
+            if utiliser_gemini:
+                try:
+                    resume, source = generate_film_pitch(film, NB_THEMES, LONGUEUR_PITCH, caller=caller), "gemini"
+                except GeminiUnavailable as e:
+                    if caller.breaker.state == "open":
+                        bilan["echecs"] += 1 + len(a_traiter)
+                        print(f"⚠️ Gemini indisponible ({e}) : arrêt, relancer pour reprendre")
+                        break
+                    if tentative < TENTATIVES_MAX:
+                        a_traiter.append((film, tentative + 1))
+                    else:
+                        bilan["echecs"] += 1
+                        print(f"⚠️ {film['Film']} : échec après {tentative} tentatives ({e})")
+                    continue
+                except ValueError as e:
+                    print(f"⚠️ {film['Film']} : réponse inexploitable ({e}), pitch local")
+                    resume, source = pitch_local(film), "local"
+            else:
+                resume, source = pitch_local(film), "local"
+
+            pitchs[cle] = {"hash": empreinte, "source": source, **resume}
+            bilan["generes"] += 1
+            depuis_sauvegarde += 1
+            if depuis_sauvegarde >= sauvegarde_tous:
+                ecrire_pitchs(pitchs, chemin_sortie)
+                depuis_sauvegarde = 0
+    finally:
+        ecrire_pitchs(pitchs, chemin_sortie)
+
+    duree = time.perf_counter() - debut
+    print(f"✅ Pitchs : {bilan['generes']} générés, {bilan['deja_a_jour']} à jour, "
+          f"{bilan['echecs']} échecs ({duree:.1f} s)")
+    return bilan
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-génère les pitchs et thèmes des films.")
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--sortie", default=CHEMIN_PITCHS)
+    parser.add_argument("--local", action="store_true", help="Extraction locale, sans Gemini")
+    parser.add_argument("--limite", type=int, default=None, help="Nombre max de films à générer")
+    parser.add_argument("--rpm", type=float, default=None, help="Requêtes Gemini par minute (quota par défaut)")
+    args = parser.parse_args()
+    generer_pitchs(args.referentiel, args.sortie, local=args.local, limite=args.limite,
+                   requetes_par_minute=args.rpm)
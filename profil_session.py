@@ -0,0 +1,91 @@
+"""
+Profil de session - Retours "plus comme ça / moins comme ça" sans ré-encodage
+
+Le vecteur requête de la session est ajusté par la règle de Rocchio à partir
+des embeddings des films déjà présents dans la matrice du catalogue :
+
+    q' = alpha * q0 + beta * moyenne(films aimés) - gamma * moyenne(films rejetés)
+
+Un retour coûte donc une moyenne de quelques lignes et un produit
+matrice-vecteur pour reclasser, sans inférence SBERT.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict
+import threading
+
+import numpy as np
+
+ALPHA = 1.0
+BETA = 0.75
+GAMMA = 0.25
+
+
+class ProfilSession:
+    """
+    Vecteur requête d'une session, mis à jour par les retours de l'utilisateur.
+
+    Le vecteur ajusté garde la norme de la requête initiale : les scores
+    sémantiques restent sur la même échelle pour scoring.compute_final_score.
+    """
+
+    def __init__(self, requete: np.ndarray, alpha: float = ALPHA, beta: float = BETA, gamma: float = GAMMA):
+        self.requete = np.asarray(requete, dtype=np.float32)
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.retours: Dict[Any, int] = {}   # FilmID -> +1 (aimé) / -1 (rejeté)
+        self._verrou = threading.Lock()
+
+    def plus_comme(self, film_id):
+        with self._verrou:
+            self.retours[film_id] = 1
+
+    def moins_comme(self, film_id):
+        with self._verrou:
+            self.retours[film_id] = -1
+
+    def annuler(self, film_id):
+        with self._verrou:
+            self.retours.pop(film_id, None)
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.retours.clear()
+
+    def __len__(self):
+        return len(self.retours)
+
+    def vecteur(self, etat, matrice: np.ndarray) -> np.ndarray:
+        """
+        Vecteur requête ajusté pour un état du catalogue.
+
+        Args:
+            etat: EtatCatalogue (pour retrouver la ligne de chaque FilmID)
+            matrice: Matrice des films utilisée pour le score (moteur.matrice(etat))
+
+        Returns:
+            np.ndarray: Vecteur de même dimension et de même norme que la requête initiale
+        """
+        with self._verrou:
+            retours = list(self.retours.items())
+        aimes = [etat.index[f] for f, signe in retours if signe > 0 and f in etat.index]
+        rejetes = [etat.index[f] for f, signe in retours if signe < 0 and f in etat.index]
+        if not aimes and not rejetes:
+            return self.requete
+
+        vecteur = self.alpha * self.requete
+        if aimes:
+            vecteur = vecteur + self.beta * matrice[aimes].mean(axis=0)
+        if rejetes:
+            vecteur = vecteur - self.gamma * matrice[rejetes].mean(axis=0)
+
+        norme = float(np.linalg.norm(vecteur))
+        if norme == 0.0:
+            return self.requete
+        return (vecteur * (float(np.linalg.norm(self.requete)) / norme)).astype(np.float32)
+
+    def statistiques(self) -> Dict[str, int]:
+        with self._verrou:
+            signes = list(self.retours.values())
+        return {"aimes": signes.count(1), "rejetes": signes.count(-1)}
@@ -0,0 +1,171 @@
+"""
+Projection PCA - Embeddings réduits pour une présélection rapide
+
+Une projection linéaire (ACP ajustée sur les embeddings du catalogue) ramène
+les vecteurs de 384 à k dimensions. La recherche se fait alors en deux temps :
+
+1. présélection : produit matrice-vecteur sur la matrice réduite (n, k),
+   k / 384 de la mémoire lue par la recherche pleine dimension ;
+2. re-scoring : cosinus exact (pleine dimension) des seuls films présélectionnés.
+
+Les films sont centrés sur la moyenne du catalogue avant projection, la
+requête ne l'est pas : pour une requête q, x.q et (x - moyenne).q ne diffèrent
+que d'une constante, le classement est donc conservé.
+
+La projection est écrite à côté des embeddings (projection_pca.npz) et reprise
+au démarrage si elle correspond au modèle et aux dimensions demandées.
+
+Usage :
+    python projection_pca.py --referentiel referentiel_films.json --dimension 64
+"""
+
+from __future__ import annotations
+from typing import Dict, Optional
+import argparse
+import json
+import os
+
+import numpy as np
+
+from shards import top_k_indices
+
+CHEMIN_PROJECTION = "projection_pca.npz"
+DIMENSION_REDUITE = 64
+TAILLE_BLOC = 65536
+
+
+class ProjectionPCA:
+    """
+    Projection (d,) -> (k,) : films centrés puis multipliés par les k
+    composantes principales, requêtes multipliées seulement.
+    """
+
+    def __init__(self, moyenne: np.ndarray, composantes: np.ndarray, variance_expliquee: float,
+                 modele: str = ""):
+        self.moyenne = np.asarray(moyenne, dtype=np.float32)          # (d,)
+        self.composantes = np.asarray(composantes, dtype=np.float32)  # (d, k)
+        self.variance_expliquee = float(variance_expliquee)
+        self.modele = modele
+
+    @property
+    def dimension_source(self) -> int:
+        return self.composantes.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.composantes.shape[1]
+
+    def projeter_films(self, embeddings: np.ndarray, taille_bloc: int = TAILLE_BLOC) -> np.ndarray:
+        """Matrice réduite (n, k) float32, calculée par blocs de lignes."""
+        reduits = np.empty((len(embeddings), self.dimension), dtype=np.float32)
+        for debut in range(0, len(embeddings), taille_bloc):
+            bloc = np.asarray(embeddings[debut:debut + taille_bloc], dtype=np.float32)
+            reduits[debut:debut + len(bloc)] = (bloc - self.moyenne) @ self.composantes
+        reduits.setflags(write=False)
+        return reduits
+
+    def projeter_requete(self, requete: np.ndarray) -> np.ndarray:
+        return np.asarray(requete, dtype=np.float32) @ self.composantes
+
+
+def ajuster_pca(embeddings: np.ndarray, dimension: int = DIMENSION_REDUITE, modele: str = "",
+                taille_bloc: int = TAILLE_BLOC) -> ProjectionPCA:
+    """
+    Ajuste la projection sur les embeddings du catalogue.
+
+    La covariance (d, d) est accumulée par blocs de lignes (mémoire bornée,
+    matrice en mémoire mappée acceptée), puis diagonalisée.
+
+    Args:
+        embeddings: Matrice (n, d) des films
+        dimension: Nombre de composantes conservées (k < d)
+    """
+    n, d = embeddings.shape
+    dimension = min(dimension, d)
+    somme = np.zeros(d, dtype=np.float64)
+    for debut in range(0, n, taille_bloc):
+        somme += np.asarray(embeddings[debut:debut + taille_bloc], dtype=np.float64).sum(axis=0)
+    moyenne = somme / max(n, 1)
+
+    covariance = np.zeros((d, d), dtype=np.float64)
+    for debut in range(0, n, taille_bloc):
+        bloc = np.asarray(embeddings[debut:debut + taille_bloc], dtype=np.float64) - moyenne
+        covariance += bloc.T @ bloc
+
+    valeurs, vecteurs = np.linalg.eigh(covariance)
+    ordre = np.argsort(valeurs)[::-1][:dimension]
+    totale = float(valeurs.clip(min=0).sum())
+    variance = float(valeurs[ordre].clip(min=0).sum()) / totale if totale > 0 else 1.0
+    return ProjectionPCA(moyenne, vecteurs[:, ordre], variance, modele)
+
+
+def preselection(reduits: np.ndarray, requete_reduite: np.ndarray, n: int,
+                 admissibles: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Lignes des n meilleurs films sur la matrice réduite (ordre croissant),
+    parmi les films admissibles.
+    """
+    scores = reduits @ requete_reduite
+    if admissibles is None:
+        return np.sort(top_k_indices(scores, n))
+    scores[~admissibles] = -np.inf
+    n = min(n, int(admissibles.sum()))
+    return np.sort(top_k_indices(scores, n))
+
+
+# ========== PERSISTANCE ==========
+def ecrire_projection(projection: ProjectionPCA, chemin: str = CHEMIN_PROJECTION):
+    """Écriture atomique : moyenne, composantes et métadonnées en JSON."""
+    meta = json.dumps({"modele": projection.modele, "variance_expliquee": projection.variance_expliquee})
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "wb") as f:
+        np.savez(f, moyenne=projection.moyenne, composantes=projection.composantes, meta=np.array(meta))
+    os.replace(temporaire, chemin)
+
+
+def lire_projection(chemin: str = CHEMIN_PROJECTION, modele: Optional[str] = None,
+                    dimension_source: Optional[int] = None,
+                    dimension: Optional[int] = None) -> Optional[ProjectionPCA]:
+    """
+    Returns:
+        ProjectionPCA, ou None si le fichier est absent, illisible ou ne
+        correspond pas au modèle / aux dimensions demandés
+    """
+    try:
+        with np.load(chemin) as data:
+            meta = json.loads(str(data["meta"]))
+            projection = ProjectionPCA(data["moyenne"], data["composantes"],
+                                       meta["variance_expliquee"], meta["modele"])
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    if modele is not None and projection.modele != modele:
+        return None
+    if dimension_source is not None and projection.dimension_source != dimension_source:
+        return None
+    if dimension is not None and projection.dimension != dimension:
+        return None
+    return projection
+
+
+def generer_projection(chemin_referentiel: str = "referentiel_films.json", chemin_sortie: str = CHEMIN_PROJECTION,
+                       dimension: int = DIMENSION_REDUITE) -> Dict[str, float]:
+    """Ajuste la projection sur les embeddings du référentiel et l'écrit sur disque."""
+    from nlp_engine import MODEL_NAME, MoteurRecommandation
+
+    etat = MoteurRecommandation(chemin_referentiel).etat
+    if etat is None:
+        return {}
+    projection = ajuster_pca(etat.embeddings, dimension, MODEL_NAME)
+    ecrire_projection(projection, chemin_sortie)
+    print(f"✅ Projection PCA : {projection.dimension_source} -> {projection.dimension} dimensions, "
+          f"{projection.variance_expliquee:.1%} de la variance conservée ({chemin_sortie})")
+    return {"dimension": projection.dimension, "variance_expliquee": projection.variance_expliquee}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajuste la projection PCA des embeddings du catalogue.")
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--sortie", default=CHEMIN_PROJECTION)
+    parser.add_argument("--dimension", type=int, default=DIMENSION_REDUITE)
+    args = parser.parse_args()
+    generer_projection(args.referentiel, args.sortie, args.dimension)
@@ -0,0 +1,396 @@
+"""
+Régression des classements - Classements de référence et contrôle des chemins optimisés
+
+Les profils de profils_regression.json (dont les profils "Suspense" et
+"Détente" du README) sont classés par le moteur d'avant les optimisations,
+figé dans moteur_reference.py (encodage film par film, cosinus,
+compute_final_score) ; le top-k et le ScoreBreakdown de chaque film sont
+écrits dans classements_reference.json, avec l'empreinte de l'encodeur.
+
+La référence versionnée est produite avec l'encodeur haché déterministe
+(encodeur_hachage.py) : elle se vérifie partout, sans télécharger le modèle.
+`--encodeur sbert` contrôle les mêmes chemins avec le modèle SBERT, contre
+une référence générée avec lui (voir --reference).
+
+Chaque configuration accélérée du moteur est ensuite comparée à cette
+référence :
+- recouvrement du top-k (part des films de référence retrouvés)
+- tau de Kendall sur l'ordre des films communs
+- écart maximal des scores (score sémantique et composantes du breakdown)
+et sa latence est mesurée sur les mêmes profils, à côté des écarts.
+
+Une configuration exacte (moteur courant, shards, file d'inférence, caches)
+doit reproduire la référence : mêmes films, même ordre, scores à
+TOLERANCE_SCORE près. Une configuration approchée (présélection ACP, score
+lexical, multi-vecteurs, pooling max) doit garder RECOUVREMENT_MIN et TAU_MIN
+sur chaque profil (bornes plus larges pour la recherche hybride, qui
+re-classe volontairement) ; la génération de candidats BM25 doit s'engager sur au
+moins un profil (sinon la configuration ne mesure que la recherche dense).
+
+Usage :
+    python regression_classements.py --generer     # à relancer si les profils ou le référentiel changent
+    python regression_classements.py
+    python regression_classements.py --configurations shards_2 reduction_64 --repetitions 10
+    python regression_classements.py --encodeur sbert --reference classements_sbert.json --generer
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import argparse
+import hashlib
+import json
+import statistics
+import tempfile
+import time
+
+import moteur_reference
+from artefact_catalogue import empreinte_modele
+from cache import CacheReponses, CacheSemantique
+from encodeur_hachage import NOM_ENCODEUR, EncodeurHachage
+from nlp_engine import MODEL_NAME, POIDS_FUSION_DEFAUT, MoteurRecommandation, charger_modele
+from pipeline import classer, executer_pipeline
+
+CHEMIN_PROFILS = "profils_regression.json"
+CHEMIN_REFERENCE = "classements_reference.json"
+ENCODEURS = ("hachage", "sbert")
+TOP_K = 10
+TOP_N_RECHERCHE = 20
+TOLERANCE_SCORE = 1e-4
+RECOUVREMENT_MIN = 0.7
+TAU_MIN = 0.5
+RECOUVREMENT_MIN_HYBRIDE = 0.5
+TAU_MIN_HYBRIDE = 0.2
+
+COMPOSANTES = ("semantic", "genre", "period", "language", "people_bonus", "final")
+
+
+@dataclass
+class Configuration:
+    """
+    Configuration du moteur contrôlée contre la référence.
+
+    Args:
+        options: Arguments de MoteurRecommandation
+        exacte: Doit reproduire la référence (sinon jugée sur recouvrement / tau)
+        cache: "exact" ou "semantique" : classement servi par executer_pipeline
+            depuis le cache, après une première exécution qui le remplit
+        recouvrement_min, tau_min: Seuils propres à une configuration approchée
+            (sinon ceux de `verifier`)
+    """
+    nom: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    exacte: bool = True
+    cache: Optional[str] = None
+    recouvrement_min: Optional[float] = None
+    tau_min: Optional[float] = None
+
+
+CONFIGURATIONS = [
+    Configuration("reference"),
+    Configuration("shards_2", {"shards": 2}),
+    Configuration("file_inference", {"file_inference": True}),
+    Configuration("cache_exact", cache="exact"),
+    Configuration("cache_semantique", cache="semantique"),
+    Configuration("pooling_max", {"pooling": "max"}, exacte=False),
+    Configuration("reduction_64", {"reduction": 64, "preselection": 30}, exacte=False),
+    # La recherche hybride re-classe volontairement (30 % de BM25 dans la pertinence) : un nom
+    # de réalisateur ou un mot rare de la requête remonte les films qui le contiennent
+    Configuration("lexical_fusion", {"lexical": "fusion"}, exacte=False,
+                  recouvrement_min=RECOUVREMENT_MIN_HYBRIDE, tau_min=TAU_MIN_HYBRIDE),
+    # Seuil abaissé : le référentiel de 55 films n'atteint jamais CANDIDATS_MIN
+    Configuration("lexical_candidats", {"lexical": "candidats", "candidats_lexicaux": 30, "candidats_min": 5},
+                  exacte=False, recouvrement_min=RECOUVREMENT_MIN_HYBRIDE, tau_min=TAU_MIN_HYBRIDE),
+    Configuration("multi_vecteurs", {"fusion": POIDS_FUSION_DEFAUT}, exacte=False),
+]
+
+
+# ----- Profils et référence -----
+def charger_profils(chemin: str = CHEMIN_PROFILS) -> List[Dict[str, Any]]:
+    """Profils de régression : [{'nom', 'attendus', 'reponses'}]."""
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def empreinte_referentiel(chemin: str) -> str:
+    """Empreinte du fichier référentiel (la référence n'est valable que pour ce catalogue)."""
+    with open(chemin, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _entree(recommandation: Dict[str, Any]) -> Dict[str, Any]:
+    """Film classé réduit à son identifiant et à ses scores."""
+    breakdown = recommandation['breakdown']
+    return {
+        "FilmID": recommandation['film']['FilmID'],
+        "Film": recommandation['film']['Film'],
+        "score_semantique": round(float(recommandation['score_semantique']), 6),
+        "breakdown": {composante: round(float(getattr(breakdown, composante)), 6) for composante in COMPOSANTES},
+    }
+
+
+def charger_encodeur(nom: str = "hachage"):
+    """(modèle, nom du modèle) : encodeur haché déterministe ou modèle SBERT."""
+    if nom == "sbert":
+        return charger_modele(), MODEL_NAME
+    return EncodeurHachage(), NOM_ENCODEUR
+
+
+def classer_reference(model, profils: List[Dict[str, Any]], referentiel: str, top_k: int = TOP_K,
+                      top_n_recherche: int = TOP_N_RECHERCHE) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Classe les profils avec le moteur de référence (moteur_reference.py).
+
+    Returns:
+        classements {nom du profil: [entrées]}, au format de `_entree`
+    """
+    classements = moteur_reference.classer_profils(model, profils, moteur_reference.charger_films(referentiel),
+                                                   top_k, top_n_recherche)
+    return {nom: [_entree(rec) for rec in classes] for nom, classes in classements.items()}
+
+
+def ecrire_reference(chemin: str, classements: Dict[str, List[Dict[str, Any]]], referentiel: str,
+                     model, nom_modele: str = NOM_ENCODEUR, top_k: int = TOP_K,
+                     top_n_recherche: int = TOP_N_RECHERCHE):
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump({
+            "modele": nom_modele,
+            "empreinte_modele": empreinte_modele(model, nom_modele),
+            "referentiel": empreinte_referentiel(referentiel),
+            "top_k": top_k,
+            "top_n_recherche": top_n_recherche,
+            "classements": classements,
+        }, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+
+
+def lire_reference(chemin: str, referentiel: str, model=None, nom_modele: str = NOM_ENCODEUR) -> Dict[str, Any]:
+    """
+    Relit la référence.
+
+    Raises:
+        ValueError: Référence produite par un autre modèle (nom ou poids, si
+            `model` est fourni) ou pour un autre référentiel
+    """
+    with open(chemin, "r", encoding="utf-8") as f:
+        reference = json.load(f)
+    if reference.get("modele") != nom_modele:
+        raise ValueError(f"référence produite par {reference.get('modele')}, modèle courant {nom_modele}")
+    if model is not None and reference.get("empreinte_modele") != empreinte_modele(model, nom_modele):
+        raise ValueError("référence produite avec d'autres poids du modèle")
+    if reference.get("referentiel") != empreinte_referentiel(referentiel):
+        raise ValueError(f"{referentiel} a changé depuis la génération de la référence")
+    return reference
+
+
+# ----- Métriques -----
+def kendall_tau(reference: List[str], obtenus: List[str]) -> float:
+    """
+    Tau de Kendall sur les films présents dans les deux classements.
+
+    Returns:
+        float dans [-1, 1] (1.0 : même ordre, ou moins de deux films communs)
+    """
+    positions = {film_id: i for i, film_id in enumerate(obtenus)}
+    communs = [film_id for film_id in reference if film_id in positions]
+    concordants = discordants = 0
+    for i, premier in enumerate(communs):
+        for second in communs[i + 1:]:
+            if positions[premier] < positions[second]:
+                concordants += 1
+            else:
+                discordants += 1
+    paires = concordants + discordants
+    return (concordants - discordants) / paires if paires else 1.0
+
+
+def comparer(reference: List[Dict[str, Any]], obtenus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compare un classement au classement de référence du même profil.
+
+    Returns:
+        dict: recouvrement, tau, ecart_score (max sur les films communs et les
+            composantes), ordre_identique
+    """
+    ids_reference = [entree["FilmID"] for entree in reference]
+    ids_obtenus = [entree["FilmID"] for entree in obtenus]
+    par_id = {entree["FilmID"]: entree for entree in obtenus}
+    ecart = 0.0
+    for entree in reference:
+        autre = par_id.get(entree["FilmID"])
+        if autre is None:
+            continue
+        ecart = max(ecart, abs(entree["score_semantique"] - autre["score_semantique"]))
+        for composante in COMPOSANTES:
+            ecart = max(ecart, abs(entree["breakdown"][composante] - autre["breakdown"][composante]))
+    communs = len(set(ids_reference) & set(ids_obtenus))
+    return {
+        "recouvrement": communs / len(ids_reference) if ids_reference else float(not ids_obtenus),
+        "tau": kendall_tau(ids_reference, ids_obtenus),
+        "ecart_score": ecart,
+        "ordre_identique": ids_reference == ids_obtenus,
+    }
+
+
+# ----- Exécution d'une configuration -----
+def executer_configuration(configuration: Configuration, profils: List[Dict[str, Any]], referentiel: str,
+                           model, top_k: int = TOP_K, top_n_recherche: int = TOP_N_RECHERCHE,
+                           repetitions: int = 3):
+    """
+    Classe tous les profils avec une configuration du moteur.
+
+    Le modèle est partagé entre les configurations ; le premier
+    classement de chaque profil (chargement, remplissage du cache) n'est pas
+    chronométré.
+
+    Returns:
+        (classements {nom du profil: [entrées]}, durées en ms de chaque classement chronométré,
+         nombre de profils où la génération de candidats BM25 s'est engagée, ou None hors mode "candidats")
+    """
+    with tempfile.TemporaryDirectory() as dossier:
+        moteur = MoteurRecommandation(referentiel, model=model,
+                                      chemin_projection=f"{dossier}/projection_pca.npz",
+                                      **configuration.options)
+        cache = CacheReponses() if configuration.cache == "exact" else None
+        cache_semantique = CacheSemantique() if configuration.cache == "semantique" else None
+
+        def classement(reponses):
+            if configuration.cache is None:
+                recommandations = classer(reponses, moteur.rechercher(reponses, top_n=top_n_recherche))[:top_k]
+            else:
+                resultat = executer_pipeline(reponses, moteur=moteur, cache=cache, cache_semantique=cache_semantique,
+                                             top_n_recherche=top_n_recherche, top_n=top_k,
+                                             differer_explications=True)
+                if resultat.memoriser is not None:
+                    resultat.memoriser()
+                recommandations = resultat.recommandations
+            return [_entree(rec) for rec in recommandations]
+
+        classements, durees = {}, []
+        engages = 0 if moteur.lexical == "candidats" else None
+        try:
+            for profil in profils:
+                classements[profil["nom"]] = classement(profil["reponses"])
+                if engages is not None:
+                    engages += moteur.classement(profil["reponses"]).source == "candidats"
+                for _ in range(repetitions):
+                    debut = time.perf_counter()
+                    classements[profil["nom"]] = classement(profil["reponses"])
+                    durees.append((time.perf_counter() - debut) * 1000)
+        finally:
+            if moteur.shards and not isinstance(moteur.shards, int):
+                moteur.shards.fermer()
+            if moteur.metriques_inference() is not None:
+                moteur.model.arreter()
+    return classements, durees, engages
+
+
+def verifier(reference: Dict[str, Any], profils: List[Dict[str, Any]], configurations: List[Configuration],
+             referentiel: str, model, repetitions: int = 3, tolerance: float = TOLERANCE_SCORE,
+             recouvrement_min: float = RECOUVREMENT_MIN, tau_min: float = TAU_MIN) -> List[Dict[str, Any]]:
+    """
+    Compare chaque configuration à la référence.
+
+    Returns:
+        Une entrée par configuration : métriques par profil, pires valeurs,
+        latence médiane (ms) et verdict
+    """
+    rapports = []
+    for configuration in configurations:
+        classements, durees, engages = executer_configuration(
+            configuration, profils, referentiel, model, reference["top_k"], reference["top_n_recherche"],
+            repetitions)
+        par_profil = {
+            nom: comparer(attendu, classements.get(nom, []))
+            for nom, attendu in reference["classements"].items()
+        }
+        if configuration.exacte:
+            echecs = [nom for nom, m in par_profil.items()
+                      if not m["ordre_identique"] or m["ecart_score"] > tolerance]
+        else:
+            seuil_recouvrement = recouvrement_min if configuration.recouvrement_min is None \
+                else configuration.recouvrement_min
+            seuil_tau = tau_min if configuration.tau_min is None else configuration.tau_min
+            echecs = [nom for nom, m in par_profil.items()
+                      if m["recouvrement"] < seuil_recouvrement or m["tau"] < seuil_tau]
+        if engages == 0:
+            echecs.append("candidats BM25 jamais engagés")
+        rapports.append({
+            "configuration": configuration.nom,
+            "exacte": configuration.exacte,
+            "profils": par_profil,
+            "recouvrement_min": min(m["recouvrement"] for m in par_profil.values()),
+            "tau_min": min(m["tau"] for m in par_profil.values()),
+            "ecart_max": max(m["ecart_score"] for m in par_profil.values()),
+            "latence_ms": statistics.median(durees) if durees else 0.0,
+            "echecs": echecs,
+        })
+    return rapports
+
+
+def films_attendus_absents(profils: List[Dict[str, Any]], classements: Dict[str, List[Dict[str, Any]]]):
+    """Films attendus (exemples du README) absents du top-k : {profil: [titres]}."""
+    absents = {}
+    for profil in profils:
+        titres = {entree["Film"] for entree in classements.get(profil["nom"], [])}
+        manquants = [titre for titre in profil.get("attendus", []) if titre not in titres]
+        if manquants:
+            absents[profil["nom"]] = manquants
+    return absents
+
+
+def afficher_rapport(rapports: List[Dict[str, Any]]):
+    base = next((r["latence_ms"] for r in rapports if r["configuration"] == "reference"), None)
+    print("\n" + "=" * 92)
+    print("Classements comparés à la référence (pires valeurs sur les profils)")
+    print("=" * 92)
+    print(f"{'configuration':20s} {'type':>9} {'recouvr.':>9} {'tau':>6} {'Δscore':>9} "
+          f"{'ms/requête':>11} {'gain':>7}  verdict")
+    for r in rapports:
+        gain = f"x{base / r['latence_ms']:.2f}" if base and r["latence_ms"] else "-"
+        verdict = "✅" if not r["echecs"] else "❌ " + ", ".join(r["echecs"])
+        print(f"{r['configuration']:20s} {'exacte' if r['exacte'] else 'approchée':>9} "
+              f"{r['recouvrement_min']:9.0%} {r['tau_min']:6.2f} {r['ecart_max']:9.2e} "
+              f"{r['latence_ms']:11.2f} {gain:>7}  {verdict}")
+
+
+if __name__ == "__main__":
+    noms = [configuration.nom for configuration in CONFIGURATIONS]
+    parser = argparse.ArgumentParser(description="Classements de référence et contrôle des configurations du moteur.")
+    parser.add_argument("--generer", action="store_true", help="Écrit la référence avec moteur_reference.py")
+    parser.add_argument("--encodeur", choices=ENCODEURS, default="hachage",
+                        help="Encodeur haché déterministe (référence versionnée) ou modèle SBERT")
+    parser.add_argument("--profils", default=CHEMIN_PROFILS)
+    parser.add_argument("--reference", default=CHEMIN_REFERENCE)
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--configurations", nargs="+", choices=noms, default=noms)
+    parser.add_argument("--repetitions", type=int, default=3, help="Classements chronométrés par profil")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Taille du top figé (--generer)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_SCORE)
+    parser.add_argument("--recouvrement-min", type=float, default=RECOUVREMENT_MIN)
+    parser.add_argument("--tau-min", type=float, default=TAU_MIN)
+    args = parser.parse_args()
+
+    profils = charger_profils(args.profils)
+    model, nom_modele = charger_encodeur(args.encodeur)
+
+    if args.generer:
+        classements = classer_reference(model, profils, args.referentiel, top_k=args.top_k)
+        ecrire_reference(args.reference, classements, args.referentiel, model, nom_modele, top_k=args.top_k)
+        print(f"✅ Référence écrite : {args.reference} ({len(classements)} profils, top {args.top_k}, "
+              f"encodeur {nom_modele})")
+        for nom, manquants in films_attendus_absents(profils, classements).items():
+            print(f"⚠️ {nom} : {', '.join(manquants)} hors du top {args.top_k}")
+        raise SystemExit(0)
+
+    try:
+        reference = lire_reference(args.reference, args.referentiel, model, nom_modele)
+    except (OSError, ValueError) as e:
+        print(f"❌ Référence inutilisable ({e}) : lancez python regression_classements.py "
+              f"--encodeur {args.encodeur} --reference {args.reference} --generer")
+        raise SystemExit(1)
+    configurations = [configuration for configuration in CONFIGURATIONS if configuration.nom in args.configurations]
+    rapports = verifier(reference, profils, configurations, args.referentiel, model, args.repetitions,
+                        args.tolerance, args.recouvrement_min, args.tau_min)
+    afficher_rapport(rapports)
+    raise SystemExit(1 if any(r["echecs"] for r in rapports) else 0)
@@ -0,0 +1,163 @@
+"""
+Rejeu de requêtes - Test de charge sur un trafic capturé
+
+Rejoue un journal de requêtes (voir journal_requetes.py) contre le moteur.
+Les requêtes arrivent à un débit fixé, en boucle ouverte comme des
+utilisateurs réels : une requête lente ne retarde pas l'arrivée des
+suivantes. Un pool de `concurrence` threads les exécute.
+
+Rapport :
+- latences p50 / p90 / p99 (service seul, et depuis l'arrivée prévue,
+  attente dans le pool comprise)
+- débit atteint
+- taux de succès des caches
+- durée moyenne de chaque étape du pipeline
+
+Usage :
+    python rejeu_requetes.py logs/requetes.jsonl --concurrence 8 --debit 20
+    python rejeu_requetes.py logs/requetes.jsonl --lexical fusion --reduction 64 --file-inference
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, List
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from cache import CacheReponses, CacheSemantique
+from filtres import Exclusions
+from journal_requetes import JournalMemoire, lire_journal
+from pipeline import TOP_N_AFFICHES, TOP_N_RECHERCHE, executer_pipeline
+
+
+def rejouer(entrees: List[Dict[str, Any]], moteur, concurrence: int = 4, debit: float = 0.0,
+            caches: bool = True, explications: bool = False) -> Dict[str, Any]:
+    """
+    Rejoue les entrées d'un journal.
+
+    Args:
+        debit: Requêtes lancées par seconde (0 : toutes dès que possible)
+        caches: Caches exact et sémantique actifs (réglages de l'application)
+        explications: Génère les explications (appels Gemini si configuré)
+
+    Returns:
+        dict: Latences (ms), débit, erreurs, statistiques des caches et durées par étape
+    """
+    cache = CacheReponses(taille_max=256, ttl=3600) if caches else None
+    cache_semantique = CacheSemantique(capacite=512, seuil=0.92) if caches else None
+    journal = JournalMemoire()
+    service, arrivee = [], []
+    erreurs = [0]
+    verrou = threading.Lock()
+
+    def executer(entree, prevu):
+        debut = time.perf_counter()
+        try:
+            genres = entree.get("genres_exclus") or ()
+            resultat = executer_pipeline(
+                entree["reponses"], moteur=moteur, cache=cache, cache_semantique=cache_semantique,
+                top_n_recherche=entree.get("top_n_recherche", TOP_N_RECHERCHE),
+                top_n=entree.get("top_n", TOP_N_AFFICHES),
+                differer_explications=not explications,
+                exclusions=Exclusions(genres=genres) if genres else None,
+                diversite=entree.get("diversite"),
+                journal=journal,
+            )
+            if resultat.memoriser is not None:
+                resultat.memoriser()
+        except Exception as e:
+            with verrou:
+                erreurs[0] += 1
+            print(f"❌ Requête rejouée en échec : {e}")
+            return
+        fin = time.perf_counter()
+        with verrou:
+            service.append((fin - debut) * 1000)
+            arrivee.append((fin - prevu) * 1000)
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as pool:
+        for i, entree in enumerate(entrees):
+            prevu = debut + i / debit if debit else time.perf_counter()
+            attente = prevu - time.perf_counter()
+            if attente > 0:
+                time.sleep(attente)
+            pool.submit(executer, entree, prevu)
+    duree = time.perf_counter() - debut
+
+    etapes: Dict[str, List[float]] = {}
+    sources: Dict[str, int] = {}
+    for entree in journal.entrees:
+        sources[entree["source"]] = sources.get(entree["source"], 0) + 1
+        for nom, ms in entree["durees_ms"].items():
+            etapes.setdefault(nom, []).append(ms)
+
+    def centiles(valeurs):
+        if not valeurs:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+        p50, p90, p99 = np.percentile(valeurs, [50, 90, 99])
+        return {"p50": float(p50), "p90": float(p90), "p99": float(p99)}
+
+    return {
+        "requetes": len(entrees),
+        "erreurs": erreurs[0],
+        "duree_s": duree,
+        "debit": len(service) / duree if duree else 0.0,
+        "service_ms": centiles(service),
+        "arrivee_ms": centiles(arrivee),
+        "sources": sources,
+        "etapes_ms": {nom: float(np.mean(valeurs)) for nom, valeurs in etapes.items()},
+        "cache": cache.statistiques() if cache is not None else None,
+        "cache_semantique": cache_semantique.statistiques() if cache_semantique is not None else None,
+    }
+
+
+def afficher_rapport(rapport: Dict[str, Any]):
+    print("\n" + "=" * 60)
+    print(f"Rejeu : {rapport['requetes']} requêtes en {rapport['duree_s']:.1f} s "
+          f"({rapport['debit']:.1f} req/s, {rapport['erreurs']} erreurs)")
+    print("=" * 60)
+    for cle, libelle in (("service_ms", "Service"), ("arrivee_ms", "Depuis l'arrivée")):
+        c = rapport[cle]
+        print(f"{libelle:17s}: p50 {c['p50']:8.1f} ms   p90 {c['p90']:8.1f} ms   p99 {c['p99']:8.1f} ms")
+    print("Sources          : " + ", ".join(f"{s} {n}" for s, n in sorted(rapport["sources"].items())))
+    if rapport["cache"]:
+        print(f"Cache exact      : {rapport['cache']['taux_succes']:.0%} de succès")
+    if rapport["cache_semantique"]:
+        print(f"Cache sémantique : {rapport['cache_semantique']['taux_succes']:.0%} de succès "
+              f"({rapport['cache_semantique']['faux_succes']} faux succès vérifiés)")
+    print("Étapes (moyenne) : " + ", ".join(f"{nom} {ms:.1f} ms" for nom, ms in rapport["etapes_ms"].items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejoue un journal de requêtes contre le moteur.")
+    parser.add_argument("journal", nargs="?", default="logs/requetes.jsonl")
+    parser.add_argument("--avec-tournes", action="store_true", help="Inclut les fichiers tournés (.1, .2, ...)")
+    parser.add_argument("--limite", type=int, default=None, help="Nombre maximal de requêtes rejouées")
+    parser.add_argument("--repetitions", type=int, default=1, help="Rejoue le journal plusieurs fois")
+    parser.add_argument("--concurrence", type=int, default=4)
+    parser.add_argument("--debit", type=float, default=0.0, help="Requêtes/s (0 : au plus vite)")
+    parser.add_argument("--sans-cache", action="store_true")
+    parser.add_argument("--explications", action="store_true", help="Génère les explications (Gemini)")
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--lexical", choices=("fusion", "candidats"), default=None)
+    parser.add_argument("--reduction", type=int, default=None)
+    parser.add_argument("--file-inference", action="store_true")
+    args = parser.parse_args()
+
+    from nlp_engine import MoteurRecommandation
+
+    entrees = list(islice(lire_journal(args.journal, args.avec_tournes), args.limite))
+    if not entrees:
+        print(f"❌ Aucune requête dans {args.journal}")
+        raise SystemExit(1)
+    moteur = MoteurRecommandation(args.referentiel, lexical=args.lexical, reduction=args.reduction,
+                                  file_inference=args.file_inference)
+    moteur.etat   # chargement hors mesure
+    rapport = rejouer(entrees * args.repetitions, moteur, args.concurrence, args.debit,
+                      caches=not args.sans_cache, explications=args.explications)
+    afficher_rapport(rapport)
@@ -8,13 +8,16 @@ Objectif:
 - Ajouter (si dispo dans le référentiel) filtres période/langue via clés optionnelles:
     - film["Annee"] ou film["Year"]
     - film["Langue"] ou film["Language"]
+- Fusionner (recherche hybride) le score lexical BM25 à la similarité sémantique
 """
 
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import re
 
+import numpy as np
+
 
 def clamp(x: float, lo: float = 0.0, hi: float = 1.0) -> float:
     return max(lo, min(hi, x))
@@ -159,6 +162,16 @@ def people_bonus_score(user_realisateurs: str, user_acteurs: str, film: Dict[str
     return clamp(bonus, 0.0, 0.35)
 
 
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "semantic": 0.62,
+    "genre": 0.23,
+    "period": 0.07,
+    "language": 0.06,
+    "people": 0.02,
+    "lexical": 0.30,
+}
+
+
 @dataclass
 class ScoreBreakdown:
     semantic: float
@@ -167,13 +180,15 @@ class ScoreBreakdown:
     language: float
     people_bonus: float
     final: float
+    lexical: Optional[float] = None
 
 
 def compute_final_score(
     cosine_similarity_raw: float,
     film: Dict[str, Any],
     user_answers: Dict[str, Any],
-    weights: Dict[str, float] | None = None
+    weights: Dict[str, float] | None = None,
+    lexical_score: float | None = None
 ) -> ScoreBreakdown:
     """
     Combine tout en un score final [0,1].
@@ -184,18 +199,23 @@ def compute_final_score(
       - period:   0.07
       - language: 0.06
       - people:   0.02  (bonus ajouté séparément)
+      - lexical:  0.30  (part du score BM25 dans la pertinence, si lexical_score est fourni)
 
     NB: people_bonus est un petit "add-on" (jusqu'à +0.35 max, mais en pratique souvent < 0.15).
+
+    lexical_score (recherche hybride, dans [0, 1]) : la pertinence pondérée par
+    "semantic" devient (1 - lexical) * sémantique + lexical * BM25. Sans score
+    lexical, le calcul est inchangé.
     """
-    w = weights or {
-        "semantic": 0.62,
-        "genre": 0.23,
-        "period": 0.07,
-        "language": 0.06,
-        "people": 0.02,
-    }
+    w = weights or DEFAULT_WEIGHTS
 
     sem = normalize_cosine(float(cosine_similarity_raw))
+    relevance = sem
+    lex = None
+    if lexical_score is not None:
+        lex = clamp(float(lexical_score))
+        part = w.get("lexical", DEFAULT_WEIGHTS["lexical"])
+        relevance = (1.0 - part) * sem + part * lex
     prefs = user_answers.get("preferences", {}) or {}
     gen = genre_preference_score(str(film.get("Categorie", "")), prefs)
 
@@ -208,7 +228,7 @@ def compute_final_score(
         film
     )
 
-    base = (w["semantic"] * sem) + (w["genre"] * gen) + (w["period"] * per) + (w["language"] * lan)
+    base = (w["semantic"] * relevance) + (w["genre"] * gen) + (w["period"] * per) + (w["language"] * lan)
     final = clamp(base + pb)
 
     return ScoreBreakdown(
@@ -217,5 +237,49 @@ def compute_final_score(
         period=per,
         language=lan,
         people_bonus=pb,
-        final=final
+        final=final,
+        lexical=lex
     )
+
+
+DEFAULT_MMR_LAMBDA = 0.7
+
+
+def mmr_rerank(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    top_n: int,
+    lambda_: float = DEFAULT_MMR_LAMBDA
+) -> List[int]:
+    """
+    Maximal Marginal Relevance : sélectionne top_n candidats en arbitrant entre
+    pertinence (score_final) et redondance avec les films déjà retenus.
+
+        mmr(i) = lambda * relevance[i] - (1 - lambda) * max_{j retenu} cos(i, j)
+
+    La similarité maximale de chaque candidat aux films retenus est mise à jour
+    par un seul produit matrice-vecteur à chaque sélection (O(top_n * n * d)).
+
+    Args:
+        relevance: (n,) scores des candidats (ex. score_final)
+        embeddings: (n, d) embeddings normalisés des candidats
+        lambda_: 1.0 = classement par pertinence seule, 0.0 = diversité seule
+
+    Returns:
+        Indices des candidats retenus, dans l'ordre de sélection
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    top_n = min(top_n, n)
+    max_sim = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+    for _ in range(top_n):
+        mmr = lambda_ * relevance - (1.0 - lambda_) * max_sim
+        mmr[~available] = -np.inf
+        j = int(np.argmax(mmr))
+        selected.append(j)
+        available[j] = False
+        sim = embeddings @ embeddings[j]
+        max_sim = sim if len(selected) == 1 else np.maximum(max_sim, sim)
+    return selected
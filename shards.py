@@ -0,0 +1,295 @@
+"""
+Shards - Recherche scatter-gather sur plusieurs processus (ou machines)
+
+La matrice des films est découpée en tranches de lignes. Chaque tranche est
+servie par un processus worker qui calcule, pour une requête, son top-k local.
+Le coordinateur diffuse la requête à tous les shards puis fusionne les
+top-k locaux en top-k global : mêmes films que le calcul non shardé, scores
+à l'arrondi float32 près (le produit matrice-vecteur BLAS n'arrondit pas
+exactement de la même façon selon le nombre de lignes de la tranche).
+
+Protocole : multiprocessing.connection (socket TCP + authkey), messages
+    ('charger', tranche (m, d) float32, debut, version) -> ('ok', version)
+    ('topk', requete (d,), k, masque (m,) bool ou None) -> ('topk', indices globaux, scores)
+    ('stop',)
+
+Les messages sont des pickles : quiconque connaît l'authkey et atteint le
+port peut exécuter du code dans le worker. Il n'y a donc pas de clé par
+défaut : les workers locaux reçoivent une clé aléatoire, les workers
+distants une clé secrète passée par --authkey ou la variable SHARDS_AUTHKEY,
+et ne doivent écouter que sur une interface privée. Un shard distant se
+lance avec :
+    SHARDS_AUTHKEY=<clé secrète> python shards.py --hote <ip privée> --port 6001
+
+Un shard qui ne répond pas dans le délai (ou dont la connexion est coupée)
+met le coordinateur hors service : `top_k` retourne None et le moteur
+calcule le top-k sur sa matrice locale, jusqu'à la publication suivante
+qui tente de rétablir les connexions.
+"""
+
+from __future__ import annotations
+from multiprocessing.connection import Listener, Client
+from typing import List, Optional, Tuple
+import argparse
+import ipaddress
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+VARIABLE_AUTHKEY = "SHARDS_AUTHKEY"
+TIMEOUT_REQUETE = 2.0       # délai de réponse d'un shard à un top-k (s)
+TIMEOUT_CHARGEMENT = 60.0   # délai de chargement d'une tranche (s)
+
+# Limite les threads BLAS dans chaque worker : le parallélisme vient des shards
+_ENV_MONO_THREAD = {
+    "OMP_NUM_THREADS": "1",
+    "OPENBLAS_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+}
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des k meilleurs scores, triés par score décroissant puis indice
+    croissant (départage déterministe, donc fusionnable entre shards).
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        partition = np.argpartition(-scores, k - 1)[:k]
+        seuil = scores[partition].min()
+        candidats = np.flatnonzero(scores >= seuil)
+    else:
+        candidats = np.arange(n)
+    ordre = np.lexsort((candidats, -scores[candidats]))
+    return candidats[ordre[:k]]
+
+
+def fusionner_top_k(resultats: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fusionne des top-k locaux (indices globaux, scores) en top-k global."""
+    if not resultats:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    indices = np.concatenate([r[0] for r in resultats])
+    scores = np.concatenate([r[1] for r in resultats])
+    ordre = np.lexsort((indices, -scores))[:k]
+    return indices[ordre], scores[ordre]
+
+
+# ========== WORKER ==========
+def authkey_environnement() -> Optional[bytes]:
+    """Clé des shards lue dans SHARDS_AUTHKEY, ou None."""
+    cle = os.getenv(VARIABLE_AUTHKEY)
+    return cle.encode() if cle else None
+
+
+def est_local(hote: str) -> bool:
+    """Adresse de bouclage (localhost, 127.0.0.0/8, ::1)."""
+    if hote == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(hote).is_loopback
+    except ValueError:
+        return False
+
+
+def servir_shard(adresse, authkey: bytes, pret=None):
+    """
+    Boucle d'un worker : attend un coordinateur et répond à ses requêtes.
+    """
+    if not authkey:
+        raise ValueError("authkey requise pour servir un shard")
+    tranche = np.zeros((0, 0), dtype=np.float32)
+    debut = 0
+    with Listener(adresse, authkey=authkey) as listener:
+        if pret is not None:
+            pret.send(listener.address)
+            pret.close()
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                continue   # authentification refusée ou connexion interrompue
+            with conn:
+                while True:
+                    try:
+                        message = conn.recv()
+                        action = message[0]
+                        if action == "topk":
+                            _, requete, k, masque = message
+                            if masque is None:
+                                lignes, scores = None, tranche @ requete
+                            else:
+                                lignes = np.flatnonzero(masque)
+                                scores = tranche[lignes] @ requete
+                            locaux = top_k_indices(scores, k)
+                            indices = locaux if lignes is None else lignes[locaux]
+                            conn.send(("topk", indices + debut, scores[locaux]))
+                        elif action == "charger":
+                            _, tranche, debut, version = message
+                            conn.send(("ok", version))
+                        elif action == "stop":
+                            conn.send(("ok", None))
+                            return
+                    except (EOFError, OSError):
+                        break   # coordinateur parti (ou connexion abandonnée après un timeout)
+
+
+# ========== COORDINATEUR ==========
+class CoordinateurShards:
+    """
+    Diffuse les requêtes aux shards et fusionne leurs top-k.
+
+    Les connexions ne sont pas partagées entre threads : les requêtes
+    concurrentes sont sérialisées par un verrou (chaque requête occupe
+    néanmoins tous les shards en parallèle).
+
+    Args:
+        authkey: Clé partagée avec les workers (par défaut SHARDS_AUTHKEY)
+        timeout: Délai de réponse d'un shard à un top-k (s)
+    """
+
+    def __init__(self, adresses, authkey: Optional[bytes] = None, processus=None,
+                 timeout: float = TIMEOUT_REQUETE):
+        authkey = authkey or authkey_environnement()
+        if not authkey:
+            raise ValueError(f"authkey requise (argument ou variable {VARIABLE_AUTHKEY})")
+        self.adresses = list(adresses)
+        self.timeout = timeout
+        self._authkey = authkey
+        self._connexions = [Client(a, authkey=authkey) for a in self.adresses]
+        self._processus = processus or []
+        self._bornes: List[Tuple[int, int]] = []
+        self._verrou = threading.Lock()
+        self.version = None
+        self.panne: Optional[str] = None   # raison de la mise hors service
+
+    @classmethod
+    def lancer_locaux(cls, n_shards: int, authkey: Optional[bytes] = None) -> "CoordinateurShards":
+        """Démarre n_shards workers locaux (ports choisis par le système, clé aléatoire par défaut)."""
+        authkey = authkey or os.urandom(32)
+        contexte = multiprocessing.get_context("spawn")
+        adresses, processus = [], []
+        env_precedent = {k: os.environ.get(k) for k in _ENV_MONO_THREAD}
+        os.environ.update(_ENV_MONO_THREAD)
+        try:
+            for _ in range(n_shards):
+                recepteur, emetteur = contexte.Pipe(duplex=False)
+                p = contexte.Process(target=servir_shard, args=(("127.0.0.1", 0), authkey, emetteur), daemon=True)
+                p.start()
+                emetteur.close()
+                adresses.append(recepteur.recv())
+                processus.append(p)
+        finally:
+            for k, v in env_precedent.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+        return cls(adresses, authkey, processus)
+
+    def __len__(self):
+        return len(self._connexions)
+
+    def publier(self, matrice: np.ndarray, version=None):
+        """
+        Répartit les lignes de `matrice` entre les shards (tranches contiguës).
+
+        Après une panne, les connexions sont rétablies d'abord ; si un shard
+        reste injoignable, le coordinateur reste hors service (voir `top_k`).
+        """
+        n = matrice.shape[0]
+        coupes = np.linspace(0, n, len(self.adresses) + 1).astype(int)
+        with self._verrou:
+            self.version = None
+            try:
+                if self.panne is not None:
+                    self._reconnecter()
+                self._bornes = list(zip(coupes[:-1], coupes[1:]))
+                for conn, (debut, fin) in zip(self._connexions, self._bornes):
+                    conn.send(("charger", np.ascontiguousarray(matrice[debut:fin]), int(debut), version))
+                for conn in self._connexions:
+                    _recevoir(conn, TIMEOUT_CHARGEMENT)
+            except (EOFError, OSError) as e:
+                self._mettre_hors_service(f"chargement : {e!r}")
+                return
+            self.version = version
+
+    def top_k(self, requete: np.ndarray, k: int, masque: Optional[np.ndarray] = None, version=None):
+        """
+        Args:
+            masque: Masque (n,) bool des lignes admissibles (filtres stricts)
+            version: Si fournie, la requête n'est servie que si les shards
+                portent cette version de la matrice
+
+        Returns:
+            (indices globaux, scores) du top-k, ordre décroissant, ou None si
+            la version des shards ne correspond pas ou si un shard est en
+            panne (pas de réponse dans `timeout`, connexion coupée) : le
+            moteur calcule alors le top-k localement
+        """
+        requete = np.ascontiguousarray(requete, dtype=np.float32)
+        with self._verrou:
+            if self.panne is not None or (version is not None and version != self.version):
+                return None
+            try:
+                for conn, (debut, fin) in zip(self._connexions, self._bornes):
+                    conn.send(("topk", requete, k, None if masque is None else masque[debut:fin]))
+                resultats = [_recevoir(conn, self.timeout)[1:] for conn in self._connexions]
+            except (EOFError, OSError) as e:
+                self._mettre_hors_service(f"top-k : {e!r}")
+                return None
+        return fusionner_top_k(resultats, k)
+
+    def _mettre_hors_service(self, raison: str):
+        """Ferme les connexions (une réponse en retard désynchroniserait le protocole)."""
+        self.panne = raison
+        self.version = None
+        for conn in self._connexions:
+            conn.close()
+        print(f"⚠️ Shards hors service ({raison}) : recherche locale jusqu'à la prochaine publication")
+
+    def _reconnecter(self):
+        self._connexions = [Client(a, authkey=self._authkey) for a in self.adresses]
+        self.panne = None
+
+    def fermer(self):
+        with self._verrou:
+            for conn in self._connexions:
+                try:
+                    conn.send(("stop",))
+                    conn.recv()
+                except (EOFError, OSError):
+                    pass
+                conn.close()
+            self._connexions = []
+        for p in self._processus:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+
+def _recevoir(conn, timeout: float):
+    """conn.recv() borné par `timeout` (TimeoutError, sous-classe d'OSError)."""
+    if not conn.poll(timeout):
+        raise TimeoutError(f"pas de réponse en {timeout:.1f} s")
+    return conn.recv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lance un shard de recherche (worker).")
+    parser.add_argument("--hote", default="127.0.0.1",
+                        help="Interface d'écoute (privée : les messages sont des pickles)")
+    parser.add_argument("--port", type=int, default=6001)
+    parser.add_argument("--authkey", default=None, help=f"Clé secrète (sinon variable {VARIABLE_AUTHKEY})")
+    args = parser.parse_args()
+    authkey = args.authkey.encode() if args.authkey else authkey_environnement()
+    if not authkey:
+        parser.error(f"clé requise : --authkey ou variable {VARIABLE_AUTHKEY}")
+    if not est_local(args.hote):
+        print(f"⚠️ Shard joignable depuis le réseau ({args.hote}) : n'exposez ce port qu'à un réseau de confiance")
+    print(f"Shard en écoute sur {args.hote}:{args.port}")
+    servir_shard((args.hote, args.port), authkey)
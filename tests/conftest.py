@@ -0,0 +1,54 @@
+"""
+Fixtures communes : encodeur déterministe (sans téléchargement du modèle SBERT)
+et copie du référentiel dans un dossier temporaire.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from encodeur_hachage import EncodeurHachage  # noqa: E402
+
+REFERENTIEL = os.path.join(RACINE, "referentiel_films.json")
+
+
+@pytest.fixture
+def modele():
+    """Encodeur haché : compte les textes encodés (`textes_encodes`)."""
+    return EncodeurHachage(dimension=64)
+
+
+@pytest.fixture
+def referentiel(tmp_path):
+    """Chemin d'une copie modifiable du référentiel."""
+    chemin = tmp_path / "referentiel_films.json"
+    shutil.copyfile(REFERENTIEL, chemin)
+    return str(chemin)
+
+
+@pytest.fixture
+def reponses():
+    """Profil "Suspense" du README."""
+    return {
+        "description": "Je veux un film avec beaucoup de suspense et des rebondissements inattendus",
+        "ambiance": "Sombre et mystérieux, quelque chose qui fait réfléchir",
+        "realisateurs": "Christopher Nolan",
+        "acteurs": "",
+        "preferences": {"Thriller": 5, "Romance": 2, "Comédie": 3, "Science-Fiction": 4},
+    }
+
+
+def ecrire_referentiel(chemin, donnees):
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(donnees, f, ensure_ascii=False)
+
+
+def lire_referentiel(chemin):
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
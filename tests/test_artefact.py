@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from artefact_catalogue import convertir
+from nlp_engine import POIDS_FUSION_DEFAUT, MoteurRecommandation
+
+STRICTS = {
+    "description": "Une histoire d'amour à Paris",
+    "ambiance": "Léger et romantique",
+    "preferences": {"Romance": 5, "Horreur": 1},
+    "filtres_stricts": True,
+    "genre_min": 2,
+    "langue": "Français",
+}
+
+
+def _resume(recommandations):
+    return [(rec["film"]["FilmID"], rec["score_semantique"], rec.get("score_lexical")) for rec in recommandations]
+
+
+@pytest.mark.parametrize("options", [{}, {"lexical": "fusion"}, {"fusion": POIDS_FUSION_DEFAUT}])
+def test_artefact_et_json_donnent_les_memes_resultats(modele, referentiel, tmp_path, reponses, options):
+    artefact = str(tmp_path / "catalogue.arrow")
+    convertir(referentiel, artefact, model=modele, champs=True)
+
+    depuis_json = MoteurRecommandation(referentiel, model=modele, **options)
+    modele.textes_encodes = 0
+    depuis_artefact = MoteurRecommandation(referentiel, model=modele, artefact=artefact, **options)
+    etat = depuis_artefact.etat
+    assert modele.textes_encodes <= 1   # phrase sonde de l'empreinte du modèle
+
+    assert [film["FilmID"] for film in etat.films] == [film["FilmID"] for film in depuis_json.etat.films]
+    assert etat.hashes == depuis_json.etat.hashes
+    assert np.allclose(etat.embeddings, depuis_json.etat.embeddings)
+    for profil in (reponses, STRICTS):
+        obtenus = _resume(depuis_artefact.rechercher(profil, top_n=15))
+        attendus = _resume(depuis_json.rechercher(profil, top_n=15))
+        assert obtenus and [r[0] for r in obtenus] == [r[0] for r in attendus]
+        assert np.allclose([r[1] for r in obtenus], [r[1] for r in attendus], atol=1e-6)
+        assert [r[2] for r in obtenus] == pytest.approx([r[2] for r in attendus])
@@ -0,0 +1,60 @@
+from cache import CacheReponses, CacheSemantique
+from nlp_engine import MoteurRecommandation
+from pipeline import executer_pipeline
+
+
+def _executer(reponses, moteur, **caches):
+    resultat = executer_pipeline(reponses, moteur=moteur, differer_explications=True, **caches)
+    for rec in resultat.recommandations:
+        rec["explanation"] = f"Explication de {rec['film']['Film']}"
+    if resultat.memoriser is not None:
+        resultat.memoriser()
+    return resultat
+
+
+def _ids(resultat):
+    return [rec["film"]["FilmID"] for rec in resultat.recommandations]
+
+
+def test_cache_exact_servi_a_la_resoumission(modele, referentiel, reponses):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    cache = CacheReponses()
+    premier = _executer(reponses, moteur, cache=cache)
+    modele.textes_encodes = 0
+
+    second = executer_pipeline(dict(reponses), moteur=moteur, cache=cache)
+
+    assert second.depuis_cache and not premier.depuis_cache
+    assert modele.textes_encodes == 0
+    assert _ids(second) == _ids(premier)
+    assert cache.statistiques()["succes"] == 1
+
+
+def test_cache_exact_isole_les_sessions(modele, referentiel, reponses):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    cache = CacheReponses()
+    _executer(reponses, moteur, cache=cache)
+
+    servi = executer_pipeline(reponses, moteur=moteur, cache=cache)
+    servi.recommandations[0]["explanation"] = "modifiée par une session"
+    servi.recommandations.pop()
+
+    relu = executer_pipeline(reponses, moteur=moteur, cache=cache)
+    assert relu.recommandations[0]["explanation"] != "modifiée par une session"
+    assert len(relu.recommandations) == len(servi.recommandations) + 1
+    assert relu.recommandations[0]["film"] is servi.recommandations[0]["film"]
+
+
+def test_cache_semantique_servi_pour_une_paraphrase(modele, referentiel, reponses):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    cache_semantique = CacheSemantique(taux_verification=0.0)
+    premier = _executer(reponses, moteur, cache_semantique=cache_semantique)
+
+    paraphrase = dict(reponses, description=reponses["description"].upper() + " !")
+    second = executer_pipeline(paraphrase, moteur=moteur, cache_semantique=cache_semantique)
+
+    assert second.depuis_cache
+    assert cache_semantique.statistiques()["succes"] == 1
+    assert _ids(second) == _ids(premier)
+    assert [rec["explanation"] for rec in second.recommandations] == \
+        [rec["explanation"] for rec in premier.recommandations]
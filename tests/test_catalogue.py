@@ -0,0 +1,43 @@
+import io
+import json
+
+from conftest import REFERENTIEL, lire_referentiel
+from catalogue import CatalogueFilms, _LecteurJSON, charger_catalogue
+
+
+def _parcourir(texte, **kwargs):
+    return list(_LecteurJSON(io.StringIO(texte), taille_bloc=7, **kwargs).parcourir())
+
+
+def test_lecture_en_flux_identique_a_json_load():
+    donnees = lire_referentiel(REFERENTIEL)
+    with open(REFERENTIEL, "r", encoding="utf-8") as f:
+        elements = list(_LecteurJSON(f, taille_bloc=100).parcourir())
+    assert [valeur for cle, valeur in elements if cle == "film"] == donnees["films"]
+    assert dict(elements)["blocs"] == donnees["blocs"]
+
+
+def test_film_illisible_saute():
+    film = json.dumps({"FilmID": "F01", "Description": "virgule, crochet ] et \\\" guillemet }"})
+    texte = '{"films": [%s, {"FilmID": "F02", "Film": oups}, %s, {"a": 1} x, %s], "blocs": []}' % (film, film, film)
+    elements = _parcourir(texte)
+    assert [cle for cle, _ in elements] == ["film", "erreur", "film", "erreur", "film", "blocs"]
+    assert elements[1][1].startswith("film 2 : JSON invalide")
+
+
+def test_enregistrement_trop_long_saute_sans_tout_lire():
+    film = json.dumps({"FilmID": "F01"})
+    texte = '{"films": [%s, {"Description": "%s"}, %s]}' % (film, "z" * 500, film)
+    elements = _parcourir(texte, taille_max=100)
+    assert [cle for cle, _ in elements] == ["film", "erreur", "film"]
+    assert "plus de 100 caractères" in elements[1][1]
+
+
+def test_chargement_signale_le_film_illisible(tmp_path):
+    films = lire_referentiel(REFERENTIEL)["films"]
+    chemin = tmp_path / "referentiel_films.json"
+    chemin.write_text('{"films": [%s, {"FilmID": "X" "Film"}, %s]}' % (json.dumps(films[0]), json.dumps(films[1])),
+                      encoding="utf-8")
+    catalogue = charger_catalogue(str(chemin), CatalogueFilms())
+    assert [film["FilmID"] for film in catalogue.films] == ["F01", "F02"]
+    assert len(catalogue.invalides) == 1
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from genai_module import TokenBucket, _truncate, clean_stream
+
+
+class HorlogeManuelle:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def dormir(self, duree):
+        self.t += duree
+
+
+def test_token_bucket_attend_sur_son_horloge():
+    horloge = HorlogeManuelle()
+    bucket = TokenBucket(rate=1.0, capacity=1, clock=horloge, sleep=horloge.dormir)
+    assert bucket.acquire(timeout=0.0)
+    assert not bucket.acquire(timeout=0.5)
+    assert horloge.t == 0.0
+    assert bucket.acquire(timeout=2.0)
+    assert horloge.t == 1.0
+
+
+def _decouper(texte, generateur):
+    coupes = sorted(generateur.sample(range(1, len(texte)), min(len(texte) - 1, generateur.randint(0, 12))))
+    return [texte[debut:fin] for debut, fin in zip([0] + coupes, coupes + [len(texte)])]
+
+
+@pytest.mark.parametrize("graine", range(200))
+def test_clean_stream_identique_au_nettoyage_non_streame(graine):
+    generateur = random.Random(graine)
+    mots = ["  ", "\n", "Un", "film", "haletant", " ", "\n\n", "où", "chaque", "scène", "compte.", "   "]
+    texte = " ".join(generateur.choice(mots) for _ in range(generateur.randint(0, 60)))
+    max_chars = generateur.choice([20, 50, 120, 420])
+
+    morceaux = list(clean_stream(_decouper(texte, generateur) if texte else [], max_chars))
+
+    assert "".join(morceaux) == _truncate(texte.replace("\n", " ").strip(), max_chars)
+    assert all(morceaux)
+
+
+def test_clean_stream_arrete_la_lecture_au_budget():
+    lus = []
+
+    def morceaux():
+        for i in range(100):
+            lus.append(i)
+            yield "mot " * 5
+
+    texte = "".join(clean_stream(morceaux(), max_chars=42))
+    assert texte.endswith("...") and len(texte) <= 42
+    assert len(lus) == 3
@@ -0,0 +1,57 @@
+import pytest
+
+from filtres import Exclusions
+from nlp_engine import MoteurRecommandation
+from pipeline import executer_pipeline, ouvrir_curseur, page_suivante
+
+CONFIGURATIONS = {
+    "dense": {},
+    # Peu de films contiennent un terme de la requête : la présélection BM25 est vite parcourue
+    "candidats_bm25": {"lexical": "candidats", "candidats_lexicaux": 5, "candidats_min": 1},
+    "reduction_acp": {"reduction": 8, "preselection": 12},
+}
+
+
+def _parcourir(moteur, reponses, exclusions=None, taille=5):
+    resultat = executer_pipeline(reponses, moteur=moteur, differer_explications=True, exclusions=exclusions)
+    curseur = ouvrir_curseur(reponses, resultat, moteur=moteur, exclusions=exclusions)
+    servis = [rec["film"]["FilmID"] for rec in resultat.recommandations]
+    while not curseur.epuise:
+        page = page_suivante(curseur, taille=taille)
+        assert page, "page vide avant l'épuisement du curseur"
+        servis += [rec["film"]["FilmID"] for rec in page]
+    assert page_suivante(curseur, taille=taille) == []
+    return servis
+
+
+@pytest.mark.parametrize("configuration", sorted(CONFIGURATIONS))
+def test_pagination_parcourt_tout_le_catalogue_sans_doublon(modele, referentiel, reponses, tmp_path, configuration):
+    moteur = MoteurRecommandation(referentiel, model=modele, chemin_projection=str(tmp_path / "projection.npz"),
+                                  **CONFIGURATIONS[configuration])
+    servis = _parcourir(moteur, reponses)
+    assert len(servis) == len(set(servis))
+    assert set(servis) == set(moteur.etat.index)
+
+
+@pytest.mark.parametrize("configuration", sorted(CONFIGURATIONS))
+def test_pagination_respecte_les_exclusions(modele, referentiel, reponses, tmp_path, configuration):
+    moteur = MoteurRecommandation(referentiel, model=modele, chemin_projection=str(tmp_path / "projection.npz"),
+                                  **CONFIGURATIONS[configuration])
+    exclusions = Exclusions(films={"F01", "F02"}, genres={"Romance"})
+    servis = _parcourir(moteur, reponses, exclusions, taille=7)
+    attendus = {film["FilmID"] for film in moteur.etat.films
+                if film["FilmID"] not in exclusions.films and film["Categorie"] not in exclusions.genres}
+    assert len(servis) == len(set(servis))
+    assert set(servis) == attendus
+
+
+def test_premiere_page_puis_suivantes_dans_l_ordre_du_classement(modele, referentiel, reponses):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    resultat = executer_pipeline(reponses, moteur=moteur, differer_explications=True, top_n_recherche=55, top_n=55)
+    ordre = [rec["film"]["FilmID"] for rec in resultat.recommandations]
+
+    curseur = ouvrir_curseur(reponses, executer_pipeline(reponses, moteur=moteur, differer_explications=True,
+                                                         top_n_recherche=55, top_n=5),
+                             moteur=moteur, top_n_recherche=55)
+    suite = [rec["film"]["FilmID"] for rec in page_suivante(curseur, taille=10)]
+    assert suite == ordre[5:15]
@@ -0,0 +1,42 @@
+from conftest import ecrire_referentiel, lire_referentiel
+from nlp_engine import MoteurRecommandation, texte_film
+
+
+def test_rechargement_n_encode_que_les_films_modifies(modele, referentiel):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    films = moteur.etat.films
+    assert modele.textes_encodes == len(films)
+    embedding_inchange = moteur.etat.embeddings[moteur.etat.index["F02"]].copy()
+
+    donnees = lire_referentiel(referentiel)
+    donnees["films"][0]["Description"] += " Une fin ouverte."
+    donnees["films"].append(dict(donnees["films"][1], FilmID="F99", Film="Nouveau film"))
+    del donnees["films"][2]
+    ecrire_referentiel(referentiel, donnees)
+
+    modele.textes_encodes = 0
+    bilan = moteur.recharger()
+
+    assert bilan == {"ajoutes": 1, "modifies": 1, "supprimes": 1, "inchanges": len(films) - 2}
+    assert modele.textes_encodes == 2
+    etat = moteur.etat
+    assert etat.version == 2
+    assert [film["FilmID"] for film in etat.films] == [film["FilmID"] for film in donnees["films"]]
+    assert (etat.embeddings[etat.index["F02"]] == embedding_inchange).all()
+    attendu = modele.encode(texte_film(donnees["films"][0]), normalize_embeddings=True)
+    assert abs(float(etat.embeddings[0] @ attendu) - 1.0) < 1e-5
+
+
+def test_rechargement_sans_changement(modele, referentiel):
+    moteur = MoteurRecommandation(referentiel, model=modele)
+    version = moteur.etat.version
+    modele.textes_encodes = 0
+    assert moteur.recharger()["inchanges"] == len(moteur.etat.films)
+    assert modele.textes_encodes == 0
+    assert moteur.etat.version == version
+
+
+def test_referentiel_absent(modele, tmp_path, reponses):
+    moteur = MoteurRecommandation(str(tmp_path / "absent.json"), model=modele)
+    assert moteur.etat is None
+    assert moteur.rechercher(reponses) == []
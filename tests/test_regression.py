@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from conftest import RACINE, REFERENTIEL
+from encodeur_hachage import EncodeurHachage
+from regression_classements import (CONFIGURATIONS, charger_profils, classer_reference, lire_reference,
+                                    verifier)
+
+CHEMIN_PROFILS = os.path.join(RACINE, "profils_regression.json")
+CHEMIN_REFERENCE = os.path.join(RACINE, "classements_reference.json")
+
+
+@pytest.fixture(scope="module")
+def encodeur():
+    return EncodeurHachage()
+
+
+@pytest.fixture(scope="module")
+def reference(encodeur):
+    return lire_reference(CHEMIN_REFERENCE, REFERENTIEL, encodeur)
+
+
+def test_reference_versionnee_reproduite_par_le_moteur_fige(encodeur, reference):
+    classements = classer_reference(encodeur, charger_profils(CHEMIN_PROFILS), REFERENTIEL,
+                                     reference["top_k"], reference["top_n_recherche"])
+    assert classements == reference["classements"]
+
+
+@pytest.mark.parametrize("configuration", CONFIGURATIONS, ids=lambda configuration: configuration.nom)
+def test_configuration_conforme_a_la_reference(encodeur, reference, configuration):
+    rapport, = verifier(reference, charger_profils(CHEMIN_PROFILS), [configuration], REFERENTIEL, encodeur,
+                        repetitions=0)
+    assert rapport["echecs"] == []
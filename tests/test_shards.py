@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_shards import meme_top_k
+from filtres import Exclusions
+from nlp_engine import MoteurRecommandation
+from shards import CoordinateurShards
+
+N_FILMS = 301
+DIMENSION = 16
+
+
+def _matrice():
+    generateur = np.random.default_rng(0)
+    matrice = generateur.standard_normal((N_FILMS, DIMENSION)).astype(np.float32)
+    matrice /= np.linalg.norm(matrice, axis=1, keepdims=True)
+    matrice[1::37] = matrice[0]   # ex aequo exacts, répartis sur tous les shards
+    return matrice
+
+
+@pytest.fixture(scope="module")
+def coordinateur():
+    coordinateur = CoordinateurShards.lancer_locaux(3)
+    yield coordinateur
+    coordinateur.fermer()
+
+
+@pytest.mark.parametrize("exclusions", [False, True])
+def test_shards_identiques_au_top_k_local(coordinateur, exclusions):
+    matrice = _matrice()
+    coordinateur.publier(matrice, version=1)
+    generateur = np.random.default_rng(1)
+    for i in range(20):
+        requete = matrice[0] if i % 4 == 0 else matrice[generateur.integers(N_FILMS)]
+        masque = generateur.random(N_FILMS) < 0.3 if exclusions else None
+        for k in (1, 10, N_FILMS + 5):
+            obtenu = coordinateur.top_k(requete, k, masque, version=1)
+            assert meme_top_k(obtenu, matrice, requete, k, masque)
+
+
+def test_version_differente_refusee(coordinateur):
+    matrice = _matrice()
+    coordinateur.publier(matrice, version=2)
+    assert coordinateur.top_k(matrice[0], 5, version=1) is None
+    assert coordinateur.top_k(matrice[0], 5, version=2) is not None
+
+
+def _resume(recommandations):
+    return [(rec["film"]["FilmID"], round(rec["score_semantique"], 6)) for rec in recommandations]
+
+
+def test_moteur_repli_local_quand_un_shard_tombe(modele, referentiel, reponses):
+    local = MoteurRecommandation(referentiel, model=modele)
+    coordinateur = CoordinateurShards.lancer_locaux(2)
+    try:
+        moteur = MoteurRecommandation(referentiel, model=modele, shards=coordinateur)
+        exclusions = Exclusions(films={"F01", "F05"}, genres={"Romance"})
+        for options in ({}, {"exclusions": exclusions}):
+            assert _resume(moteur.rechercher(reponses, top_n=8, **options)) == \
+                _resume(local.rechercher(reponses, top_n=8, **options))
+        assert coordinateur.panne is None
+
+        coordinateur._processus[1].kill()
+        coordinateur._processus[1].join()
+        for options in ({}, {"exclusions": exclusions}):
+            assert _resume(moteur.rechercher(reponses, top_n=8, **options)) == \
+                _resume(local.rechercher(reponses, top_n=8, **options))
+        assert coordinateur.panne is not None
+    finally:
+        coordinateur.fermer()
@@ -7,12 +7,212 @@ Utilise Plotly pour des graphiques interactifs.
 Projet IA Générative
 """
 
-import plotly.express as px
+import json
+from collections import Counter
+from functools import lru_cache
+from typing import NamedTuple
+
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+import plotly.io as pio
+
+
+# Palette de couleurs par catégorie (commune à tous les graphiques)
+COULEURS_CATEGORIES = {
+    "Thriller": "#e91e63",
+    "Romance": "#f44336",
+    "Comédie": "#ff9800",
+    "Science-Fiction": "#2196f3",
+    "Drame": "#9c27b0",
+    "Action": "#4caf50",
+    "Horreur": "#607d8b",
+    "Animation": "#00bcd4"
+}
+COULEUR_DEFAUT = "#4fc3f7"
+
+FOND_PAPIER = 'rgba(26,26,46,1)'
+FOND_GRAPHIQUE = 'rgba(22,33,62,1)'
+GRILLE_POLAIRE = 'rgba(255,255,255,0.2)'
+
+TAILLE_CACHE_FIGURES = 256  # résultats dont les graphiques sérialisés sont gardés
+
+
+class DonneesGraphiques(NamedTuple):
+    """Données des recommandations communes à tous les graphiques (ordre du classement)."""
+    films: tuple
+    scores: tuple       # scores en pourcentage
+    categories: tuple
+    comptes: tuple      # ((catégorie, nombre de films), ...) par nombre décroissant
+
+
+def preparer_donnees(recommandations: list) -> DonneesGraphiques:
+    """
+    Parcourt une seule fois les recommandations.
+    
+    Args:
+        recommandations: Liste de tuples (film_dict, score)
+    
+    Returns:
+        DonneesGraphiques (hashable : sert de clé au cache des figures)
+    """
+    films, scores, categories = [], [], []
+    for film, score in recommandations:
+        films.append(film["Film"])
+        scores.append(float(score) * 100)  # Convertir en pourcentage
+        categories.append(film["Categorie"])
+    return DonneesGraphiques(tuple(films), tuple(scores), tuple(categories),
+                             tuple(Counter(categories).most_common()))
+
+
+# ============================================================
+# Spécifications des figures (dictionnaires Plotly)
+# ============================================================
+@lru_cache(maxsize=1)
+def _template_sombre() -> dict:
+    """Template plotly_dark résolu une seule fois (au lieu d'une fois par figure)."""
+    return pio.templates["plotly_dark"].to_plotly_json()
+
+
+def _layout(titre: str, hauteur: int, **options) -> dict:
+    """Mise en page commune (thème sombre, titre, fond) complétée par `options`."""
+    layout = {
+        "template": _template_sombre(),
+        "title": {"text": titre, "font": {"size": 18}},
+        "height": hauteur,
+        "paper_bgcolor": FOND_PAPIER,
+        "font": {"color": "white"},
+    }
+    layout.update(options)
+    return layout
+
 
+def _spec_scores(donnees: DonneesGraphiques) -> dict:
+    # Inverser l'ordre pour avoir le meilleur en haut, une trace par catégorie
+    traces = {}
+    for film, score, categorie in zip(donnees.films[::-1], donnees.scores[::-1], donnees.categories[::-1]):
+        trace = traces.get(categorie)
+        if trace is None:
+            trace = traces[categorie] = {
+                "type": "bar",
+                "y": [], "x": [], "text": [],
+                "orientation": "h",
+                "name": categorie,
+                "marker": {"color": COULEURS_CATEGORIES.get(categorie, COULEUR_DEFAUT)},
+                "textposition": "auto",
+                "hovertemplate": "<b>%{y}</b><br>Score: %{x:.1f}%<extra></extra>",
+            }
+        trace["y"].append(film)
+        trace["x"].append(score)
+        trace["text"].append(f"{score:.1f}%")
+    return {
+        "data": list(traces.values()),
+        "layout": _layout(
+            "Scores de Similarité des Films Recommandés", 400,
+            xaxis={"title": {"text": "Score de similarité (%)"}},
+            yaxis={"title": {"text": ""}},
+            barmode="stack",
+            showlegend=True,
+            legend={"title": {"text": "Catégorie"}},
+            plot_bgcolor=FOND_GRAPHIQUE,
+        ),
+    }
+
+
+def _spec_radar(preferences: dict) -> dict:
+    genres = list(preferences.keys())
+    scores = list(preferences.values())
+    survol = "<b>%{theta}</b><br>Score: %{r}/5<extra></extra>"
+    axe = {"gridcolor": GRILLE_POLAIRE, "linecolor": GRILLE_POLAIRE}
+    return {
+        "data": [
+            # Aire remplie (radar fermé : le premier point est répété)
+            {
+                "type": "scatterpolar",
+                "r": scores + scores[:1],
+                "theta": genres + genres[:1],
+                "fill": "toself",
+                "fillcolor": "rgba(79, 195, 247, 0.3)",
+                "line": {"color": COULEUR_DEFAUT, "width": 2},
+                "name": "Vos préférences",
+                "hovertemplate": survol,
+            },
+            # Points
+            {
+                "type": "scatterpolar",
+                "r": scores,
+                "theta": genres,
+                "mode": "markers",
+                "marker": {"size": 10, "color": COULEUR_DEFAUT},
+                "showlegend": False,
+                "hovertemplate": survol,
+            },
+        ],
+        "layout": _layout(
+            "Vos Préférences par Genre", 450,
+            polar={
+                "radialaxis": {"visible": True, "range": [0, 5], "tickmode": "linear", "tick0": 0, "dtick": 1, **axe},
+                "angularaxis": dict(axe),
+                "bgcolor": FOND_GRAPHIQUE,
+            },
+            showlegend=True,
+        ),
+    }
+
+
+def _spec_camembert(donnees: DonneesGraphiques) -> dict:
+    categories = [categorie for categorie, _ in donnees.comptes]
+    return {
+        "data": [{
+            "type": "pie",
+            "labels": categories,
+            "values": [nombre for _, nombre in donnees.comptes],
+            "hole": 0.4,  # Donut chart
+            "marker": {"colors": [COULEURS_CATEGORIES.get(c, COULEUR_DEFAUT) for c in categories],
+                       "line": {"color": "white", "width": 2}},
+            "textinfo": "label+percent",
+            "textposition": "outside",
+            "hovertemplate": "<b>%{label}</b><br>%{value} film(s)<br>%{percent}<extra></extra>",
+        }],
+        "layout": _layout(
+            "Répartition par Catégorie", 400,
+            showlegend=True,
+            legend={"title": {"text": "Catégories"}},
+            annotations=[{"text": "Top Films", "x": 0.5, "y": 0.5, "font": {"size": 14, "color": "white"},
+                          "showarrow": False}],
+        ),
+    }
 
+
+def _spec_comparaison(donnees: DonneesGraphiques) -> dict:
+    scores = list(donnees.scores)
+    seuil = 40  # Ligne de référence (seuil de bonne recommandation)
+    return {
+        "data": [{
+            "type": "bar",
+            "x": list(donnees.films),
+            "y": scores,
+            "marker": {"color": scores, "colorscale": "Viridis", "showscale": True,
+                       "colorbar": {"title": {"text": "Score (%)"}}},
+            "text": [f"{s:.1f}%" for s in scores],
+            "textposition": "outside",
+            "hovertemplate": "<b>%{x}</b><br>Score: %{y:.1f}%<extra></extra>",
+        }],
+        "layout": _layout(
+            "Comparaison des Scores", 400,
+            xaxis={"title": {"text": "Film"}, "tickangle": 45},
+            yaxis={"title": {"text": "Score de similarité (%)"}},
+            plot_bgcolor=FOND_GRAPHIQUE,
+            shapes=[{"type": "line", "xref": "x domain", "x0": 0, "x1": 1, "yref": "y", "y0": seuil, "y1": seuil,
+                     "line": {"color": "#ff9800", "dash": "dash"}}],
+            annotations=[{"text": f"Seuil recommandé ({seuil}%)", "showarrow": False,
+                          "xref": "x domain", "x": 1, "xanchor": "right",
+                          "yref": "y", "y": seuil, "yanchor": "bottom"}],
+        ),
+    }
+
+
+# ============================================================
+# Figures Plotly
+# ============================================================
 def creer_graphique_scores_recommandations(recommandations: list) -> go.Figure:
     """
     Visualisation 1 : Barres horizontales des scores de recommandation
@@ -25,67 +225,7 @@ def creer_graphique_scores_recommandations(recommandations: list) -> go.Figure:
     Returns:
         Figure Plotly
     """
-    # Préparer les données
-    films = [rec[0]["Film"] for rec in recommandations]
-    scores = [rec[1] * 100 for rec in recommandations]  # Convertir en pourcentage
-    categories = [rec[0]["Categorie"] for rec in recommandations]
-    
-    # Créer un DataFrame
-    df = pd.DataFrame({
-        "Film": films,
-        "Score (%)": scores,
-        "Catégorie": categories
-    })
-    
-    # Inverser l'ordre pour avoir le meilleur en haut
-    df = df.iloc[::-1]
-    
-    # Palette de couleurs par catégorie
-    couleurs_categories = {
-        "Thriller": "#e91e63",
-        "Romance": "#f44336",
-        "Comédie": "#ff9800",
-        "Science-Fiction": "#2196f3",
-        "Drame": "#9c27b0",
-        "Action": "#4caf50",
-        "Horreur": "#607d8b",
-        "Animation": "#00bcd4"
-    }
-    
-    # Créer le graphique
-    fig = go.Figure()
-    
-    for categorie in df["Catégorie"].unique():
-        df_cat = df[df["Catégorie"] == categorie]
-        fig.add_trace(go.Bar(
-            y=df_cat["Film"],
-            x=df_cat["Score (%)"],
-            orientation='h',
-            name=categorie,
-            marker_color=couleurs_categories.get(categorie, "#4fc3f7"),
-            text=[f"{s:.1f}%" for s in df_cat["Score (%)"]],
-            textposition='auto',
-            hovertemplate="<b>%{y}</b><br>Score: %{x:.1f}%<extra></extra>"
-        ))
-    
-    fig.update_layout(
-        title={
-            'text': "Scores de Similarité des Films Recommandés",
-            'font': {'size': 18}
-        },
-        xaxis_title="Score de similarité (%)",
-        yaxis_title="",
-        barmode='stack',
-        showlegend=True,
-        legend_title="Catégorie",
-        height=400,
-        template="plotly_dark",
-        paper_bgcolor='rgba(26,26,46,1)',
-        plot_bgcolor='rgba(22,33,62,1)',
-        font=dict(color='white')
-    )
-    
-    return fig
+    return go.Figure(_spec_scores(preparer_donnees(recommandations)))
 
 
 def creer_radar_preferences(preferences: dict) -> go.Figure:
@@ -100,67 +240,7 @@ def creer_radar_preferences(preferences: dict) -> go.Figure:
     Returns:
         Figure Plotly
     """
-    # Préparer les données
-    genres = list(preferences.keys())
-    scores = list(preferences.values())
-    
-    # Fermer le radar (répéter le premier point)
-    genres_radar = genres + [genres[0]]
-    scores_radar = scores + [scores[0]]
-    
-    # Créer le graphique radar
-    fig = go.Figure()
-    
-    # Aire remplie
-    fig.add_trace(go.Scatterpolar(
-        r=scores_radar,
-        theta=genres_radar,
-        fill='toself',
-        fillcolor='rgba(79, 195, 247, 0.3)',
-        line=dict(color='#4fc3f7', width=2),
-        name='Vos préférences',
-        hovertemplate="<b>%{theta}</b><br>Score: %{r}/5<extra></extra>"
-    ))
-    
-    # Points
-    fig.add_trace(go.Scatterpolar(
-        r=scores,
-        theta=genres,
-        mode='markers',
-        marker=dict(size=10, color='#4fc3f7'),
-        showlegend=False,
-        hovertemplate="<b>%{theta}</b><br>Score: %{r}/5<extra></extra>"
-    ))
-    
-    fig.update_layout(
-        title={
-            'text': "Vos Préférences par Genre",
-            'font': {'size': 18}
-        },
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 5],
-                tickmode='linear',
-                tick0=0,
-                dtick=1,
-                gridcolor='rgba(255,255,255,0.2)',
-                linecolor='rgba(255,255,255,0.2)'
-            ),
-            angularaxis=dict(
-                gridcolor='rgba(255,255,255,0.2)',
-                linecolor='rgba(255,255,255,0.2)'
-            ),
-            bgcolor='rgba(22,33,62,1)'
-        ),
-        showlegend=True,
-        height=450,
-        template="plotly_dark",
-        paper_bgcolor='rgba(26,26,46,1)',
-        font=dict(color='white')
-    )
-    
-    return fig
+    return go.Figure(_spec_radar(preferences))
 
 
 def creer_camembert_categories(recommandations: list) -> go.Figure:
@@ -175,58 +255,7 @@ def creer_camembert_categories(recommandations: list) -> go.Figure:
     Returns:
         Figure Plotly
     """
-    # Compter les catégories
-    categories = [rec[0]["Categorie"] for rec in recommandations]
-    df_cat = pd.DataFrame({"Catégorie": categories})
-    counts = df_cat["Catégorie"].value_counts().reset_index()
-    counts.columns = ["Catégorie", "Nombre"]
-    
-    # Couleurs personnalisées
-    couleurs = {
-        "Thriller": "#e91e63",
-        "Romance": "#f44336",
-        "Comédie": "#ff9800",
-        "Science-Fiction": "#2196f3",
-        "Drame": "#9c27b0",
-        "Action": "#4caf50",
-        "Horreur": "#607d8b",
-        "Animation": "#00bcd4"
-    }
-    
-    colors = [couleurs.get(cat, "#4fc3f7") for cat in counts["Catégorie"]]
-    
-    # Créer le camembert
-    fig = go.Figure(data=[go.Pie(
-        labels=counts["Catégorie"],
-        values=counts["Nombre"],
-        hole=0.4,  # Donut chart
-        marker=dict(colors=colors, line=dict(color='white', width=2)),
-        textinfo='label+percent',
-        textposition='outside',
-        hovertemplate="<b>%{label}</b><br>%{value} film(s)<br>%{percent}<extra></extra>"
-    )])
-    
-    fig.update_layout(
-        title={
-            'text': "Répartition par Catégorie",
-            'font': {'size': 18}
-        },
-        showlegend=True,
-        legend_title="Catégories",
-        height=400,
-        template="plotly_dark",
-        paper_bgcolor='rgba(26,26,46,1)',
-        font=dict(color='white'),
-        annotations=[dict(
-            text='Top Films',
-            x=0.5, y=0.5,
-            font_size=14,
-            showarrow=False,
-            font_color='white'
-        )]
-    )
-    
-    return fig
+    return go.Figure(_spec_camembert(preparer_donnees(recommandations)))
 
 
 def creer_comparaison_scores(recommandations: list, tous_les_films: list = None) -> go.Figure:
@@ -243,53 +272,7 @@ def creer_comparaison_scores(recommandations: list, tous_les_films: list = None)
     Returns:
         Figure Plotly
     """
-    # Scores des recommandations
-    scores_top = [rec[1] * 100 for rec in recommandations]
-    noms_top = [rec[0]["Film"] for rec in recommandations]
-    
-    # Créer le graphique
-    fig = go.Figure()
-    
-    # Barres pour le top des recommandations
-    fig.add_trace(go.Bar(
-        x=noms_top,
-        y=scores_top,
-        marker=dict(
-            color=scores_top,
-            colorscale='Viridis',
-            showscale=True,
-            colorbar=dict(title="Score (%)")
-        ),
-        text=[f"{s:.1f}%" for s in scores_top],
-        textposition='outside',
-        hovertemplate="<b>%{x}</b><br>Score: %{y:.1f}%<extra></extra>"
-    ))
-    
-    # Ligne de référence (seuil de bonne recommandation)
-    fig.add_hline(
-        y=40, 
-        line_dash="dash", 
-        line_color="#ff9800",
-        annotation_text="Seuil recommandé (40%)",
-        annotation_position="top right"
-    )
-    
-    fig.update_layout(
-        title={
-            'text': "Comparaison des Scores",
-            'font': {'size': 18}
-        },
-        xaxis_title="Film",
-        yaxis_title="Score de similarité (%)",
-        height=400,
-        template="plotly_dark",
-        paper_bgcolor='rgba(26,26,46,1)',
-        plot_bgcolor='rgba(22,33,62,1)',
-        font=dict(color='white'),
-        xaxis=dict(tickangle=45)
-    )
-    
-    return fig
+    return go.Figure(_spec_comparaison(preparer_donnees(recommandations)))
 
 
 def afficher_toutes_visualisations(recommandations: list, preferences: dict):
@@ -303,12 +286,49 @@ def afficher_toutes_visualisations(recommandations: list, preferences: dict):
     Returns:
         Tuple de figures (scores, radar, camembert, comparaison)
     """
-    fig_scores = creer_graphique_scores_recommandations(recommandations)
-    fig_radar = creer_radar_preferences(preferences)
-    fig_camembert = creer_camembert_categories(recommandations)
-    fig_comparaison = creer_comparaison_scores(recommandations)
+    donnees = preparer_donnees(recommandations)
+    return (
+        go.Figure(_spec_scores(donnees)),
+        go.Figure(_spec_radar(preferences)),
+        go.Figure(_spec_camembert(donnees)),
+        go.Figure(_spec_comparaison(donnees)),
+    )
+
+
+# ============================================================
+# Figures sérialisées (pipeline)
+# ============================================================
+def figures_serialisees(recommandations: list, preferences: dict) -> dict:
+    """
+    Graphiques du pipeline ('radar', 'camembert', 'scores') en JSON Plotly.
+    
+    Les figures sont écrites directement depuis leurs spécifications, sans
+    construire ni valider d'objets Plotly (plotly.io.from_json pour les relire),
+    et le JSON est gardé en cache par résultat (films, scores, préférences).
     
-    return fig_scores, fig_radar, fig_camembert, fig_comparaison
+    Args:
+        recommandations: Liste de tuples (film_dict, score)
+        preferences: Dictionnaire des préférences Likert
+    
+    Returns:
+        dict nom -> figure en JSON
+    """
+    return dict(_figures_en_cache(preparer_donnees(recommandations), tuple(preferences.items())))
+
+
+@lru_cache(maxsize=TAILLE_CACHE_FIGURES)
+def _figures_en_cache(donnees: DonneesGraphiques, preferences: tuple) -> dict:
+    return {
+        'radar': json.dumps(_spec_radar(dict(preferences))),
+        'camembert': json.dumps(_spec_camembert(donnees)),
+        'scores': json.dumps(_spec_scores(donnees)),
+    }
+
+
+def statistiques_figures() -> dict:
+    """Succès / échecs du cache des figures sérialisées."""
+    info = _figures_en_cache.cache_info()
+    return {'succes': info.hits, 'echecs': info.misses, 'entrees': info.currsize}
 
 
 # ============================================================
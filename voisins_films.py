@@ -0,0 +1,313 @@
+"""
+Voisins films - Graphe des k plus proches voisins de chaque film
+
+Étape hors ligne : à partir de la matrice des embeddings du catalogue, calcule
+pour chaque film ses k films les plus similaires (cosinus). Les produits
+matriciels sont faits par blocs de lignes et de colonnes : la mémoire reste
+bornée (taille_bloc x taille_colonnes scores) quelle que soit la taille du
+catalogue. Le graphe est stocké en deux tableaux compacts (indices int32,
+scores float16).
+
+La mise à jour est incrémentale : seuls les films ajoutés ou modifiés sont
+comparés au catalogue, et les listes existantes intègrent les nouveaux films
+sans être recalculées.
+
+Les embeddings sont ceux du moteur : un moteur déjà chargé, ou l'artefact
+binaire (voir artefact_catalogue.py), dont seuls les films modifiés depuis
+la conversion sont ré-encodés.
+
+Usage :
+    python voisins_films.py --referentiel referentiel_films.json --artefact catalogue.arrow
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+CHEMIN_VOISINS = "voisins_films.npz"
+K_VOISINS = 10
+TAILLE_BLOC = 1024
+TAILLE_COLONNES = 16384
+
+
+@dataclass
+class GrapheVoisins:
+    ids: List[Any]              # FilmID de chaque ligne
+    hashes: List[str]           # hash_film au moment du calcul
+    voisins: np.ndarray         # (n, k) int32, lignes des voisins (-1 si moins de k films)
+    scores: np.ndarray          # (n, k) float16, similarité cosinus, ordre décroissant
+
+    def __post_init__(self):
+        self.index = {film_id: i for i, film_id in enumerate(self.ids)}
+
+    @property
+    def k(self) -> int:
+        return self.voisins.shape[1]
+
+    def voisins_de(self, film_id, n: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """(FilmID, score) des voisins d'un film, en O(k). Liste vide si le film est inconnu."""
+        ligne = self.index.get(film_id)
+        if ligne is None:
+            return []
+        resultat = []
+        for voisin, score in zip(self.voisins[ligne], self.scores[ligne]):
+            if voisin < 0:
+                break
+            resultat.append((self.ids[voisin], float(score)))
+        return resultat[:n]
+
+
+# ========== CALCUL PAR BLOCS ==========
+def _fusionner(indices_a, scores_a, indices_b, scores_b, k):
+    """Garde, ligne par ligne, les k meilleurs scores de deux listes de candidats."""
+    indices = np.concatenate([indices_a, indices_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1)
+    if scores.shape[1] > k:
+        partition = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        indices = np.take_along_axis(indices, partition, axis=1)
+        scores = np.take_along_axis(scores, partition, axis=1)
+    return indices, scores
+
+
+def top_k_blocs(
+    requetes: np.ndarray,
+    lignes_requetes: np.ndarray,
+    matrice: np.ndarray,
+    colonnes: Optional[np.ndarray] = None,
+    k: int = K_VOISINS,
+    taille_colonnes: int = TAILLE_COLONNES
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k des lignes de `matrice` les plus proches de chaque requête, le film
+    lui-même exclu, en parcourant les colonnes par blocs.
+
+    Args:
+        requetes: (b, d) embeddings des films dont on cherche les voisins
+        lignes_requetes: (b,) ligne de chaque requête dans `matrice` (auto-exclusion)
+        colonnes: Lignes candidates de `matrice` (défaut : toutes)
+
+    Returns:
+        (indices (b, k) int64 triés par score décroissant, scores (b, k) float32),
+        complétés par -1 / -inf s'il y a moins de k candidats
+    """
+    b = len(requetes)
+    meilleurs_i = np.full((b, 0), -1, dtype=np.int64)
+    meilleurs_s = np.full((b, 0), -np.inf, dtype=np.float32)
+    colonnes = np.arange(len(matrice)) if colonnes is None else np.asarray(colonnes)
+
+    for debut in range(0, len(colonnes), taille_colonnes):
+        bloc = colonnes[debut:debut + taille_colonnes]
+        contigu = len(bloc) and bloc[-1] - bloc[0] == len(bloc) - 1
+        sous_matrice = matrice[bloc[0]:bloc[-1] + 1] if contigu else matrice[bloc]
+        scores = requetes @ sous_matrice.T
+        scores[lignes_requetes[:, None] == bloc[None, :]] = -np.inf
+        indices = np.broadcast_to(bloc, scores.shape)
+        meilleurs_i, meilleurs_s = _fusionner(meilleurs_i, meilleurs_s, indices, scores, k)
+
+    ordre = np.argsort(-meilleurs_s, axis=1, kind="stable")
+    meilleurs_i = np.take_along_axis(meilleurs_i, ordre, axis=1)
+    meilleurs_s = np.take_along_axis(meilleurs_s, ordre, axis=1)
+    if meilleurs_i.shape[1] < k:
+        manque = k - meilleurs_i.shape[1]
+        meilleurs_i = np.pad(meilleurs_i, ((0, 0), (0, manque)), constant_values=-1)
+        meilleurs_s = np.pad(meilleurs_s, ((0, 0), (0, manque)), constant_values=-np.inf)
+    meilleurs_i[~np.isfinite(meilleurs_s)] = -1
+    return meilleurs_i, meilleurs_s
+
+
+def _calculer_lignes(matrice, lignes, k, taille_bloc, colonnes=None):
+    """Voisins des `lignes` de la matrice, par blocs de lignes."""
+    voisins = np.full((len(lignes), k), -1, dtype=np.int64)
+    scores = np.full((len(lignes), k), -np.inf, dtype=np.float32)
+    for debut in range(0, len(lignes), taille_bloc):
+        bloc = np.asarray(lignes[debut:debut + taille_bloc])
+        v, s = top_k_blocs(matrice[bloc], bloc, matrice, colonnes, k)
+        voisins[debut:debut + len(bloc)] = v
+        scores[debut:debut + len(bloc)] = s
+    return voisins, scores
+
+
+# ========== CONSTRUCTION / MISE À JOUR ==========
+def _ids(etat) -> List[Any]:
+    """FilmID de chaque ligne, lus dans l'index (sans reconstruire les films d'un artefact)."""
+    ids = [None] * len(etat.index)
+    for film_id, ligne in etat.index.items():
+        ids[ligne] = film_id
+    return ids
+
+
+def construire_graphe(etat, k: int = K_VOISINS, taille_bloc: int = TAILLE_BLOC) -> GrapheVoisins:
+    """Graphe complet pour un état du catalogue (nlp_engine.EtatCatalogue)."""
+    matrice = etat.embeddings
+    ids = _ids(etat)
+    voisins, scores = _calculer_lignes(matrice, np.arange(len(ids)), k, taille_bloc)
+    return GrapheVoisins(
+        ids=ids,
+        hashes=[etat.hashes[f] for f in ids],
+        voisins=voisins.astype(np.int32),
+        scores=np.where(voisins >= 0, scores, 0).astype(np.float16),
+    )
+
+
+def mettre_a_jour(graphe: Optional[GrapheVoisins], etat, k: int = K_VOISINS,
+                  taille_bloc: int = TAILLE_BLOC) -> Tuple[GrapheVoisins, Dict[str, int]]:
+    """
+    Met à jour le graphe pour un nouvel état du catalogue.
+
+    - films ajoutés ou modifiés : voisins calculés sur tout le catalogue
+    - films dont un voisin a été supprimé ou modifié : liste recalculée
+    - autres films : liste existante fusionnée avec les films ajoutés/modifiés
+
+    Returns:
+        (graphe, bilan {'recalcules', 'repris'})
+    """
+    if graphe is None or graphe.k != k:
+        nouveau = construire_graphe(etat, k, taille_bloc)
+        return nouveau, {"recalcules": len(nouveau.ids), "repris": 0}
+
+    matrice = etat.embeddings
+    ids = _ids(etat)
+    hashes = [etat.hashes[f] for f in ids]
+    n = len(ids)
+
+    # Lignes de l'ancien graphe dont le contenu est inchangé -> ligne dans le nouvel état
+    ancienne_vers_nouvelle = np.full(len(graphe.ids), -1, dtype=np.int64)
+    for ancienne, (film_id, h) in enumerate(zip(graphe.ids, graphe.hashes)):
+        nouvelle = etat.index.get(film_id)
+        if nouvelle is not None and hashes[nouvelle] == h:
+            ancienne_vers_nouvelle[ancienne] = nouvelle
+
+    reprises = np.flatnonzero(ancienne_vers_nouvelle >= 0)          # anciennes lignes réutilisables
+    lignes_reprises = ancienne_vers_nouvelle[reprises]              # leurs lignes dans le nouvel état
+    nouveaux = np.setdiff1d(np.arange(n), lignes_reprises)          # ajoutés ou modifiés
+
+    # Listes reprises, ré-indexées ; une liste qui pointait vers un film disparu
+    # ou modifié doit être recalculée (son k+1-ième voisin est inconnu)
+    anciens_voisins = graphe.voisins[reprises]
+    voisins_repris = np.where(anciens_voisins >= 0, ancienne_vers_nouvelle[anciens_voisins], -1)
+    invalides = ((anciens_voisins >= 0) & (voisins_repris < 0)).any(axis=1)
+
+    voisins = np.full((n, k), -1, dtype=np.int64)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+    valides = lignes_reprises[~invalides]
+    voisins[valides] = voisins_repris[~invalides]
+    scores[valides] = np.where(voisins_repris[~invalides] >= 0, graphe.scores[reprises[~invalides]], -np.inf)
+
+    a_recalculer = np.union1d(nouveaux, lignes_reprises[invalides])
+    if len(a_recalculer):
+        v, s = _calculer_lignes(matrice, a_recalculer, k, taille_bloc)
+        voisins[a_recalculer] = v
+        scores[a_recalculer] = s
+
+    if len(nouveaux) and len(valides):
+        # Les films ajoutés/modifiés peuvent entrer dans les listes existantes
+        for debut in range(0, len(valides), taille_bloc):
+            bloc = valides[debut:debut + taille_bloc]
+            v, s = top_k_blocs(matrice[bloc], bloc, matrice, nouveaux, k)
+            voisins[bloc], scores[bloc] = _fusionner(voisins[bloc], scores[bloc], v, s, k)
+            ordre = np.argsort(-scores[bloc], axis=1, kind="stable")
+            voisins[bloc] = np.take_along_axis(voisins[bloc], ordre, axis=1)
+            scores[bloc] = np.take_along_axis(scores[bloc], ordre, axis=1)
+
+    bilan = {"recalcules": int(len(a_recalculer)), "repris": int(len(valides))}
+    nouveau = GrapheVoisins(
+        ids=ids,
+        hashes=hashes,
+        voisins=voisins.astype(np.int32),
+        scores=np.where(voisins >= 0, scores, 0).astype(np.float16),
+    )
+    return nouveau, bilan
+
+
+# ========== STOCKAGE ==========
+def ecrire_graphe(graphe: GrapheVoisins, chemin: str = CHEMIN_VOISINS):
+    """Écriture atomique : deux tableaux + FilmID/hashes en JSON."""
+    meta = json.dumps({"ids": graphe.ids, "hashes": graphe.hashes}, ensure_ascii=False)
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "wb") as f:
+        np.savez(f, voisins=graphe.voisins, scores=graphe.scores, meta=np.array(meta))
+    os.replace(temporaire, chemin)
+
+
+def lire_graphe(chemin: str = CHEMIN_VOISINS) -> Optional[GrapheVoisins]:
+    try:
+        with np.load(chemin) as data:
+            meta = json.loads(str(data["meta"]))
+            return GrapheVoisins(
+                ids=meta["ids"],
+                hashes=meta["hashes"],
+                voisins=data["voisins"],
+                scores=data["scores"],
+            )
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+# ========== CONSULTATION ==========
+def films_similaires(film, etat, graphe: Optional[GrapheVoisins] = None, n: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Films les plus similaires à `film`, sous forme (film, score).
+
+    Lecture du graphe précalculé (O(k)) si le film y est à jour ; sinon un
+    seul produit matrice-vecteur sur les embeddings déjà en mémoire.
+    """
+    film_id = film["FilmID"]
+    if graphe is not None:
+        ligne = graphe.index.get(film_id)
+        if ligne is not None and graphe.hashes[ligne] == etat.hashes.get(film_id):
+            return [
+                (etat.films[etat.index[voisin]], score)
+                for voisin, score in graphe.voisins_de(film_id)
+                if voisin in etat.index
+            ][:n]
+
+    ligne = etat.index.get(film_id)
+    if ligne is None:
+        return []
+    voisins, scores = top_k_blocs(etat.embeddings[ligne][None, :], np.array([ligne]), etat.embeddings, k=n)
+    return [(etat.films[v], float(s)) for v, s in zip(voisins[0], scores[0]) if v >= 0]
+
+
+def generer_graphe(chemin_referentiel: str = "referentiel_films.json", chemin_sortie: str = CHEMIN_VOISINS,
+                   k: int = K_VOISINS, artefact: Optional[str] = "catalogue.arrow", moteur=None) -> Dict[str, int]:
+    """
+    Construit ou met à jour le graphe du référentiel et l'écrit sur disque.
+
+    Args:
+        artefact: Artefact Arrow dont les embeddings sont relus (les films sont
+            encodés seulement s'il est absent, périmé, ou pour les films modifiés)
+        moteur: Moteur déjà chargé (nlp_engine.MoteurRecommandation) dont
+            l'état courant est réutilisé tel quel
+    """
+    from nlp_engine import MoteurRecommandation
+
+    if moteur is None:
+        if not (artefact and os.path.exists(artefact)):
+            print(f"⚠️ Artefact {artefact} absent : tout le catalogue est encodé "
+                  f"(python artefact_catalogue.py pour l'éviter)")
+        moteur = MoteurRecommandation(chemin_referentiel, artefact=artefact)
+    etat = moteur.etat
+    if etat is None:
+        return {}
+    debut = time.perf_counter()
+    graphe, bilan = mettre_a_jour(lire_graphe(chemin_sortie), etat, k)
+    ecrire_graphe(graphe, chemin_sortie)
+    print(f"✅ Graphe des voisins : {len(graphe.ids)} films, k={k} - {bilan['recalcules']} recalculés, "
+          f"{bilan['repris']} repris ({time.perf_counter() - debut:.1f} s)")
+    return bilan
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcule les films similaires de chaque film.")
+    parser.add_argument("--referentiel", default="referentiel_films.json")
+    parser.add_argument("--artefact", default="catalogue.arrow", help="Embeddings relus depuis cet artefact")
+    parser.add_argument("--sortie", default=CHEMIN_VOISINS)
+    parser.add_argument("-k", type=int, default=K_VOISINS)
+    args = parser.parse_args()
+    generer_graphe(args.referentiel, args.sortie, args.k, args.artefact)